@@ -1,11 +1,16 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 from django import forms
-from django.db.models import Sum, Count
+from django.db.models import Count
 
-from .models import User, Transaction
+from . import images, ledger, rewards
+from .models import (
+    User, Transaction, LedgerAccount, JournalEntry, Posting, FxRate, Job, RewardRule, RewardTier,
+)
 
 
 # -----------------------------
@@ -38,7 +43,7 @@ class UserCreationForm(forms.ModelForm):
 
 
 class UserChangeForm(forms.ModelForm):
-    """Form for updating users, including editing PIN"""
+    """Form for updating users, including editing PIN. Balances move only through the ledger."""
     pin = forms.CharField(
         label="PIN",
         widget=forms.PasswordInput(render_value=True),
@@ -49,6 +54,7 @@ class UserChangeForm(forms.ModelForm):
     class Meta:
         model = User
         fields = "__all__"
+        exclude = ("balance", "reward_points")
 
     def clean_pin(self):
         pin = self.cleaned_data.get("pin")
@@ -72,13 +78,17 @@ class UserChangeForm(forms.ModelForm):
 # -----------------------------
 class TransactionInline(admin.TabularInline):
     model = Transaction
+    fk_name = "user"
     fields = ("type", "amount", "balance_after", "description", "flw_tx_ref", "flw_status", "date")
-    readonly_fields = ("balance_after", "date", "flw_tx_ref", "flw_status")
+    readonly_fields = fields
     extra = 0
     ordering = ("-date",)
     can_delete = False
     show_change_link = True
 
+    def has_add_permission(self, request, obj=None):
+        return False
+
 
 # -----------------------------
 # Custom List Filters
@@ -96,11 +106,11 @@ class LowBalanceFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         if self.value() == '<500':
-            return queryset.filter(balance__lt=500)
+            return queryset.filter(wallet_balance__lt=500)
         if self.value() == '500-5000':
-            return queryset.filter(balance__gte=500, balance__lte=5000)
+            return queryset.filter(wallet_balance__gte=500, wallet_balance__lte=5000)
         if self.value() == '>5000':
-            return queryset.filter(balance__gt=5000)
+            return queryset.filter(wallet_balance__gt=5000)
         return queryset
 
 
@@ -125,6 +135,21 @@ class HighTransactionFilter(admin.SimpleListFilter):
         return queryset
 
 
+class RiskFilter(admin.SimpleListFilter):
+    title = _('Fraud risk')
+    parameter_name = 'risk'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('review', _('Needs review')),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == 'review':
+            return queryset.filter(risk_score__gte=settings.FRAUD_REVIEW_SCORE)
+        return queryset
+
+
 # -----------------------------
 # UserAdmin
 # -----------------------------
@@ -140,17 +165,23 @@ class UserAdmin(BaseUserAdmin):
     list_filter = ["is_staff", "is_superuser", "is_active", LowBalanceFilter, HighTransactionFilter]
     search_fields = ("phone", "full_name", "email", "city", "state")
     ordering = ["phone"]
-    readonly_fields = ("profile_pic_preview", "balance", "total_points")
+    readonly_fields = ("profile_pic_preview", "balance", "reward_points", "total_points")
     inlines = [TransactionInline]
 
+    def get_queryset(self, request):
+        # Sharded wallets' unfolded credits count too (LowBalanceFilter, balance_colored)
+        return ledger.with_wallet_balance(super().get_queryset(request))
+
     # ----------------------
     # Helper methods
     # ----------------------
     def profile_pic_preview(self, obj):
         if obj.profilePic:
+            # 64px thumbnail once processed; the display image until then
+            url = images.thumbnail_urls(obj).get("64") or obj.profilePic.url
             return format_html(
-                '<img src="{}" style="height:50px;width:50px;border-radius:50%;" />',
-                obj.profilePic.url
+                '<img src="{}" style="height:50px;width:50px;border-radius:50%;" loading="lazy" />',
+                url
             )
         return "-"
     profile_pic_preview.short_description = "Profile Picture"
@@ -160,20 +191,20 @@ class UserAdmin(BaseUserAdmin):
     total_transactions.short_description = "Transactions"
 
     def total_points(self, obj):
-        earned = obj.transactions.filter(type="Reward Points").aggregate(Sum('points'))['points__sum'] or 0
-        redeemed = obj.transactions.filter(type="Reward Redemption").aggregate(Sum('points'))['points__sum'] or 0
-        return earned - redeemed
+        points = obj.total_points()
+        return f"{points} ({rewards.tier_for(points).name})"
     total_points.short_description = "Reward Points"
 
     def balance_colored(self, obj):
-        if obj.balance < 500:
+        if obj.wallet_balance < 500:
             color = "red"
-        elif obj.balance <= 5000:
+        elif obj.wallet_balance <= 5000:
             color = "orange"
         else:
             color = "green"
-        return format_html('<span style="color:{};">₦{}</span>', color, obj.balance)
+        return format_html('<span style="color:{};">₦{}</span>', color, obj.wallet_balance)
     balance_colored.short_description = "Balance"
+    balance_colored.admin_order_field = "wallet_balance"
 
     # ----------------------
     # Fieldsets
@@ -207,11 +238,107 @@ class UserAdmin(BaseUserAdmin):
 # -----------------------------
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
-    list_display = ["user", "type", "amount", "balance_after", "flw_tx_ref", "flw_status", "date"]
-    list_filter = ["type", "flw_status", "date"]
+    list_display = ["user", "type", "amount", "currency", "balance_after", "risk_score", "flw_tx_ref", "flw_status", "date"]
+    list_filter = ["type", "flw_status", RiskFilter, "currency", "date"]
     search_fields = ["user__phone", "user__full_name", "description", "flw_tx_ref"]
-    readonly_fields = ["balance_after", "flw_tx_ref", "flw_status", "date"]
+    readonly_fields = ["balance_after", "currency", "fx_rate", "flw_tx_ref", "flw_status", "date", "journal_entry"]
+    # Already posted: correct with a reversal, not by editing what was posted
+    posted_fields = ["user", "type", "amount", "points"]
     ordering = ["-date"]
+    actions = ["reverse"]
+
+    def get_readonly_fields(self, request, obj=None):
+        readonly = super().get_readonly_fields(request, obj)
+        return readonly if obj is None else [*readonly, *self.posted_fields]
+
+    @admin.action(description="Reverse selected transactions (compensating journal entry)")
+    def reverse(self, request, queryset):
+        reversed_count = 0
+        for tx in queryset.select_related("journal_entry"):
+            if tx.journal_entry is None:
+                self.message_user(request, f"{tx.reference or tx.pk} never posted", messages.WARNING)
+                continue
+            try:
+                ledger.reverse(tx.journal_entry, description=f"Reversal of {tx.reference or tx.pk}")
+            except ledger.LedgerError as e:
+                self.message_user(request, f"{tx.reference or tx.pk}: {e}", messages.ERROR)
+            else:
+                reversed_count += 1
+        if reversed_count:
+            self.message_user(request, f"Reversed {reversed_count} transaction(s)", messages.SUCCESS)
+
+
+# -----------------------------
+# Ledger (read-only: entries are append-only)
+# -----------------------------
+class ReadOnlyAdmin(admin.ModelAdmin):
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class PostingInline(admin.TabularInline):
+    model = Posting
+    fields = ("account", "amount", "balance_after")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LedgerAccount)
+class LedgerAccountAdmin(ReadOnlyAdmin):
+    list_display = ["code", "kind", "user", "currency", "metered", "balance", "created_at"]
+    list_filter = ["kind", "currency", "metered"]
+    search_fields = ["code", "user__phone"]
+
+
+@admin.register(JournalEntry)
+class JournalEntryAdmin(ReadOnlyAdmin):
+    list_display = ["id", "kind", "reference", "description", "created_at"]
+    list_filter = ["kind"]
+    search_fields = ["reference"]
+    ordering = ["-id"]
+    inlines = [PostingInline]
+
+
+@admin.register(FxRate)
+class FxRateAdmin(ReadOnlyAdmin):
+    list_display = ["version", "currency", "rate", "fetched_at"]
+    list_filter = ["currency"]
+    ordering = ["-version", "currency"]
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["id", "name", "status", "attempts", "run_at", "locked_by", "created_at"]
+    list_filter = ["status", "name"]
+    readonly_fields = ["name", "payload", "attempts", "locked_at", "locked_by", "last_error", "created_at"]
+    ordering = ["run_at"]
+    actions = ["retry_now"]
+
+    @admin.action(description="Retry selected jobs now")
+    def retry_now(self, request, queryset):
+        queryset.update(status=Job.QUEUED, run_at=timezone.now(), attempts=0, locked_at=None, locked_by="")
+
+
+@admin.register(RewardTier)
+class RewardTierAdmin(admin.ModelAdmin):
+    list_display = ["name", "min_points", "multiplier"]
+
+
+@admin.register(RewardRule)
+class RewardRuleAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "transaction_type", "min_amount", "max_amount", "points",
+                    "points_per_naira", "max_points", "active"]
+    list_filter = ["transaction_type", "active"]
 
 
 # -----------------------------
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BackdaveAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backdave_app'
+
+    def ready(self):
+        from . import banks, checks, tasks  # noqa: F401 (registers checks and job handlers)
+        banks.directory()  # build the bank index once, before the first request
@@ -0,0 +1,195 @@
+"""
+Cold transaction history.
+
+archive_transactions moves Transaction rows dated before the hot window
+(TRANSACTION_HOT_DAYS) into ArchivedTransaction, in id-ordered batches,
+keeping their ids. On Postgres the archive is range-partitioned by month
+and partitions are created here as rows arrive; elsewhere it is a single
+table. Every row newer than horizon() is always in the hot table, so the
+read helpers below only query the archive when a range reaches past it.
+history() also lists reward points (PointsEntry) in the shape of the
+"Reward Points" transactions they replaced, under negative ids. Rows the retention job has
+folded away (retention.py) only count towards balance_at().
+"""
+import datetime
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedTransaction, PointsEntry, Transaction, TransactionSummary
+
+HOT_TABLE = Transaction._meta.db_table
+ARCHIVE_TABLE = ArchivedTransaction._meta.db_table
+# Columns copied across; hot-only columns added later simply stay behind
+COLUMNS = [f.column for f in ArchivedTransaction._meta.concrete_fields]
+NEWEST_FIRST = ("-date", "-id")
+
+_partitions = set()  # (year, month) partitions known to exist in this process
+
+
+def horizon(now=None):
+    """Nothing dated at or after this is ever archived."""
+    return (now or timezone.now()) - timedelta(days=settings.TRANSACTION_HOT_DAYS)
+
+
+# --------------------------
+# ARCHIVING
+# --------------------------
+def archivable(cutoff):
+    # Pending top-ups stay hot: webhooks and the sweeper look them up by flw_tx_ref
+    return Transaction.objects.filter(date__lt=cutoff).exclude(flw_status="pending")
+
+
+def archive_batch(cutoff, after_id=0, batch_size=None):
+    """Move one batch of archivable rows with id > after_id. Returns (rows moved, last id)."""
+    if cutoff > horizon():
+        raise ValueError("Cutoff is inside the hot window; reads would miss archived rows")
+    batch_size = batch_size or settings.TRANSACTION_ARCHIVE_BATCH
+    columns = ", ".join(connection.ops.quote_name(c) for c in COLUMNS)
+    with transaction.atomic():
+        rows = list(
+            archivable(cutoff).filter(id__gt=after_id).order_by("id")
+            .select_for_update().values_list("id", "date")[:batch_size]
+        )
+        if not rows:
+            return 0, None
+        if connection.vendor == "postgresql":
+            ensure_partitions(min(d for _, d in rows), max(d for _, d in rows))
+
+        ids = [pk for pk, _ in rows]
+        placeholders = ", ".join(["%s"] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {ARCHIVE_TABLE} ({columns}) SELECT {columns} FROM {HOT_TABLE} WHERE id IN ({placeholders})",
+                ids,
+            )
+            moved = cursor.rowcount
+            cursor.execute(f"DELETE FROM {HOT_TABLE} WHERE id IN ({placeholders})", ids)
+    return moved, ids[-1]
+
+
+def ensure_partitions(start, end):
+    """
+    Create the monthly archive partitions covering start..end (Postgres).
+    Creating one briefly locks the archive, so it happens once per month.
+    """
+    month = _month(start)
+    while month <= _month(end):
+        following = _next_month(month)
+        if (month.year, month.month) not in _partitions:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE}_y{month.year}m{month.month:02d} "
+                    f"PARTITION OF {ARCHIVE_TABLE} FOR VALUES FROM (%s) TO (%s)",
+                    [month, following],
+                )
+            _partitions.add((month.year, month.month))
+        month = following
+
+
+def analyze():
+    """Refresh planner statistics for the archive; autovacuum skips partitioned parents."""
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {ARCHIVE_TABLE}")
+
+
+def _month(moment):
+    moment = moment.astimezone(datetime.timezone.utc)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(month):
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+
+# --------------------------
+# READS
+# --------------------------
+def _in_range(queryset, start, end, field="date"):
+    if start is not None:
+        queryset = queryset.filter(**{f"{field}__gte": start})
+    if end is not None:
+        queryset = queryset.filter(**{f"{field}__lt": end})
+    return queryset
+
+
+def history(user_id, start=None, end=None, limit=None):
+    """
+    A user's rows in [start, end), newest first, as Transaction and
+    ArchivedTransaction instances (same fields). The archive is read only
+    if start reaches past the hot window, or, with no start, if the hot
+    rows alone don't fill ``limit`` from inside the window (pending
+    top-ups stay hot however old they are).
+    """
+    cutoff = horizon()
+    hot = _in_range(Transaction.objects.filter(user_id=user_id), start, end).order_by(*NEWEST_FIRST)
+    rows = list(hot[:limit] if limit else hot)
+    filled = limit and len(rows) >= limit and rows[-1].date >= cutoff
+    needs_archive = not ((start is not None and start >= cutoff) or filled)
+
+    rows += _points(user_id, start, end, limit)
+    if needs_archive:
+        cold = _in_range(ArchivedTransaction.objects.filter(user_id=user_id), start, end).order_by(*NEWEST_FIRST)
+        rows += cold[:limit] if limit else cold
+    rows.sort(key=lambda row: (row.date, row.id), reverse=True)
+    rows = rows[:limit] if limit else rows
+    _fill_points_balances(user_id, rows)
+    return rows
+
+
+def _fill_points_balances(user_id, rows):
+    """
+    Points rows move no money; like the Transaction rows they replaced, they
+    show the wallet balance at the time: that of the nearest older posting.
+    """
+    carried = None
+    for row in reversed(rows):
+        if row._state.adding:  # built by _points, not loaded
+            if carried is None:
+                carried = balance_at(user_id, row.date)
+            row.balance_after = carried
+        elif row.balance_after is not None:
+            carried = row.balance_after
+
+
+def _points(user_id, start, end, limit):
+    """Points awards in the range as "Reward Points" rows, with their RWD- references."""
+    entries = _in_range(PointsEntry.objects.filter(user_id=user_id), start, end, "ts").order_by("-ts", "-id")
+    entries = list(entries[:limit] if limit else entries)
+    sources = {e.source_tx_id for e in entries if e.source_tx_id}
+    references = dict(Transaction.objects.filter(id__in=sources).values_list("id", "reference"))
+    if sources - references.keys():
+        references.update(ArchivedTransaction.objects.filter(
+            id__in=sources - references.keys(),
+        ).values_list("id", "reference"))
+    return [e.as_transaction(references.get(e.source_tx_id)) for e in entries]
+
+
+def balance_at(user_id, moment):
+    """Wallet balance just before ``moment``: the last posted balance_after."""
+    def latest(model):
+        return model.objects.filter(
+            user_id=user_id, date__lt=moment, balance_after__isnull=False,
+        ).order_by(*NEWEST_FIRST).values_list("date", "id", "balance_after").first()
+
+    candidates = [latest(Transaction)]
+    if moment < horizon():
+        candidates.append(latest(ArchivedTransaction))
+    # Rows folded away by the retention job leave their last balance on the summary
+    candidates.append(TransactionSummary.objects.filter(
+        user_id=user_id, last_date__lt=moment,
+    ).order_by("-last_date", "-last_id").values_list("last_date", "last_id", "balance_after").first())
+    candidates = [c for c in candidates if c]
+    return max(candidates)[2] if candidates else Decimal("0.00")
+
+
+def statement(user_id, start, end):
+    """Rows in [start, end) oldest first, with the opening and closing balances."""
+    opening = balance_at(user_id, start)
+    rows = history(user_id, start, end)[::-1]
+    closing = next((row.balance_after for row in reversed(rows) if row.balance_after is not None), opening)
+    return {"opening_balance": opening, "closing_balance": closing, "transactions": rows}
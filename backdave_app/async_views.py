@@ -0,0 +1,210 @@
+import json
+import logging
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from . import events, flutterwave, fx, idempotency
+from .models import Transaction
+from .references import next_reference
+
+logger = logging.getLogger(__name__)
+
+
+# --------------------------
+# HELPERS
+# --------------------------
+def _jwt_user(request, query_token=False):
+    """
+    The JWT user, or None. With ``query_token`` a ``?token=`` parameter is
+    accepted too, for clients (EventSource) that cannot set headers.
+    """
+    auth = JWTAuthentication()
+    try:
+        result = auth.authenticate(request)
+        if result is None and query_token and request.GET.get("token"):
+            token = auth.get_validated_token(request.GET["token"])
+            result = (auth.get_user(token), token)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+async def _authenticate(request):
+    """Resolve the JWT user without DRF's sync request cycle."""
+    return await sync_to_async(_jwt_user)(request)
+
+
+def _unauthorized():
+    return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+
+def _json_body(request):
+    if request.content_type == "application/json":
+        try:
+            return json.loads(request.body or b"{}")
+        except json.JSONDecodeError:
+            return {}
+    return request.POST
+
+
+# --------------------------
+# FLUTTERWAVE WEBHOOK (ASYNC)
+# --------------------------
+@csrf_exempt
+@require_POST
+async def flutterwave_webhook(request):
+    signature = request.headers.get("verif-hash")
+    if signature != settings.FLUTTERWAVE_SECRET_HASH:
+        logger.warning("Invalid webhook signature: %s", signature)
+        return JsonResponse({"error": "Invalid signature"}, status=401)
+
+    try:
+        payload = json.loads(request.body)
+        data = payload.get("data", {})
+        tx_ref = data.get("tx_ref")
+        flw_id = data.get("id")
+        status_tx = data.get("status")
+    except (json.JSONDecodeError, KeyError) as e:
+        logger.error("Webhook parsing failed: %s", str(e))
+        return JsonResponse({"error": "Invalid payload"}, status=400)
+
+    if status_tx != "successful":
+        logger.info("Ignored webhook for tx_ref=%s, status=%s", tx_ref, status_tx)
+        return JsonResponse({"status": "ignored"})
+
+    # Cheap read before going upstream: retried webhooks for settled
+    # payments never reach Flutterwave
+    tx = await Transaction.objects.filter(flw_tx_ref=tx_ref).only("processed").afirst()
+    if not tx:
+        logger.warning("Transaction not found for tx_ref=%s", tx_ref)
+        return JsonResponse({"error": "Transaction not found"}, status=404)
+    if tx.processed:
+        logger.info("Transaction already processed: tx_ref=%s", tx_ref)
+        return JsonResponse({"status": "already_processed"})
+
+    # The client's verify call for this payment usually arrives at the same moment
+    async with flutterwave.asingle_flight(tx_ref):
+        await tx.arefresh_from_db(fields=["processed"])
+        if tx.processed:
+            logger.info("Transaction already processed: tx_ref=%s", tx_ref)
+            return JsonResponse({"status": "already_processed"})
+
+        # Verify with Flutterwave server-side
+        try:
+            verified_data = await flutterwave.averified(tx_ref, flw_id)
+        except httpx.HTTPError as e:
+            logger.error("Flutterwave verification failed for tx_ref=%s: %s", tx_ref, str(e))
+            return JsonResponse({"error": "Verification timeout"}, status=500)
+
+        if verified_data.get("status") != "successful":
+            logger.warning("Verification failed for tx_ref=%s", tx_ref)
+            return JsonResponse({"error": "Verification failed"}, status=400)
+
+        body, code = await sync_to_async(flutterwave.settle_webhook_payment)(tx_ref, flw_id, verified_data)
+    return JsonResponse(body, status=code)
+
+
+# --------------------------
+# INIT FLUTTERWAVE PAYMENT (ASYNC)
+# --------------------------
+@csrf_exempt
+@require_POST
+async def init_flutterwave_payment(request):
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+    return await idempotency.arun(request, user, _init_flutterwave_payment)
+
+
+async def _init_flutterwave_payment(request, user):
+    body = _json_body(request)
+    # Off the event loop: taking or renewing the node lease hits the database
+    tx_ref = await sync_to_async(next_reference)("FLW")
+    try:
+        tx = await sync_to_async(flutterwave.create_top_up)(
+            user, body.get("amount"), body.get("currency"), flw_tx_ref=tx_ref,
+        )
+    except fx.StaleRates as e:
+        return JsonResponse({"error": str(e)}, status=503)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({
+        "tx_ref": tx_ref,
+        "amount": str(flutterwave.charged(tx)),
+        "currency": tx.flw_currency,
+        # What the wallet gets, at today's rate when paid in another currency
+        "credit": str(tx.amount),
+        "wallet_currency": tx.currency,
+        "email": user.email,
+        "phone": user.phone,
+        "name": user.full_name,
+    })
+
+
+# --------------------------
+# VERIFY FLUTTERWAVE PAYMENT (ASYNC)
+# --------------------------
+@csrf_exempt
+@require_POST
+async def flutterwave_verify(request):
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+
+    tx_ref = _json_body(request).get("tx_ref")
+    if not tx_ref:
+        return JsonResponse({"error": "tx_ref is required"}, status=400)
+
+    try:
+        tx = await Transaction.objects.aget(flw_tx_ref=tx_ref, user=user)
+    except Transaction.DoesNotExist:
+        return JsonResponse({"error": "Transaction not found"}, status=404)
+
+    if tx.processed:
+        return JsonResponse({"status": "already_processed"})
+
+    # The webhook for this payment usually arrives at the same moment
+    async with flutterwave.asingle_flight(tx_ref):
+        await tx.arefresh_from_db(fields=["processed"])
+        if tx.processed:
+            return JsonResponse({"status": "already_processed"})
+
+        # Verify with Flutterwave
+        try:
+            data = await flutterwave.averified(tx_ref)
+        except httpx.HTTPError as e:
+            logger.error("Flutterwave verification failed for tx_ref=%s: %s", tx_ref, str(e))
+            return JsonResponse({"error": "Verification timeout"}, status=500)
+        body, code = await sync_to_async(flutterwave.settle_reference_payment)(user, tx, data)
+    return JsonResponse(body, status=code)
+
+
+# --------------------------
+# LIVE UPDATES (SERVER-SENT EVENTS)
+# --------------------------
+@require_GET
+async def event_stream(request):
+    # On the shared executor, not this request's thread, whose connection
+    # would stay open as long as the stream
+    user = await events.pooled(_jwt_user)(request, query_token=True)
+    if user is None:
+        return _unauthorized()
+
+    last_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+
+    response = StreamingHttpResponse(events.stream(user.pk, last_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # keep nginx/Render proxies from buffering the stream
+    return response
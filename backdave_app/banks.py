@@ -0,0 +1,63 @@
+"""
+Directory of Nigerian banks (CBN/NIBSS codes).
+
+Built once per process (preloaded in AppConfig.ready) and looked up by
+code, name or a common short name, case- and punctuation-insensitive.
+"""
+import functools
+import re
+from typing import NamedTuple
+
+
+class Bank(NamedTuple):
+    code: str
+    name: str
+    aliases: tuple = ()
+
+
+BANKS = (
+    Bank("044", "Access Bank", ("access", "access diamond", "diamond bank")),
+    Bank("023", "Citibank Nigeria", ("citibank", "citi")),
+    Bank("050", "Ecobank Nigeria", ("ecobank",)),
+    Bank("070", "Fidelity Bank", ("fidelity",)),
+    Bank("011", "First Bank of Nigeria", ("first bank", "firstbank", "fbn")),
+    Bank("214", "First City Monument Bank", ("fcmb",)),
+    Bank("058", "Guaranty Trust Bank", ("gtbank", "gtb", "gtco")),
+    Bank("030", "Heritage Bank", ("heritage",)),
+    Bank("301", "Jaiz Bank", ("jaiz",)),
+    Bank("082", "Keystone Bank", ("keystone",)),
+    Bank("50211", "Kuda Microfinance Bank", ("kuda",)),
+    Bank("50515", "Moniepoint Microfinance Bank", ("moniepoint",)),
+    Bank("999992", "OPay", ("opay", "paycom")),
+    Bank("999991", "PalmPay", ("palmpay",)),
+    Bank("076", "Polaris Bank", ("polaris",)),
+    Bank("101", "Providus Bank", ("providus",)),
+    Bank("221", "Stanbic IBTC Bank", ("stanbic", "stanbic ibtc")),
+    Bank("068", "Standard Chartered Bank", ("standard chartered",)),
+    Bank("232", "Sterling Bank", ("sterling",)),
+    Bank("100", "SunTrust Bank", ("suntrust",)),
+    Bank("032", "Union Bank of Nigeria", ("union bank",)),
+    Bank("033", "United Bank for Africa", ("uba",)),
+    Bank("215", "Unity Bank", ("unity",)),
+    Bank("035", "Wema Bank", ("wema", "alat")),
+    Bank("057", "Zenith Bank", ("zenith",)),
+)
+
+
+def _normalize(value):
+    return re.sub(r"[^a-z0-9]+", " ", (value or "").lower()).strip()
+
+
+@functools.cache
+def directory():
+    """{normalized code/name/alias: Bank}."""
+    index = {}
+    for bank in BANKS:
+        for key in (bank.code, bank.name, *bank.aliases):
+            index[_normalize(key)] = bank
+    return index
+
+
+def find(name_or_code):
+    """The Bank for a code, name or alias, or None."""
+    return directory().get(_normalize(name_or_code))
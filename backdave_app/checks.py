@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def flutterwave_keys(app_configs, **kwargs):
+    missing = [name for name, value in settings.FLUTTERWAVE_KEYS.items() if not value]
+    if not missing:
+        return []
+    return [Warning(
+        f"Missing Flutterwave keys in .env: {', '.join(missing)}",
+        hint="Payments cannot be verified until they are set.",
+        id="backdave_app.W001",
+    )]
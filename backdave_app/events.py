@@ -0,0 +1,266 @@
+"""
+Live balance and transaction updates (Server-Sent Events).
+
+Every ledger posting publishes the ids of the wallet owners it touched
+(ledger.post_many). A publication is only a wake-up: each open stream of
+a woken user re-reads that user's Transaction rows past the last event
+it sent, ordered by journal entry id, which doubles as the SSE event id.
+Bursts therefore coalesce into one query, nothing is lost between a
+wake-up and the read, and a client reconnecting with Last-Event-ID gets
+exactly what it missed from the same query. Per wallet, entry ids grow
+in commit order because post_many locks the wallet before inserting the
+entry (credits to sharded wallets are not locked and may land out of
+order; the balance event that follows every wake-up still corrects the
+total).
+
+Publications cross processes through a pluggable fanout (EVENTS_FANOUT):
+
+- PostgresFanout: NOTIFY inside the posting's transaction, so listeners
+  hear about a posting only once it commits; one LISTEN connection per
+  process hands the ids to the in-process hub.
+- LocalFanout: on_commit straight into the hub. Only sees postings made
+  by the same process (single-worker dev servers, tests).
+"""
+import asyncio
+import functools
+import json
+import logging
+import select
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, connections, transaction
+from django.utils.module_loading import import_string
+
+from .models import Transaction
+
+logger = logging.getLogger(__name__)
+
+EVENT_FIELDS = ("journal_entry_id", "reference", "type", "amount", "balance_after", "description", "date", "points")
+# Postgres caps a NOTIFY payload at 8000 bytes
+NOTIFY_CHUNK = 500
+
+
+# --------------------------
+# IN-PROCESS HUB
+# --------------------------
+class Subscription:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.wake = asyncio.Event()
+
+    def notify(self):
+        try:
+            self.loop.call_soon_threadsafe(self.wake.set)
+        except RuntimeError:  # loop already closed
+            pass
+
+
+class Hub:
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+
+    def notify(self, user_ids):
+        with self._lock:
+            woken = [s for user_id in user_ids for s in self._subscriptions.get(user_id, ())]
+        for subscription in woken:
+            subscription.notify()
+
+    def notify_all(self):
+        with self._lock:
+            woken = [s for subscriptions in self._subscriptions.values() for s in subscriptions]
+        for subscription in woken:
+            subscription.notify()
+
+
+hub = Hub()
+
+
+# --------------------------
+# FANOUT
+# --------------------------
+class LocalFanout:
+    def publish(self, user_ids):
+        transaction.on_commit(lambda: hub.notify(user_ids))
+
+    def listen(self, target):
+        pass
+
+
+class PostgresFanout:
+    def publish(self, user_ids):
+        ids = sorted(user_ids)
+        with connection.cursor() as cursor:
+            for i in range(0, len(ids), NOTIFY_CHUNK):
+                cursor.execute(
+                    "SELECT pg_notify(%s, %s)",
+                    [settings.EVENTS_CHANNEL, ",".join(map(str, ids[i:i + NOTIFY_CHUNK]))],
+                )
+
+    def listen(self, target):
+        threading.Thread(target=self._listen, args=(target,), name="events-listener", daemon=True).start()
+
+    def _listen(self, target):
+        while True:
+            wrapper = connections.create_connection("default")
+            try:
+                wrapper.ensure_connection()
+                raw = wrapper.connection
+                raw.autocommit = True
+                with raw.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{settings.EVENTS_CHANNEL}"')
+                # Anything published while we were not listening is re-read
+                target.notify_all()
+                while True:
+                    if select.select([raw], [], [], 60) == ([], [], []):
+                        continue
+                    raw.poll()
+                    user_ids = set()
+                    while raw.notifies:
+                        payload = raw.notifies.pop(0).payload
+                        user_ids.update(int(i) for i in payload.split(",") if i)
+                    target.notify(user_ids)
+            except Exception:
+                logger.exception("Event listener lost its connection; reconnecting")
+                time.sleep(1)
+            finally:
+                wrapper.close()
+
+
+@functools.cache
+def fanout():
+    return import_string(settings.EVENTS_FANOUT)()
+
+
+_listening = False
+_listen_lock = threading.Lock()
+
+
+def _ensure_listening():
+    global _listening
+    if _listening:
+        return
+    with _listen_lock:
+        if not _listening:
+            fanout().listen(hub)
+            _listening = True
+
+
+def publish(user_ids):
+    """Tell open streams of ``user_ids`` that their wallets moved (once the transaction commits)."""
+    if user_ids:
+        fanout().publish(set(user_ids))
+
+
+# --------------------------
+# STREAM
+# --------------------------
+def format_event(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data, cls=DjangoJSONEncoder)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+def pooled(func):
+    """
+    Run a read on the shared executor rather than the request's thread.
+    Django's ASGI handler gives each request a thread whose connection
+    lives as long as the request, so reads made there would hold a DB
+    connection for a stream's whole life; the executor's few threads keep
+    theirs and share them across all streams.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        def call():
+            try:
+                return func(*args, **kwargs)
+            except DatabaseError:
+                connection.close()
+                raise
+        return await sync_to_async(call, thread_sensitive=False)()
+    return wrapper
+
+
+def _balance(user_id):
+    from . import ledger  # ledger publishes through this module
+
+    return ledger.wallet_balance(user_id)
+
+
+@pooled
+def _snapshot(user_id):
+    """(latest journal entry id, balance) for a stream starting now."""
+    latest = Transaction.objects.filter(user_id=user_id, journal_entry__isnull=False).order_by(
+        "-journal_entry_id",
+    ).values_list("journal_entry_id", flat=True).first()
+    return latest or 0, _balance(user_id)
+
+
+@pooled
+def _catch_up(user_id, last_id):
+    """(up to EVENTS_REPLAY_LIMIT transactions after ``last_id``, balance)."""
+    rows = Transaction.objects.filter(user_id=user_id, journal_entry_id__gt=last_id).order_by("journal_entry_id")
+    return list(rows.values(*EVENT_FIELDS)[:settings.EVENTS_REPLAY_LIMIT]), _balance(user_id)
+
+
+async def stream(user_id, last_id=None):
+    """
+    SSE body for one user: a balance snapshot (or a replay after
+    ``last_id``), then a transaction event per posting as it commits, a
+    comment every EVENTS_HEARTBEAT_SECONDS, and a close after
+    EVENTS_MAX_STREAM_SECONDS so clients reconnect (and resume) elsewhere.
+    """
+    _ensure_listening()
+    # Subscribe before the first read so no posting falls between the two
+    subscription = hub.subscribe(user_id)
+    try:
+        yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+        if last_id is None:
+            last_id, balance = await _snapshot(user_id)
+            yield format_event("balance", {"balance": balance}, last_id)
+        else:
+            subscription.wake.set()
+            balance = None
+
+        deadline = time.monotonic() + settings.EVENTS_MAX_STREAM_SECONDS
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                await asyncio.wait_for(
+                    subscription.wake.wait(), min(settings.EVENTS_HEARTBEAT_SECONDS, remaining),
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            subscription.wake.clear()
+
+            while True:
+                rows, current = await _catch_up(user_id, last_id)
+                for row in rows:
+                    last_id = row.pop("journal_entry_id")
+                    yield format_event("transaction", row, last_id)
+                if len(rows) < settings.EVENTS_REPLAY_LIMIT:
+                    break
+            # Postings without a Transaction row (or sharded credits) still move the balance
+            if current != balance:
+                balance = current
+                yield format_event("balance", {"balance": balance})
+    finally:
+        hub.unsubscribe(subscription)
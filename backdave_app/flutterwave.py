@@ -0,0 +1,416 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import uuid
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from . import fx, ledger
+from .models import Transaction, VerifyLease
+
+logger = logging.getLogger(__name__)
+
+VERIFY_TIMEOUT = 10
+
+# One pooled httpx client per event loop (uvicorn runs one loop per worker)
+_async_clients = weakref.WeakKeyDictionary()
+
+# Verify answers that will not change, and so may be reused
+TERMINAL_STATUSES = ("successful", "failed")
+LEASE_POLL = 0.05
+MIN_TOP_UP = 100  # in BASE_CURRENCY
+
+# tx_ref -> (lock, holders and waiters); per event loop for the async views
+_flights = {}
+_flights_lock = threading.Lock()
+_async_flights = weakref.WeakKeyDictionary()
+
+
+# --------------------------
+# FLUTTERWAVE API
+# --------------------------
+def _headers():
+    return {"Authorization": f"Bearer {settings.FLUTTERWAVE_SECRET_KEY}"}
+
+
+def verify_url(flw_id):
+    return f"{settings.FLUTTERWAVE_BASE_URL}/transactions/{flw_id}/verify"
+
+
+def verify_by_reference_url(tx_ref):
+    return f"{settings.FLUTTERWAVE_BASE_URL}/transactions/verify_by_reference?tx_ref={tx_ref}"
+
+
+def verify_transaction(flw_id, timeout=VERIFY_TIMEOUT, session=None):
+    import requests
+    http = session or requests
+    return http.get(verify_url(flw_id), headers=_headers(), timeout=timeout).json()
+
+
+def verify_by_reference(tx_ref, timeout=VERIFY_TIMEOUT, session=None):
+    import requests
+    http = session or requests
+    return http.get(verify_by_reference_url(tx_ref), headers=_headers(), timeout=timeout).json()
+
+
+def resolve_account(account_number, bank_code, timeout=VERIFY_TIMEOUT, session=None):
+    """Name enquiry; the HTTP status is returned as ``_http_status`` (400 = no such account)."""
+    import requests
+    http = session or requests
+    res = http.post(
+        f"{settings.FLUTTERWAVE_BASE_URL}/accounts/resolve",
+        json={"account_number": account_number, "account_bank": bank_code},
+        headers=_headers(), timeout=timeout,
+    )
+    return {**res.json(), "_http_status": res.status_code}
+
+
+def _async_client():
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(timeout=VERIFY_TIMEOUT, headers=_headers())
+        _async_clients[loop] = client
+    return client
+
+
+async def averify_transaction(flw_id):
+    res = await _async_client().get(verify_url(flw_id))
+    return res.json()
+
+
+async def averify_by_reference(tx_ref):
+    res = await _async_client().get(verify_by_reference_url(tx_ref))
+    return res.json()
+
+
+# --------------------------
+# SINGLE-FLIGHT VERIFY
+# --------------------------
+# The client's redirect (verify view) and the webhook usually arrive
+# together for the same tx_ref. Both verify and settle inside
+# single_flight(tx_ref): one goes ahead while the others wait, on a lock
+# within the process and on a lease across workers (a Postgres advisory
+# lock, else a VerifyLease row), and then find the row processed without going
+# upstream or queueing on its row lock. Terminal verify answers are cached
+# briefly for callers that still need one (a failed payment, a leader that
+# gave up).
+@contextmanager
+def single_flight(tx_ref):
+    with _flights_lock:
+        lock, users = _flights.get(tx_ref, (None, 0))
+        lock = lock or threading.Lock()
+        _flights[tx_ref] = (lock, users + 1)
+    try:
+        with lock:
+            lease = _acquire_lease(tx_ref)
+            try:
+                yield
+            finally:
+                _release_lease(tx_ref, lease)
+    finally:
+        with _flights_lock:
+            _leave(_flights, tx_ref)
+
+
+@asynccontextmanager
+async def asingle_flight(tx_ref):
+    flights = _async_flights.setdefault(asyncio.get_running_loop(), {})
+    lock, users = flights.get(tx_ref, (None, 0))
+    lock = lock or asyncio.Lock()
+    flights[tx_ref] = (lock, users + 1)
+    try:
+        async with lock:
+            # On the request's thread, so the advisory lock and settlement share a connection
+            lease = await sync_to_async(_acquire_lease)(tx_ref)
+            try:
+                yield
+            finally:
+                await sync_to_async(_release_lease)(tx_ref, lease)
+    finally:
+        _leave(flights, tx_ref)
+
+
+def _leave(flights, tx_ref):
+    lock, users = flights[tx_ref]
+    if users == 1:
+        del flights[tx_ref]
+    else:
+        flights[tx_ref] = (lock, users - 1)
+
+
+def _advisory_key(tx_ref):
+    return int.from_bytes(hashlib.sha256(tx_ref.encode()).digest()[:8], "big", signed=True)
+
+
+def _acquire_lease(tx_ref):
+    """
+    Wait while another worker holds tx_ref, at most
+    FLUTTERWAVE_VERIFY_LEASE_SECONDS. Returns the lease, or None if the
+    holder never let go: then go ahead anyway, the row lock still keeps
+    settlement single.
+    """
+    deadline = time.monotonic() + settings.FLUTTERWAVE_VERIFY_LEASE_SECONDS
+    if connection.vendor == "postgresql":
+        # Session-level: freed with the connection if this process dies
+        key = _advisory_key(tx_ref)
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+                if cursor.fetchone()[0]:
+                    return key
+                if time.monotonic() >= deadline:
+                    return None
+                time.sleep(LEASE_POLL)
+
+    # A row in the shared database, not the cache: LocMemCache is per process
+    token = uuid.uuid4().hex
+    while not _claim_lease_row(tx_ref, token):
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(LEASE_POLL)
+    return token
+
+
+def _claim_lease_row(tx_ref, token):
+    now = timezone.now()
+    # A holder that died keeps its row only until it expires
+    VerifyLease.objects.filter(tx_ref=tx_ref, expires_at__lte=now).delete()
+    try:
+        with transaction.atomic():
+            VerifyLease.objects.create(
+                tx_ref=tx_ref, token=token,
+                expires_at=now + timedelta(seconds=settings.FLUTTERWAVE_VERIFY_LEASE_SECONDS),
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def _release_lease(tx_ref, lease):
+    if lease is None:
+        return
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [lease])
+    else:
+        VerifyLease.objects.filter(tx_ref=tx_ref, token=lease).delete()
+
+
+def _result_key(tx_ref):
+    return f"flw_verify:{tx_ref}"
+
+
+def verified(tx_ref, flw_id=None):
+    """
+    Flutterwave's ``data`` for a payment: verified by flw_id when the
+    webhook supplied one, else by tx_ref. Terminal answers are cached for
+    FLUTTERWAVE_VERIFY_CACHE_SECONDS.
+    """
+    data = _reusable(cache.get(_result_key(tx_ref)), flw_id)
+    if data is None:
+        res = verify_transaction(flw_id) if flw_id else verify_by_reference(tx_ref)
+        data = res.get("data") or {}
+        if _cacheable(tx_ref, data):
+            cache.set(_result_key(tx_ref), data, settings.FLUTTERWAVE_VERIFY_CACHE_SECONDS)
+    return data
+
+
+async def averified(tx_ref, flw_id=None):
+    data = _reusable(await cache.aget(_result_key(tx_ref)), flw_id)
+    if data is None:
+        res = await (averify_transaction(flw_id) if flw_id else averify_by_reference(tx_ref))
+        data = res.get("data") or {}
+        if _cacheable(tx_ref, data):
+            await cache.aset(_result_key(tx_ref), data, settings.FLUTTERWAVE_VERIFY_CACHE_SECONDS)
+    return data
+
+
+def _reusable(data, flw_id):
+    # An answer fetched by reference serves the webhook only for the same Flutterwave id
+    if data is None or (flw_id is not None and str(data.get("id")) != str(flw_id)):
+        return None
+    return data
+
+
+def _cacheable(tx_ref, data):
+    return data.get("status") in TERMINAL_STATUSES and data.get("tx_ref") == tx_ref
+
+
+# --------------------------
+# SETTLEMENT
+# --------------------------
+# Shared by the sync and async views. Each returns (body, status) so the
+# caller can wrap it in JsonResponse or a DRF Response. A top-up paid in
+# another currency is converted when it posts; without a fresh rate it
+# stays pending (503) and is settled on the next webhook retry or sweep.
+SETTLED_FIELDS = ["flw_id", "flw_status", "processed", "journal_entry", "balance_after", "amount", "fx_rate"]
+
+
+def charged(tx):
+    """What Flutterwave should have collected for ``tx``, in tx.flw_currency."""
+    return tx.amount if tx.flw_amount is None else tx.flw_amount
+
+
+def create_top_up(user, amount, currency=None, **fields):
+    """
+    A pending "Add Money" row for ``amount`` of ``currency`` (default: the
+    wallet's), one of TOP_UP_CURRENCIES. Paid in another currency, its
+    amount is only indicative until it posts. Raises ValueError (or
+    fx.StaleRates) for an invalid request.
+    """
+    wallet = ledger.wallet_for(user)
+    currency = currency or wallet.currency
+    if currency not in settings.TOP_UP_CURRENCIES:
+        raise fx.UnsupportedCurrency(f"Top-ups in {currency} are not supported")
+    try:
+        amount = fx.quantize(str(amount), currency)
+    except InvalidOperation:
+        raise ValueError("Invalid amount")
+    if not amount or fx.to_base(amount, currency) < MIN_TOP_UP:
+        raise ValueError("Invalid amount")
+
+    if currency != wallet.currency:
+        fields["flw_amount"] = amount
+        amount = fx.convert(amount, currency, wallet.currency)[0]
+    return Transaction.objects.create(
+        user=user, type="Add Money", amount=amount, flw_status="pending", flw_currency=currency, **fields,
+    )
+
+
+def settle_webhook_payment(tx_ref, flw_id, verified_data):
+    with transaction.atomic():
+        tx = Transaction.objects.select_for_update().filter(flw_tx_ref=tx_ref).first()
+        if not tx:
+            logger.warning("Transaction not found for tx_ref=%s", tx_ref)
+            return {"error": "Transaction not found"}, 404
+
+        # Idempotency check
+        if tx.processed:
+            logger.info("Transaction already processed: tx_ref=%s", tx_ref)
+            return {"status": "already_processed"}, 200
+
+        # Validate amount and currency
+        if Decimal(verified_data.get("amount")) != charged(tx):
+            logger.error("Amount mismatch for tx_ref=%s: expected %s, got %s", tx_ref, charged(tx), verified_data.get("amount"))
+            return {"error": "Amount mismatch"}, 400
+        if verified_data.get("currency") != tx.flw_currency:
+            logger.error("Currency mismatch for tx_ref=%s: expected %s, got %s", tx_ref, tx.flw_currency, verified_data.get("currency"))
+            return {"error": "Currency mismatch"}, 400
+
+        # Credit wallet
+        tx.flw_id = flw_id
+        tx.flw_status = "successful"
+        tx.processed = True
+        try:
+            tx.journal_entry, tx.balance_after = ledger.post_transaction(tx)
+        except fx.FxError as e:
+            transaction.set_rollback(True)
+            logger.warning("Cannot convert tx_ref=%s yet: %s", tx_ref, e)
+            return {"error": str(e)}, 503
+        tx.save(update_fields=SETTLED_FIELDS)
+
+        logger.info("Transaction processed successfully: tx_ref=%s, amount=%s", tx_ref, tx.amount)
+
+    return {"status": "success"}, 200
+
+
+def settle_reference_payment(user, tx, data):
+    if not data or data.get("status") != "successful":
+        return {"error": "Payment not successful"}, 400
+
+    if Decimal(str(data["amount"])) != charged(tx):
+        return {"error": "Amount mismatch"}, 400
+    if data.get("currency") != tx.flw_currency:
+        logger.error("Currency mismatch for tx_ref=%s: expected %s, got %s", tx.flw_tx_ref, tx.flw_currency, data.get("currency"))
+        return {"error": "Currency mismatch"}, 400
+
+    # Credit wallet
+    with transaction.atomic():
+        tx = Transaction.objects.select_for_update().get(pk=tx.pk)
+        if tx.processed:
+            # The webhook settled it while we were verifying
+            return {"status": "already_processed"}, 200
+
+        tx.user = user
+        tx.flw_id = data["id"]
+        tx.flw_status = "successful"
+        tx.processed = True
+        try:
+            tx.journal_entry, tx.balance_after = ledger.post_transaction(tx)
+        except fx.FxError as e:
+            transaction.set_rollback(True)
+            return {"error": str(e)}, 503
+        tx.save(update_fields=SETTLED_FIELDS)
+
+    return {"success": True, "balance": str(user.balance)}, 200
+
+
+def settle_verified_batch(verified):
+    """
+    Settle many verified top-ups at once (used by sweep_pending_payments).
+
+    ``verified`` maps transaction id -> Flutterwave ``data`` payload already
+    checked against the row. Rows the webhook or verify view settled in the
+    meantime are skipped under the row lock; the credits go through one
+    ledger batch. A row that cannot post (no fresh rate for its currency)
+    is left pending for the next sweep without holding back the others.
+    Returns (rows settled, rows left pending).
+    """
+    with transaction.atomic():
+        txs = list(
+            Transaction.objects.select_for_update(of=("self",))
+            .select_related("user")
+            .filter(id__in=verified, processed=False)
+        )
+        ready, skipped = [], 0
+        for tx in txs:
+            tx.flw_id = verified[tx.id].get("id")
+            tx.flw_status = "successful"
+            tx.processed = True
+            try:
+                ledger.price(tx)
+            except fx.FxError as e:
+                logger.warning("Cannot convert tx_ref=%s yet: %s", tx.flw_tx_ref, e)
+                skipped += 1
+            else:
+                ready.append(tx)
+
+        try:
+            with transaction.atomic():
+                ledger.post_transactions(ready)
+        except ValueError:
+            # Something in the batch cannot post: settle the rows one by one
+            settled = []
+            for tx in ready:
+                try:
+                    with transaction.atomic():
+                        ledger.post_transactions([tx])
+                except ValueError as e:
+                    logger.warning("Cannot settle tx_ref=%s: %s", tx.flw_tx_ref, e)
+                    skipped += 1
+                else:
+                    settled.append(tx)
+            ready = settled
+        Transaction.objects.bulk_update(ready, SETTLED_FIELDS)
+
+    return len(ready), skipped
+
+
+def close_pending(ids, flw_status):
+    """Mark still-pending rows as failed/expired in one UPDATE."""
+    return Transaction.objects.filter(
+        id__in=ids, processed=False, flw_status="pending",
+    ).update(flw_status=flw_status)
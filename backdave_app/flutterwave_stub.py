@@ -0,0 +1,97 @@
+"""
+Local stand-in for the Flutterwave verify API.
+
+Serves ``/v3/transactions/<id>/verify`` and
+``/v3/transactions/verify_by_reference?tx_ref=...`` with a configurable
+latency so load tests and dev setups never hit the real API. Point
+``FLUTTERWAVE_BASE_URL`` at ``stub.base_url``.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+VERIFY_PATH = re.compile(r"^/v3/transactions/(?P<flw_id>[^/]+)/verify$")
+VERIFY_BY_REFERENCE_PATH = "/v3/transactions/verify_by_reference"
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # load tests open hundreds of connections at once
+
+
+class FlutterwaveStub:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0,
+                 amount="1000.00", currency="NGN", status="successful"):
+        self.latency = latency
+        self.defaults = {"amount": amount, "currency": currency, "status": status}
+        # tx_ref -> overrides for the default payload (amount, status, ...)
+        self.payments = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v3"
+
+    def payment(self, flw_id=None, tx_ref=None):
+        data = {"id": flw_id, "tx_ref": tx_ref, "payment_type": "card", **self.defaults}
+        data.update(self.payments.get(tx_ref, {}))
+        if data["id"] is None:
+            data["id"] = abs(hash(tx_ref)) % 10 ** 9
+        return {"status": "success", "message": "Transaction fetched successfully", "data": data}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.calls += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                url = urlparse(self.path)
+                match = VERIFY_PATH.match(url.path)
+                if url.path == VERIFY_BY_REFERENCE_PATH:
+                    tx_ref = parse_qs(url.query).get("tx_ref", [None])[0]
+                    body, code = stub.payment(tx_ref=tx_ref), 200
+                elif match:
+                    body, code = stub.payment(flw_id=match["flw_id"]), 200
+                else:
+                    body, code = {"status": "error", "message": "Not found"}, 404
+
+                raw = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,238 @@
+"""
+Fraud scoring for debits.
+
+Each debit is described by FEATURES, computed from the user's history
+before it:
+
+- amount_z: standard score of the amount against the user's past debits
+- log_amount: log(1 + amount)
+- new_recipient: 1 if the user has not paid this recipient before
+- burst: debits in the previous FRAUD_BURST_WINDOW_SECONDS (max BURST_MAX)
+- first_transaction: 1 for the user's first debit
+
+Inline, the history is a RiskProfile row (running count/sum/sum of
+squares, recent timestamps, recent recipients), updated with every debit
+and never recomputed from Transaction rows. Transaction.save calls
+assess() after the ledger posting; scores at or above FRAUD_BLOCK_SCORE
+roll the debit back. rescore() recomputes the same features for a whole
+date range with NumPy (grouped cumulative sums, searchsorted) and scores
+it in one call per chunk of users.
+
+The model is pluggable (FRAUD_SCORER): any class with
+score(features: ndarray[n, len(FEATURES)]) -> ndarray[n].
+"""
+import functools
+import logging
+import time
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .ledger import DEBIT_TYPES
+from .models import RiskProfile, Transaction
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ("amount_z", "log_amount", "new_recipient", "burst", "first_transaction")
+BURST_MAX = 20
+MAX_RECIPIENTS = 100
+
+
+class FraudSuspected(ValueError):
+    pass
+
+
+# --------------------------
+# MODEL
+# --------------------------
+class LogisticScorer:
+    def __init__(self, model=None):
+        model = model or settings.FRAUD_MODEL
+        self.bias = float(model["bias"])
+        self.weights = np.array([float(model["weights"].get(name, 0)) for name in FEATURES])
+
+    def score(self, features):
+        return 1.0 / (1.0 + np.exp(-(features @ self.weights + self.bias)))
+
+
+@functools.cache
+def scorer():
+    return import_string(settings.FRAUD_SCORER)()
+
+
+def feature_matrix(count, amount_sum, amount_sumsq, amount, burst, new_recipient):
+    """FEATURES as an (n, k) array; all arguments are length-n arrays of prior history."""
+    count = np.asarray(count, dtype=float)
+    safe = np.maximum(count, 1)
+    mean = amount_sum / safe
+    std = np.sqrt(np.maximum(amount_sumsq / safe - mean ** 2, 0))
+    # Floor the spread so a user with identical past amounts is not infinitely surprised
+    std = np.maximum(std, np.maximum(0.1 * mean, 1.0))
+    amount_z = np.where(count >= 2, (amount - mean) / std, 0.0)
+    return np.column_stack([
+        np.clip(amount_z, -10, 10),
+        np.log1p(amount),
+        new_recipient,
+        np.minimum(burst, BURST_MAX),
+        (count == 0).astype(float),
+    ])
+
+
+def recipient_key(counterparty_id, account_number, phone, recipient):
+    """Stable 32-bit id of who a debit pays, or 0 when it names nobody."""
+    if counterparty_id:
+        raw = f"u:{counterparty_id}"
+    else:
+        raw = "|".join(str(v).strip().lower() for v in (account_number, phone, recipient) if v)
+    if not raw:
+        return 0
+    return zlib.crc32(raw.encode()) or 1
+
+
+# --------------------------
+# INLINE
+# --------------------------
+def assess(tx):
+    """Score ``tx`` against its user's profile, record it, and refuse it if the score is too high."""
+    started = time.perf_counter()
+    profile, _ = RiskProfile.objects.select_for_update().get_or_create(user_id=tx.user_id)
+
+    now = tx.date.timestamp()
+    amount = float(tx.amount)
+    key = recipient_key(tx.counterparty_id, tx.account_number, tx.phone, tx.recipient)
+    window_start = now - settings.FRAUD_BURST_WINDOW_SECONDS
+    recent = [t for t in profile.recent_times if t >= window_start]
+    features = feature_matrix(*(np.array([value], dtype=float) for value in (
+        profile.count, profile.amount_sum, profile.amount_sumsq, amount,
+        len(recent), bool(key) and key not in profile.recipients,
+    )))
+    tx.risk_score = float(scorer().score(features)[0])
+
+    elapsed = (time.perf_counter() - started) * 1000
+    if elapsed > settings.FRAUD_INLINE_BUDGET_MS:
+        logger.warning("Fraud scoring took %.1f ms for user %s", elapsed, tx.user_id)
+    if tx.risk_score >= settings.FRAUD_BLOCK_SCORE:
+        logger.warning("Blocked %s of %s for user %s (risk %.3f)", tx.type, tx.amount, tx.user_id, tx.risk_score)
+        raise FraudSuspected("This transaction was declined for your security. Contact support.")
+
+    profile.count += 1
+    profile.amount_sum += amount
+    profile.amount_sumsq += amount * amount
+    profile.recent_times = (recent + [now])[-BURST_MAX:]
+    if key:
+        recipients = [k for k in profile.recipients if k != key]
+        profile.recipients = (recipients + [key])[-MAX_RECIPIENTS:]
+    profile.save()
+    return tx.risk_score
+
+
+# --------------------------
+# BATCH
+# --------------------------
+def _group_starts(user_ids):
+    """For each row of a user-sorted array, the index of that user's first row."""
+    boundary = np.r_[True, user_ids[1:] != user_ids[:-1]]
+    return np.maximum.accumulate(np.where(boundary, np.arange(len(user_ids)), 0))
+
+
+def _prior_cumsum(values, starts):
+    """Per-group running sum of the rows before each row."""
+    total = np.cumsum(values)
+    return total - values - (total[starts] - values[starts])
+
+
+def score_rows(user_ids, times, amounts, keys, baseline):
+    """
+    Vectorized scores for debits sorted by (user, time). ``baseline`` maps
+    user id -> (count, sum, sum of squares) of that user's earlier debits.
+    """
+    starts = _group_starts(user_ids)
+    position = np.arange(len(user_ids)) - starts
+    base = np.array([baseline.get(u, (0, 0.0, 0.0)) for u in user_ids.tolist()], dtype=float).reshape(-1, 3)
+
+    count = position + base[:, 0]
+    amount_sum = _prior_cumsum(amounts, starts) + base[:, 1]
+    amount_sumsq = _prior_cumsum(amounts ** 2, starts) + base[:, 2]
+
+    # Debits in the window before each row: rank of (user, time - window) among (user, time)
+    _, user_rank = np.unique(user_ids, return_inverse=True)
+    stamp = user_rank * 1e10 + times
+    burst = np.arange(len(times)) - np.searchsorted(stamp, stamp - settings.FRAUD_BURST_WINDOW_SECONDS, "left")
+
+    pair = user_rank.astype(np.int64) << 32 | keys
+    new_recipient = np.zeros(len(keys))
+    new_recipient[np.unique(pair, return_index=True)[1]] = 1
+    new_recipient[keys == 0] = 0
+
+    features = feature_matrix(count, amount_sum, amount_sumsq, amounts, burst, new_recipient)
+    return scorer().score(features)
+
+
+def rescore(since, until=None, users_per_chunk=5000, progress=None):
+    """
+    Recompute risk_score for every debit dated in [since, until), a chunk
+    of users at a time. Each user's earlier debits form the baseline; the
+    new-recipient flag only looks inside the range. Returns rows scored.
+    """
+    until = until or timezone.now()
+    debits = Transaction.objects.filter(type__in=DEBIT_TYPES)
+    in_range = debits.filter(date__gte=since, date__lt=until)
+    user_ids = in_range.order_by("user_id").values_list("user_id", flat=True).distinct()
+
+    scored, after = 0, 0
+    while True:
+        chunk = list(user_ids.filter(user_id__gt=after)[:users_per_chunk])
+        if not chunk:
+            return scored
+        after = chunk[-1]
+
+        rows = list(
+            in_range.filter(user_id__in=chunk).order_by("user_id", "date", "id").values_list(
+                "id", "user_id", "date", "amount", "counterparty_id", "account_number", "phone", "recipient",
+            )
+        )
+        baseline = {
+            r["user_id"]: (r["n"], float(r["s"] or 0), float(r["ss"] or 0))
+            for r in _baseline(debits.filter(user_id__in=chunk, date__lt=since))
+        }
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        scores = score_rows(
+            np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((r[2].timestamp() for r in rows), dtype=float, count=len(rows)),
+            np.fromiter((r[3] for r in rows), dtype=float, count=len(rows)),
+            np.fromiter((recipient_key(*r[4:]) for r in rows), dtype=np.int64, count=len(rows)),
+            baseline,
+        )
+        _write_scores(ids, scores)
+        scored += len(rows)
+        if progress:
+            progress(scored, after)
+
+
+def _baseline(queryset):
+    return queryset.order_by().values("user_id").annotate(
+        n=Count("id"), s=Sum("amount"), ss=Sum(F("amount") * F("amount")),
+    )
+
+
+def _write_scores(ids, scores):
+    if not len(ids):
+        return
+    if connection.vendor == "postgresql":
+        table = Transaction._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET risk_score = v.score "
+                f"FROM unnest(%s::bigint[], %s::float8[]) AS v(id, score) WHERE {table}.id = v.id",
+                [ids.tolist(), scores.tolist()],
+            )
+        return
+    Transaction.objects.bulk_update(
+        [Transaction(id=i, risk_score=s) for i, s in zip(ids.tolist(), scores.tolist())],
+        ["risk_score"], batch_size=500,
+    )
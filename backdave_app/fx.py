@@ -0,0 +1,197 @@
+"""
+Currencies and exchange rates.
+
+Amounts are Decimals quantized to their currency's minor unit
+(CURRENCIES), with the ledger's usual half-even rounding. Rates are quoted
+against BASE_CURRENCY, as base units per one unit of the currency.
+
+refresh() (manage.py refresh_fx_rates, run from cron) asks the
+FX_RATES_PROVIDER for rates and publishes them as a new version of
+FxRate rows. Each process keeps the latest version in memory and looks
+for a newer one at most every FX_RATES_RELOAD_SECONDS, so conversions on
+the posting path read neither the database nor the provider per request.
+Rates older than FX_RATES_MAX_AGE_SECONDS are not used: conversions fail
+with StaleRates rather than credit a wallet at an old rate.
+"""
+import threading
+import time
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import FxRate
+
+RATE_PLACES = Decimal("0.00000001")  # FxRate.rate and Transaction.fx_rate: 8 dp
+
+
+class Currency(NamedTuple):
+    code: str
+    exponent: int  # digits after the point in the minor unit
+    symbol: str
+
+
+CURRENCIES = {c.code: c for c in (
+    Currency("NGN", 2, "₦"),
+    Currency("USD", 2, "$"),
+    Currency("GBP", 2, "£"),
+    Currency("EUR", 2, "€"),
+    Currency("GHS", 2, "GH₵"),
+    Currency("KES", 2, "KSh"),
+    Currency("ZAR", 2, "R"),
+    Currency("TZS", 2, "TSh"),
+    Currency("UGX", 0, "USh"),
+    Currency("RWF", 0, "FRw"),
+    Currency("XAF", 0, "FCFA"),
+    Currency("XOF", 0, "CFA"),
+)}
+
+
+class FxError(ValueError):
+    pass
+
+
+class UnsupportedCurrency(FxError):
+    pass
+
+
+class StaleRates(FxError):
+    """No rate set, or only one older than FX_RATES_MAX_AGE_SECONDS."""
+
+
+def currency(code):
+    try:
+        return CURRENCIES[code]
+    except KeyError:
+        raise UnsupportedCurrency(f"Unsupported currency: {code}")
+
+
+def quantize(amount, code):
+    """``amount`` rounded to the currency's minor unit."""
+    return Decimal(amount).quantize(Decimal(1).scaleb(-currency(code).exponent))
+
+
+def money(amount, code):
+    """``amount`` for descriptions: "₦1500.00", "$20.00", "USh5000"."""
+    return f"{currency(code).symbol}{quantize(amount, code)}"
+
+
+# --------------------------
+# PROVIDERS
+# --------------------------
+# A provider has fetch(base, codes) -> {code: base units per one unit}; it
+# may leave out codes it has no rate for and raises FxError on failure.
+class StubProvider:
+    """Local provider: the fixed FX_STUB_RATES."""
+
+    def fetch(self, base, codes):
+        if base != "NGN":
+            raise FxError("Stub rates are quoted in NGN")
+        rates = settings.FX_STUB_RATES
+        return {code: Decimal(str(rates[code])) for code in codes if code in rates}
+
+
+def provider():
+    return import_string(settings.FX_RATES_PROVIDER)()
+
+
+# --------------------------
+# RATE TABLE
+# --------------------------
+class RateTable(NamedTuple):
+    version: int
+    fetched_at: object  # datetime
+    rates: dict  # code -> Decimal base units per unit
+    checked: float  # time.monotonic() of the last look for a newer version
+
+
+_table = None
+_reload_lock = threading.Lock()
+
+
+def table():
+    """The latest published rates, reloaded when FX_RATES_RELOAD_SECONDS have passed."""
+    current = _table
+    if current is None or time.monotonic() - current.checked >= settings.FX_RATES_RELOAD_SECONDS:
+        with _reload_lock:
+            if _table is current:
+                _load(current)
+    return _table
+
+
+def _load(current):
+    global _table
+    version = FxRate.objects.aggregate(v=Max("version"))["v"]
+    if current is not None and version == current.version:
+        _table = current._replace(checked=time.monotonic())
+        return
+    rows = list(FxRate.objects.filter(version=version).values_list("currency", "rate", "fetched_at"))
+    _table = RateTable(
+        version=version or 0,
+        fetched_at=max((fetched for _, _, fetched in rows), default=None),
+        rates={code: rate for code, rate, _ in rows},
+        checked=time.monotonic(),
+    )
+
+
+def _quotes(source, target):
+    """Base units per one source and per one target unit, from the in-memory table."""
+    current = table()
+    base = settings.BASE_CURRENCY
+    age = None if current.fetched_at is None else (timezone.now() - current.fetched_at).total_seconds()
+    if age is None or age > settings.FX_RATES_MAX_AGE_SECONDS:
+        raise StaleRates("Exchange rates are not available right now, try again later")
+    try:
+        return tuple(Decimal(1) if code == base else current.rates[code] for code in (source, target))
+    except KeyError as e:
+        raise UnsupportedCurrency(f"No exchange rate for {e.args[0]}")
+
+
+def rate(source, target):
+    """Target units per one source unit."""
+    if source == target:
+        return Decimal(1)
+    source_rate, target_rate = _quotes(source, target)
+    return (source_rate / target_rate).quantize(RATE_PLACES)
+
+
+def convert(amount, source, target):
+    """(``amount`` of source in target, quantized; the rate applied, to RATE_PLACES)."""
+    if source == target:
+        return quantize(amount, target), Decimal(1)
+    source_rate, target_rate = _quotes(source, target)
+    return (
+        quantize(Decimal(amount) * source_rate / target_rate, target),
+        (source_rate / target_rate).quantize(RATE_PLACES),
+    )
+
+
+def to_base(amount, code):
+    return convert(amount, code, settings.BASE_CURRENCY)[0]
+
+
+# --------------------------
+# REFRESH
+# --------------------------
+def refresh():
+    """Fetch rates from the provider and publish them as a new version. Returns the version."""
+    base = settings.BASE_CURRENCY
+    codes = sorted(code for code in CURRENCIES if code != base)
+    rates = provider().fetch(base, codes)
+    if not rates:
+        raise FxError("The provider returned no rates")
+    fetched_at = timezone.now()
+    with transaction.atomic():
+        # A concurrent refresh taking the same version fails on the unique (version, currency)
+        version = (FxRate.objects.aggregate(v=Max("version"))["v"] or 0) + 1
+        FxRate.objects.bulk_create(
+            FxRate(version=version, currency=code, rate=Decimal(rate).quantize(RATE_PLACES), fetched_at=fetched_at)
+            for code, rate in rates.items() if code in CURRENCIES
+        )
+    _load(None)
+    return version
+
@@ -0,0 +1,151 @@
+"""
+Idempotency-Key support for money-moving POST endpoints.
+
+The first request with a given key claims it (one INSERT on the
+(user, key) unique index); retries are answered with one indexed read of
+that row and replay the stored response without running the view again.
+5xx responses and exceptions release the key so the client can retry. A
+claim left by a request that died mid-flight (a killed worker) is taken
+over by the first retry after IDEMPOTENCY_CLAIM_TIMEOUT.
+"""
+import functools
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def request_hash(request):
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.path}\n".encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def claim(user, key, body_hash):
+    """
+    Claim ``key`` for ``user``. Returns ``(record, replay)``: when ``replay``
+    is true ``record`` holds the stored response to send back instead of
+    running the request.
+    """
+    if len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(f"{HEADER} must be at most {MAX_KEY_LENGTH} characters", 400)
+
+    now = timezone.now()
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record and record.expires_at <= now:
+        record.delete()
+        record = None
+
+    if record is None:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user, key=key, request_hash=body_hash, claimed_at=now,
+                    expires_at=now + settings.IDEMPOTENCY_KEY_TTL,
+                )
+            return record, False
+        except IntegrityError:
+            # A concurrent request claimed it between our read and insert
+            raise IdempotencyError("A request with this Idempotency-Key is in progress", 409)
+
+    if record.request_hash != body_hash:
+        raise IdempotencyError(f"{HEADER} was already used for a different request", 422)
+    if record.status_code is None:
+        if record.claimed_at > now - settings.IDEMPOTENCY_CLAIM_TIMEOUT or not _take_over(record, now):
+            raise IdempotencyError("A request with this Idempotency-Key is in progress", 409)
+        return record, False
+    return record, True
+
+
+def _take_over(record, now):
+    """Move a stale claim to this request; only one of several racing retries gets it."""
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, status_code__isnull=True, claimed_at=record.claimed_at,
+    ).update(claimed_at=now)
+    record.claimed_at = now
+    return taken == 1
+
+
+def _claimed(record):
+    # The row, as long as this request still holds the claim
+    return IdempotencyKey.objects.filter(pk=record.pk, claimed_at=record.claimed_at)
+
+
+def release(record):
+    _claimed(record).delete()
+
+
+def store(record, body, status_code):
+    if status_code >= 500:
+        release(record)
+        return
+    _claimed(record).update(status_code=status_code, response_body=body)
+
+
+def idempotent(view_method):
+    """Decorator for DRF APIView handlers."""
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+
+        try:
+            record, replay = claim(request.user, key, request_hash(request))
+        except IdempotencyError as e:
+            return Response({"error": e.message}, status=e.status)
+        if replay:
+            return Response(record.response_body, status=record.status_code, headers={REPLAY_HEADER: "true"})
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            release(record)
+            raise
+        store(record, response.data, response.status_code)
+        return response
+
+    return wrapper
+
+
+async def arun(request, user, handler):
+    """Async counterpart of ``idempotent`` for views that authenticate themselves."""
+    key = request.headers.get(HEADER)
+    if not key:
+        return await handler(request, user)
+
+    try:
+        record, replay = await sync_to_async(claim)(user, key, request_hash(request))
+    except IdempotencyError as e:
+        return JsonResponse({"error": e.message}, status=e.status)
+    if replay:
+        response = JsonResponse(record.response_body, status=record.status_code, safe=False)
+        response[REPLAY_HEADER] = "true"
+        return response
+
+    try:
+        response = await handler(request, user)
+    except Exception:
+        await sync_to_async(release)(record)
+        raise
+    await sync_to_async(store)(record, json.loads(response.content), response.status_code)
+    return response
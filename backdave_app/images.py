@@ -0,0 +1,163 @@
+"""
+Profile picture pipeline.
+
+Uploads are validated and re-encoded without metadata on the request
+thread: only the WebP display rendition is ever stored, so the original
+bytes (and any EXIF/GPS in them) never reach a public URL. The smaller
+renditions (THUMB_SIZES) are rendered from it by a background job once
+the request commits. Every name is content-hashed, so every URL handed
+out is immutable and can be cached forever; a replaced picture's files
+are deleted after the new one commits, unless another user shares them.
+"""
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from . import jobs
+
+UPLOAD_DIR = "profile_pics"
+ALLOWED_FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+# Largest rendition doubles as the display image stored in place of the upload
+THUMB_SIZES = (512, 256, 64)
+DISPLAY_SIZE = THUMB_SIZES[0]
+MAX_PIXELS = 40_000_000
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def validate_upload(upload):
+    """Return (raw bytes, extension) or raise InvalidImage."""
+    from PIL import Image
+
+    if upload.size > settings.PROFILE_PIC_MAX_BYTES:
+        raise InvalidImage(f"Image must be at most {settings.PROFILE_PIC_MAX_BYTES // (1024 * 1024)}MB")
+
+    raw = upload.read()
+    try:
+        with Image.open(io.BytesIO(raw)) as img:
+            fmt = img.format
+            if img.width * img.height > MAX_PIXELS:
+                raise InvalidImage("Image dimensions are too large")
+            img.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise InvalidImage("Upload a valid image file")
+
+    if fmt not in ALLOWED_FORMATS:
+        raise InvalidImage("Image must be JPEG, PNG, WebP or GIF")
+    return raw, ALLOWED_FORMATS[fmt]
+
+
+def content_digest(raw):
+    return hashlib.sha256(raw).hexdigest()[:20]
+
+
+def rendition_name(digest, size):
+    return f"{UPLOAD_DIR}/{digest}_{size}.webp"
+
+
+def render_thumbnails(raw, sizes=THUMB_SIZES):
+    """Re-encode to square WebP renditions; EXIF/ICC/XMP are not carried over."""
+    from PIL import Image, ImageOps
+
+    renditions = {}
+    with Image.open(io.BytesIO(raw)) as img:
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+        for size in sizes:
+            thumb = ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS)
+            buf = io.BytesIO()
+            thumb.save(buf, "WEBP", quality=82, method=4)
+            renditions[size] = buf.getvalue()
+    return renditions
+
+
+def _store(name, data):
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
+
+
+def save_upload(user, upload):
+    """
+    Validate ``upload`` and store its metadata-free display rendition on
+    ``user`` (unsaved). Call inside the transaction that saves the user;
+    the smaller renditions are queued, and the previous picture's files
+    deleted, after commit.
+    """
+    raw, _ = validate_upload(upload)
+    digest = content_digest(raw)
+    display = render_thumbnails(raw, sizes=(DISPLAY_SIZE,))[DISPLAY_SIZE]
+    name = _store(rendition_name(digest, DISPLAY_SIZE), display)
+    replaced = owned_files(user) if user.pk else set()
+    user.profilePic.name = name
+    user.profile_pic_thumbs = {str(DISPLAY_SIZE): name}
+
+    jobs.enqueue("render_profile_thumbnails", user_id=user.pk, source_name=name)
+    if replaced:
+        transaction.on_commit(lambda: delete_unreferenced(replaced))
+    return name
+
+
+def render_user_thumbnails(user_id, source_name):
+    """Render the smaller renditions of ``source_name`` and attach them to the user."""
+    from .models import User
+
+    if not User.objects.filter(id=user_id, profilePic=source_name).exists():
+        return  # replaced by a newer upload, whose files may be gone already
+    with default_storage.open(source_name) as f:
+        display = f.read()
+    digest = _digest(source_name)
+    thumbs = {str(DISPLAY_SIZE): source_name}
+    for size, data in render_thumbnails(display, sizes=THUMB_SIZES[1:]).items():
+        thumbs[str(size)] = _store(rendition_name(digest, size), data)
+
+    # Only attach if the user has not uploaded another picture meanwhile
+    User.objects.filter(id=user_id, profilePic=source_name).update(profile_pic_thumbs=thumbs)
+
+
+def thumbnail_urls(user):
+    """{size: storage URL} for the renditions that exist so far."""
+    return {size: default_storage.url(name) for size, name in (user.profile_pic_thumbs or {}).items()}
+
+
+def owned_files(user):
+    """
+    Stored names of ``user``'s picture and renditions that no other user
+    points at. Names are content hashes, so identical uploads share files.
+    """
+    from .models import User
+
+    names = {name for name in (user.profilePic.name, *(user.profile_pic_thumbs or {}).values()) if name}
+    shared = {
+        digest for digest in {_digest(name) for name in names}
+        if User.objects.exclude(pk=user.pk).filter(profilePic__startswith=f"{UPLOAD_DIR}/{digest}").exists()
+    }
+    return {name for name in names if _digest(name) not in shared}
+
+
+def delete_unreferenced(names):
+    """
+    Delete those of ``names`` whose picture no user points at any more.
+    Checked when called, as another user may have uploaded the same image
+    (or this user the same one again) meanwhile.
+    """
+    from .models import User
+
+    unused = {
+        digest for digest in {_digest(name) for name in names}
+        if not User.objects.filter(profilePic__startswith=f"{UPLOAD_DIR}/{digest}").exists()
+    }
+    for name in names:
+        if _digest(name) in unused:
+            default_storage.delete(name)
+
+
+def _digest(name):
+    # "profile_pics/<digest>.jpg" or "profile_pics/<digest>_<size>.webp"
+    return name.rsplit("/", 1)[-1].split("_")[0].split(".")[0]
@@ -0,0 +1,238 @@
+"""
+Balance integrity checks (manage.py check_balances).
+
+The ledger is the book of record: a wallet's balance is the sum of its
+postings in posting-id order, the order post_many applied them (see
+ledger.py). Transaction rows alone cannot explain a balance: opening
+balances and User.deposit/withdraw post without one, and a row's date is
+not the order its posting was applied in.
+
+check() verifies the wallets of an account id range in one snapshot, in
+two streaming passes read through a server-side cursor and checked a
+chunk at a time with NumPy, in integer kobo:
+
+- postings, ordered by (account, id):
+  - chain: each posting's balance_after is the running sum of the
+    account's postings up to it. Skipped for sharded accounts, whose
+    credits land outside the account lock;
+  - balance: an account's postings sum to its stored balance (base plus
+    shards);
+  - mirror: the owner's User.balance equals the base balance, which is
+    all the mirror holds (see ledger.wallet_balance);
+- transactions, hot and archived, joined to their wallet postings:
+  each has its posting's signed amount, owner and balance_after.
+
+check_balances --processes splits the wallet id range across processes.
+"""
+import itertools
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Case, Exists, F, OuterRef, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+
+from .ledger import DEBIT_TYPES
+from .models import ArchivedTransaction, BalanceShard, LedgerAccount, Posting, Transaction
+
+ISSUE_KINDS = ("chain", "balance", "mirror", "transaction")
+NULL = int(np.iinfo(np.int64).min)  # stands in for a NULL amount in the int64 arrays
+
+
+def kobo(field, per_naira=100):
+    """``field`` (naira, 2 dp) as integer kobo, NULL as NULL. per_naira=-100 negates."""
+    return Coalesce(
+        Cast(Round(F(field) * per_naira), BigIntegerField()), Value(NULL), output_field=BigIntegerField(),
+    )
+
+
+def _stream(queryset, chunk_size):
+    """
+    ``queryset``'s rows, all integers, as int64 arrays of up to chunk_size
+    rows. Reads through a server-side cursor on Postgres and skips the
+    ORM's per-row conversion.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while rows := cursor.fetchmany(chunk_size):
+            yield np.array(rows, dtype=np.int64)
+
+
+def _group_starts(keys):
+    """For each row of a key-sorted array, the index of its group's first row."""
+    boundary = np.r_[True, keys[1:] != keys[:-1]]
+    return np.maximum.accumulate(np.where(boundary, np.arange(len(keys)), 0))
+
+
+def _between(field, start, end):
+    """``field`` in [start, end), either end open if None."""
+    bounds = Q()
+    if start is not None:
+        bounds &= Q(**{f"{field}__gte": start})
+    if end is not None:
+        bounds &= Q(**{f"{field}__lt": end})
+    return bounds
+
+
+def wallets(start=None, end=None):
+    return LedgerAccount.objects.filter(_between("id", start, end), kind=LedgerAccount.WALLET)
+
+
+def wallet_ranges(parts):
+    """Split the wallet ids into ``parts`` [start, end) ranges of about as many accounts."""
+    ids = wallets().order_by("id").values_list("id", flat=True)
+    count = ids.count()
+    bounds = sorted({ids[count * i // parts] for i in range(1, parts)}) if count >= parts else []
+    edges = [None, *bounds, None]
+    return list(zip(edges, edges[1:]))
+
+
+# --------------------------
+# CHECK
+# --------------------------
+def check(start=None, end=None, chunk_size=50_000, samples=100, progress=None):
+    """
+    Check the wallets with ids in [start, end). Returns counts of rows
+    checked and issues by kind, plus up to ``samples`` issue details.
+    """
+    checker = _Checker(samples)
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            # Balances and transactions are read after the postings: all from one snapshot
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+
+        postings = Posting.objects.filter(_between("account_id", start, end), account__kind=LedgerAccount.WALLET)
+        postings = postings.order_by("account_id", "id").values_list(
+            "account_id", "id", kobo("amount"), kobo("balance_after"),
+        )
+        for chunk in _stream(postings, chunk_size):
+            checker.postings(chunk)
+            if progress:
+                progress(checker.result)
+        checker.finish_postings(start, end)
+
+        signed = Case(
+            When(type__in=DEBIT_TYPES, then=kobo("amount", -100)), default=kobo("amount"),
+            output_field=BigIntegerField(),
+        )
+        for model in (Transaction, ArchivedTransaction):
+            # One filter() call, so both conditions apply to the same posting
+            rows = model.objects.filter(
+                _between("journal_entry__postings__account_id", start, end),
+                journal_entry__postings__account__kind=LedgerAccount.WALLET,
+            ).values_list(
+                "id", "user_id", signed,
+                kobo("balance_after"), "journal_entry__postings__account_id",
+                "journal_entry__postings__account__user_id", kobo("journal_entry__postings__amount"),
+                kobo("journal_entry__postings__balance_after"),
+            )
+            for chunk in _stream(rows, chunk_size):
+                checker.transactions(chunk)
+                if progress:
+                    progress(checker.result)
+    return checker.result
+
+
+class _Checker:
+    def __init__(self, samples):
+        self.samples = samples
+        self.result = {
+            "postings": 0, "accounts": 0, "transactions": 0,
+            "issues": dict.fromkeys(ISSUE_KINDS, 0), "samples": [],
+        }
+        # Account the previous chunk ended in: (id, running total, its details)
+        self.open = None
+
+    def issue(self, kind, count=1, details=()):
+        self.result["issues"][kind] += count
+        room = self.samples - len(self.result["samples"])
+        self.result["samples"] += [{"kind": kind, **d} for d in itertools.islice(details, max(room, 0))]
+
+    def postings(self, chunk):
+        account, pk, amount, after = chunk.T
+        self.result["postings"] += len(chunk)
+        if self.open and account[0] != self.open[0]:
+            self._close(*self.open)
+            self.open = None
+
+        # Running balance per account, continuing the account the last chunk ended in
+        starts = _group_starts(account)
+        total = np.cumsum(amount)
+        running = total - (total[starts] - amount[starts])
+        if self.open:
+            running[starts == 0] += self.open[1]
+
+        details = self._accounts(int(account[0]), int(account[-1]))
+        sharded = np.isin(account, [i for i, d in details.items() if d["shard_count"]])
+        broken = np.flatnonzero((after != NULL) & (after != running) & ~sharded)
+        if len(broken):
+            self.issue("chain", len(broken), (
+                {"account": int(account[i]), "posting": int(pk[i]),
+                 "balance_after": after[i] / 100, "expected": running[i] / 100}
+                for i in broken
+            ))
+
+        # Every account but the last is complete; the last may go on in the next chunk
+        ends = np.r_[np.flatnonzero(account[1:] != account[:-1]), len(account) - 1]
+        for i in ends[:-1].tolist():
+            self._close(int(account[i]), int(running[i]), details[int(account[i])])
+        last = int(account[-1])
+        self.open = (last, int(running[-1]), details[last])
+
+    def finish_postings(self, start, end):
+        if self.open:
+            self._close(*self.open)
+            self.open = None
+        # Wallets without a single posting must be empty
+        idle = wallets(start, end).filter(~Exists(Posting.objects.filter(account=OuterRef("pk"))))
+        for row in self._account_rows(idle.filter(~Q(balance=0) | ~Q(user__balance=0))):
+            self._close(row["id"], 0, row)
+
+    def transactions(self, chunk):
+        tx_id, user, amount, after, account, owner, posted, posted_after = chunk.T
+        self.result["transactions"] += len(chunk)
+        broken = np.flatnonzero(
+            (user != owner) | (amount != posted) | ((after != NULL) & (posted_after != NULL) & (after != posted_after))
+        )
+        if len(broken):
+            self.issue("transaction", len(broken), (
+                {"transaction": int(tx_id[i]), "user": int(user[i]), "account": int(account[i]),
+                 "owner": int(owner[i]), "amount": amount[i] / 100, "posting_amount": posted[i] / 100,
+                 "balance_after": None if after[i] == NULL else after[i] / 100,
+                 "posting_balance_after": None if posted_after[i] == NULL else posted_after[i] / 100}
+                for i in broken
+            ))
+
+    def _close(self, account, total, details):
+        self.result["accounts"] += 1
+        stored = details["balance"] + details["shards"]
+        if total != stored:
+            self.issue("balance", details=[
+                {"account": account, "balance": stored / 100, "postings_sum": total / 100},
+            ])
+        if details["user_id"] and details["user_balance"] != details["balance"]:
+            self.issue("mirror", details=[
+                {"account": account, "user": details["user_id"],
+                 "user_balance": details["user_balance"] / 100, "balance": details["balance"] / 100},
+            ])
+
+    def _accounts(self, first, last):
+        """Details of the wallets with ids in [first, last], keeping those of the open account."""
+        known = {self.open[0]: self.open[2]} if self.open else {}
+        start = first + 1 if first in known else first
+        known.update((row["id"], row) for row in self._account_rows(wallets(start, last + 1)))
+        return known
+
+    def _account_rows(self, accounts):
+        rows = list(accounts.values(
+            "id", "user_id", "shard_count", balance_kobo=kobo("balance"), user_balance=kobo("user__balance"),
+        ))
+        shards = dict(
+            BalanceShard.objects.filter(account_id__in=[r["id"] for r in rows if r["shard_count"]])
+            .values("account_id").annotate(total=Sum("balance")).values_list("account_id", "total")
+        )
+        for row in rows:
+            row["balance"] = row.pop("balance_kobo")
+            row["shards"] = int(round((shards.get(row["id"]) or 0) * 100))
+        return rows
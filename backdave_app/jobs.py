@@ -0,0 +1,94 @@
+"""
+Database-backed background jobs.
+
+``enqueue`` schedules a row insert with ``transaction.on_commit``, so a
+job exists only once the request that caused it has committed, and the
+request's own transaction carries nothing but its primary write.
+``manage.py runworker`` claims due jobs with SELECT ... FOR UPDATE SKIP
+LOCKED (Postgres) so several workers never pick the same row; on SQLite
+the claim runs in a write transaction, which serializes it.
+
+Finished jobs are deleted. Failures are retried with exponential backoff
+up to JOB_MAX_ATTEMPTS, then kept with status "failed" for inspection.
+Handlers must be safe to run twice: a worker can die after the handler's
+work commits but before its job row is deleted.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name):
+    """Register the decorated function as the handler for jobs called ``name``."""
+    def register(func):
+        _registry[name] = func
+        return func
+    return register
+
+
+def enqueue(name, **payload):
+    """Queue ``name(**payload)`` to run after the current transaction commits."""
+    if name not in _registry:
+        raise KeyError(f"Unknown job: {name}")
+    transaction.on_commit(lambda: Job.objects.create(name=name, payload=payload))
+
+
+# --------------------------
+# WORKER
+# --------------------------
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(batch, locked_by):
+    """Lock up to ``batch`` due jobs (including orphaned running ones) for this worker."""
+    now = timezone.now()
+    due = Q(status=Job.QUEUED, run_at__lte=now) | Q(
+        status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT),
+    )
+    with transaction.atomic():
+        qs = Job.objects.filter(due).order_by("run_at", "id")
+        if connection.features.has_select_for_update_skip_locked:
+            qs = qs.select_for_update(skip_locked=True)
+        jobs = list(qs[:batch])
+        for job in jobs:
+            job.status, job.locked_at, job.locked_by = Job.RUNNING, now, locked_by
+            job.attempts += 1
+        Job.objects.bulk_update(jobs, ["status", "locked_at", "locked_by", "attempts"])
+    return jobs
+
+
+def run(job):
+    """Run one claimed job and record the outcome. Returns True on success."""
+    try:
+        handler = _registry[job.name]
+        with transaction.atomic():
+            handler(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception("Job %s failed (attempt %s)", job, job.attempts)
+        if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+            job.status = Job.FAILED
+        else:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(seconds=2 ** job.attempts)
+        job.last_error = error
+        job.locked_at, job.locked_by = None, ""
+        job.save(update_fields=["status", "run_at", "last_error", "locked_at", "locked_by"])
+        return False
+
+    Job.objects.filter(pk=job.pk).delete()
+    return True
@@ -0,0 +1,412 @@
+"""
+Double-entry ledger: the single place money moves.
+
+Every balance change is a JournalEntry whose Postings sum to zero. Posting
+amounts are signed from the account's point of view: a wallet credit is
+``+amount`` on the wallet and ``-amount`` on the counterparty system
+account. Metered accounts (wallets) carry a running balance on the row
+and a ``balance_after`` checkpoint on each posting, so balance reads are
+O(1). Unmetered system accounts are append-only and never locked, so only
+the wallets in an entry are row-locked, in id order, to avoid deadlocks.
+High fan-in accounts can be sharded (set_shard_count) so concurrent
+credits spread over several rows instead of queueing on one.
+
+Every account has a currency and an entry balances in each currency it
+touches. A wallet's counterparties are system accounts in its currency;
+money that changes currency passes through the ``fx_position`` account
+of each side (exchange_lines). Top-ups paid in another currency are
+converted when they post, at the in-memory rate (see fx.py).
+
+``User.balance`` mirrors the wallet account's base balance and is written
+only here. Credits to a sharded wallet stay on its shards until
+compact_shards folds them in, so read what a customer has with
+wallet_balance() / with_wallet_balance(), never the column alone.
+Each batch publishes its wallet owners to the live event streams.
+"""
+import functools
+import random
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from . import events, fx
+from .models import BalanceShard, JournalEntry, LedgerAccount, Posting, User
+
+CENT = Decimal("0.01")
+
+# Counterparty system account per Transaction type
+COUNTERPARTY = {
+    "Deposit": "cash_deposits",
+    "Add Money": "flutterwave_clearing",
+    "Withdrawal": "withdrawals",
+    "Transfer": "outbound_transfers",
+    "Transfer Received": "internal_transfers",
+    "Data Purchase": "data_vendors",
+    "Airtime Purchase": "airtime_vendors",
+    "Bill Payment": "billers",
+    "Betting": "betting_providers",
+    "Reward Redemption": "rewards_expense",
+}
+DEBIT_TYPES = ("Withdrawal", "Transfer", "Data Purchase", "Airtime Purchase", "Bill Payment", "Betting")
+# Kind of the compensating entries posted by reverse()
+REVERSAL = "Reversal"
+# Flutterwave statuses for which an Add Money row has not (or never will) settle
+UNSETTLED_STATUSES = ("pending", "failed", "expired")
+
+# code -> account; filled only once the row is known to be committed
+_system_accounts = {}
+
+
+class LedgerError(ValueError):
+    pass
+
+
+class InsufficientFunds(LedgerError):
+    pass
+
+
+# --------------------------
+# ACCOUNTS
+# --------------------------
+def wallet_for(user, currency=None):
+    """The user's wallet account; opened in ``currency`` (default BASE_CURRENCY) if it does not exist yet."""
+    account = getattr(user, "_wallet_account", None)
+    if account is None:
+        account, _ = LedgerAccount.objects.get_or_create(
+            user_id=user.pk,
+            defaults={
+                "code": f"wallet:{user.pk}", "kind": LedgerAccount.WALLET,
+                "currency": currency or settings.BASE_CURRENCY,
+            },
+        )
+        user._wallet_account = account
+    return account
+
+
+def attach_wallets(users):
+    """Load wallet accounts for many users in one query (for batch posting)."""
+    users = [u for u in users if getattr(u, "_wallet_account", None) is None]
+    found = {a.user_id: a for a in LedgerAccount.objects.filter(user_id__in={u.pk for u in users})}
+    for user in users:
+        if user.pk in found:
+            user._wallet_account = found[user.pk]
+
+
+def system_account(code, currency=None):
+    """System account ``code``; outside BASE_CURRENCY its code is suffixed, e.g. ``withdrawals:USD``."""
+    currency = currency or settings.BASE_CURRENCY
+    if currency != settings.BASE_CURRENCY:
+        code = f"{code}:{currency}"
+    account = _system_accounts.get(code)
+    if account is None:
+        account, _ = LedgerAccount.objects.get_or_create(
+            code=code, defaults={"kind": LedgerAccount.SYSTEM, "metered": False, "currency": currency},
+        )
+        # Created (or first seen) inside a transaction that may yet roll back:
+        # a cached row that never committed would take other accounts' postings
+        transaction.on_commit(functools.partial(_system_accounts.setdefault, code, account))
+    return account
+
+
+def fx_position(currency):
+    """Where money converted into or out of ``currency`` is booked."""
+    return system_account("fx_position", currency)
+
+
+def balance(account, cached=True):
+    """
+    Current balance. O(1) for metered accounts; sharded accounts sum their
+    shards and cache the total for LEDGER_SHARD_CACHE_SECONDS.
+    """
+    if not account.metered:
+        return account.postings.aggregate(total=Sum("amount"))["total"] or Decimal("0.00")
+
+    key = _balance_cache_key(account.pk)
+    total = cache.get(key) if cached else None
+    if total is not None:
+        return total
+
+    base, shard_count = LedgerAccount.objects.values_list("balance", "shard_count").get(pk=account.pk)
+    if not shard_count:
+        return base
+    total = base + (BalanceShard.objects.filter(account_id=account.pk).aggregate(t=Sum("balance"))["t"] or 0)
+    cache.set(key, total, settings.LEDGER_SHARD_CACHE_SECONDS)
+    return total
+
+
+def with_wallet_balance(users):
+    """
+    Annotate a User queryset with ``wallet_balance``: the mirror plus any
+    shards, read in one statement so a concurrent compaction is neither
+    counted twice nor missed.
+    """
+    shards = (
+        BalanceShard.objects.filter(account__user_id=OuterRef("pk"))
+        .values("account").annotate(total=Sum("balance")).values("total")
+    )
+    return users.annotate(wallet_balance=F("balance") + Coalesce(Subquery(shards), Value(Decimal("0.00"))))
+
+
+def wallet_balance(user_id):
+    """A user's live wallet balance (see with_wallet_balance)."""
+    total = with_wallet_balance(User.objects.filter(pk=user_id)).values_list("wallet_balance", flat=True).get()
+    return total.quantize(CENT)  # SQLite hands expressions back unscaled
+
+
+def _balance_cache_key(account_id):
+    return f"ledger:balance:{account_id}"
+
+
+# --------------------------
+# POSTING
+# --------------------------
+def post(kind, lines, reference=None, description=None, allow_overdraft=False):
+    """Post one entry; see post_many."""
+    return post_many([{
+        "kind": kind, "lines": lines, "reference": reference, "description": description,
+    }], allow_overdraft=allow_overdraft)[0]
+
+
+def post_many(specs, allow_overdraft=False):
+    """
+    Post a batch of entries atomically.
+
+    Each spec is a dict with ``kind``, ``lines`` (``[(account, amount)]``,
+    summing to zero in each currency) and optional ``reference`` /
+    ``description``. Metered accounts are locked once for the whole batch;
+    entries, postings and balances are written with bulk queries. Each returned entry carries
+    ``balances``: {account id: balance after that entry}.
+
+    Sharded accounts that are only credited in the batch are not locked at
+    all: the credit lands on one random shard and their postings carry no
+    balance_after (see compact_shards).
+    """
+    if not specs:
+        return []
+
+    with transaction.atomic():
+        batch = []
+        for spec in specs:
+            lines = [(account, fx.quantize(amount, account.currency)) for account, amount in spec["lines"]]
+            totals = {}
+            for account, amount in lines:
+                totals[account.currency] = totals.get(account.currency, 0) + amount
+            if any(totals.values()):
+                raise LedgerError(f"Unbalanced entry {spec['kind']}: {lines}")
+            batch.append((spec, lines))
+
+        debited = {account.pk for _, lines in batch for account, amount in lines if amount < 0}
+        lock_ids = sorted({
+            account.pk for _, lines in batch for account, _ in lines
+            if account.metered and (not account.shard_count or account.pk in debited)
+        })
+        locked = {
+            a.pk: a for a in LedgerAccount.objects.select_for_update().filter(pk__in=lock_ids).order_by("pk")
+        }
+        running = {pk: a.balance for pk, a in locked.items()}
+
+        # Debits from sharded accounts are checked against the live total.
+        # Shards only grow while we hold the account lock (compaction needs
+        # it too), so an unlocked read is a safe lower bound.
+        shard_totals = {
+            row["account_id"]: row["total"]
+            for row in BalanceShard.objects.filter(account_id__in=[pk for pk, a in locked.items() if a.shard_count])
+            .values("account_id").annotate(total=Sum("balance"))
+        }
+        for pk, total in shard_totals.items():
+            running[pk] += total
+
+        entries, pending_postings, shard_credits = [], [], {}
+        for spec, lines in batch:
+            entry = JournalEntry(
+                kind=spec["kind"], reference=spec.get("reference"), description=spec.get("description"),
+            )
+            entry.balances = {}
+            for account, amount in lines:
+                balance_after = None
+                if account.pk in locked:
+                    balance_after = running[account.pk] + amount
+                    if amount < 0 and balance_after < 0 and not allow_overdraft:
+                        raise InsufficientFunds("Insufficient balance for this transaction")
+                    running[account.pk] = balance_after
+                    entry.balances[account.pk] = balance_after
+                elif account.metered:
+                    count, total = shard_credits.get(account.pk, (account.shard_count, 0))
+                    shard_credits[account.pk] = (count, total + amount)
+                pending_postings.append((entry, account, amount, balance_after))
+            entries.append(entry)
+
+        JournalEntry.objects.bulk_create(entries)
+        Posting.objects.bulk_create(
+            Posting(entry=entry, account=account, amount=amount, balance_after=balance_after)
+            for entry, account, amount, balance_after in pending_postings
+        )
+
+        changed = []
+        for pk, account in locked.items():
+            base = running[pk] - shard_totals.get(pk, 0)
+            if base != account.balance:
+                account.balance = base
+                changed.append(account)
+        LedgerAccount.objects.bulk_update(changed, ["balance"])
+        User.objects.bulk_update(
+            [User(pk=a.user_id, balance=a.balance) for a in changed if a.user_id],
+            ["balance"],
+        )
+
+        for pk, (count, amount) in shard_credits.items():
+            updated = BalanceShard.objects.filter(
+                account_id=pk, index=random.randrange(count),
+            ).update(balance=F("balance") + amount)
+            if not updated:
+                # Sharding was disabled or shrunk since we read the account
+                LedgerAccount.objects.filter(pk=pk).update(balance=F("balance") + amount)
+                User.objects.filter(wallet_account__pk=pk).update(balance=F("balance") + amount)
+
+        events.publish({account.user_id for _, lines in batch for account, _ in lines if account.user_id})
+
+    return entries
+
+
+def reverse(entry, description=None):
+    """
+    Post the compensating entry for ``entry``: its postings with the signs
+    flipped. Corrections are made this way, never by editing amounts or
+    balances in place. Raises LedgerError if ``entry`` was reversed already.
+    """
+    reference = f"REV-{entry.pk}"
+    with transaction.atomic():
+        entry = JournalEntry.objects.select_for_update().get(pk=entry.pk)
+        if entry.kind == REVERSAL or JournalEntry.objects.filter(kind=REVERSAL, reference=reference).exists():
+            raise LedgerError(f"{entry} is a reversal or was reversed already")
+        lines = [(p.account, -p.amount) for p in entry.postings.select_related("account")]
+        return post(REVERSAL, lines, reference=reference, description=description or f"Reversal of {entry}")
+
+
+# --------------------------
+# SHARDED BALANCES
+# --------------------------
+def compact_shards(account):
+    """Fold an account's shards into its base balance and refresh the user mirror."""
+    with transaction.atomic():
+        account = LedgerAccount.objects.select_for_update().get(pk=account.pk)
+        shards = list(BalanceShard.objects.select_for_update().filter(account=account).order_by("index"))
+        folded = sum((shard.balance for shard in shards), Decimal("0.00"))
+        if folded:
+            account.balance += folded
+            account.save(update_fields=["balance"])
+            BalanceShard.objects.filter(account=account).update(balance=0)
+        if account.user_id:
+            User.objects.filter(pk=account.user_id).update(balance=account.balance)
+    cache.delete(_balance_cache_key(account.pk))
+    return folded
+
+
+def set_shard_count(account, shard_count):
+    """Enable (n > 0), resize or disable (0) sharding for a metered account."""
+    if not account.metered:
+        raise LedgerError("Only metered accounts can be sharded")
+    with transaction.atomic():
+        compact_shards(account)
+        BalanceShard.objects.filter(account=account, index__gte=shard_count).delete()
+        BalanceShard.objects.bulk_create(
+            [BalanceShard(account=account, index=i) for i in range(shard_count)],
+            ignore_conflicts=True,
+        )
+        LedgerAccount.objects.filter(pk=account.pk).update(shard_count=shard_count)
+    account.shard_count = shard_count
+    _system_accounts.pop(account.code, None)
+    return account
+
+
+# --------------------------
+# TRANSACTION HELPERS
+# --------------------------
+def exchange_lines(account, amount, counter, counter_amount):
+    """
+    ``amount`` on ``account`` (signed) against ``counter_amount`` in the
+    counter account's currency. Across currencies each side is balanced
+    by the fx_position account in its currency.
+    """
+    if account.currency == counter.currency:
+        return [(account, amount), (counter, -amount)]
+    return [
+        (account, amount), (fx_position(account.currency), -amount),
+        (fx_position(counter.currency), counter_amount), (counter, -counter_amount),
+    ]
+
+
+def transaction_lines(tx):
+    """Ledger lines for a Transaction row, or None if it moves no money (now)."""
+    if tx.type == "Add Money" and tx.flw_status in UNSETTLED_STATUSES:
+        return None
+    if tx.type not in COUNTERPARTY:
+        return None
+
+    wallet = wallet_for(tx.user)
+    amount = Decimal(tx.amount)
+    if tx.type in DEBIT_TYPES:
+        amount = -amount
+    if tx.type == "Add Money" and tx.flw_amount is not None:
+        # Paid in another currency: it clears in that one
+        clearing = system_account(COUNTERPARTY[tx.type], tx.flw_currency)
+        return exchange_lines(wallet, amount, clearing, Decimal(tx.flw_amount))
+    return [(wallet, amount), (system_account(COUNTERPARTY[tx.type], wallet.currency), -amount)]
+
+
+def price(tx):
+    """
+    Convert a settling top-up paid in another currency into the wallet's at
+    the current rate: sets ``tx.amount`` and ``tx.fx_rate``. Raises
+    fx.StaleRates when there is no fresh rate.
+    """
+    if tx.type == "Add Money" and tx.flw_amount is not None and tx.flw_status not in UNSETTLED_STATUSES:
+        tx.amount, tx.fx_rate = fx.convert(tx.flw_amount, tx.flw_currency, wallet_for(tx.user).currency)
+
+
+def post_transaction(tx):
+    """
+    Post ``tx`` to the ledger. Returns ``(entry, balance_after)``; entry is
+    None for rows that move no money, with balance_after the current
+    wallet balance. Also refreshes ``tx.user.balance``.
+    """
+    price(tx)
+    lines = transaction_lines(tx)
+    wallet = wallet_for(tx.user)
+    if lines is None:
+        return None, balance(wallet)
+
+    entry = post(tx.type, lines, reference=tx.reference or tx.flw_tx_ref, description=tx.description)
+    tx.user.balance = entry.balances[wallet.pk] if wallet.pk in entry.balances else balance(wallet)
+    return entry, tx.user.balance
+
+
+def post_transactions(txs):
+    """Batch form of post_transaction for rows already saved (e.g. settlements)."""
+    attach_wallets(tx.user for tx in txs)
+    specs, posted = [], []
+    for tx in txs:
+        price(tx)
+        lines = transaction_lines(tx)
+        if lines is not None:
+            specs.append({"kind": tx.type, "lines": lines, "reference": tx.reference or tx.flw_tx_ref,
+                          "description": tx.description})
+            posted.append(tx)
+
+    for tx, entry in zip(posted, post_many(specs)):
+        tx.journal_entry = entry
+        tx.balance_after = entry.balances.get(wallet_for(tx.user).pk)
+    return posted
+
+
+def move(user, amount, kind):
+    """Credit (positive) or debit (negative) a wallet against the type's counterparty."""
+    amount = Decimal(amount)
+    wallet = wallet_for(user)
+    entry = post(kind, [(wallet, amount), (system_account(COUNTERPARTY[kind], wallet.currency), -amount)])
+    user.balance = entry.balances[wallet.pk] if wallet.pk in entry.balances else balance(wallet)
+    return entry
@@ -0,0 +1,198 @@
+"""
+Per-user spending limits and velocity checks.
+
+SPENDING_LIMITS sets, per transaction type and reward tier, a cap per
+transaction, an amount per rolling 24 hours and a count per rolling hour.
+Usage lives in the cache as time buckets (hourly for amounts, five
+minutes for counts), so a check is one get_many plus two incr calls and
+no queries. Limits and usage are in BASE_CURRENCY; amounts from wallets
+in other currencies count at the current rate. When a user's counters are missing or older than
+SPENDING_LIMITS_RECONCILE_SECONDS they are rebuilt from Transaction rows.
+
+reserve() counts the posting up front and gives it back if the block
+raises, so concurrent requests cannot both slip under a limit.
+
+Counters only work in a cache the workers share (REDIS_URL). With a
+per-process cache each worker would allow a full limit of its own, so
+reserve() instead counts the Transaction rows, holding a per-user lock
+until the block commits.
+"""
+import contextlib
+import functools
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+
+from . import fx, ledger, rewards
+from .models import Transaction
+
+ANY = "*"
+AMOUNT_BUCKET_SECONDS, AMOUNT_BUCKETS = 3600, 24
+COUNT_BUCKET_SECONDS, COUNT_BUCKETS = 300, 12
+LIMITED_TYPES = ledger.DEBIT_TYPES
+
+
+class LimitExceeded(ValueError):
+    pass
+
+
+class Limits(NamedTuple):
+    per_transaction: Decimal  # None: unlimited
+    daily_amount: Decimal
+    hourly_count: int
+
+
+@functools.cache
+def limits_for(tx_type, tier):
+    merged = {}
+    for type_key in (ANY, tx_type):
+        for tier_key in (ANY, tier):
+            merged.update(settings.SPENDING_LIMITS.get(type_key, {}).get(tier_key, {}))
+    amount = lambda name: Decimal(str(merged[name])) if merged.get(name) is not None else None
+    return Limits(amount("per_transaction"), amount("daily_amount"), merged.get("hourly_count"))
+
+
+# --------------------------
+# COUNTERS
+# --------------------------
+def _prefix(user_id, tx_type):
+    return f"limits:{user_id}:{tx_type.replace(' ', '_')}"
+
+
+def _bucket_keys(prefix, now):
+    hour, slot = int(now // AMOUNT_BUCKET_SECONDS), int(now // COUNT_BUCKET_SECONDS)
+    return (
+        [f"{prefix}:a:{hour - i}" for i in range(AMOUNT_BUCKETS)],
+        [f"{prefix}:c:{slot - i}" for i in range(COUNT_BUCKETS)],
+    )
+
+
+def counters_shared():
+    """False when the default cache lives in each process, as LocMemCache does."""
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def _count_rows(user_id, tx_type, now):
+    """The window's buckets, counted from Transaction rows."""
+    prefix = _prefix(user_id, tx_type)
+    since = datetime.fromtimestamp(now - AMOUNT_BUCKET_SECONDS * AMOUNT_BUCKETS, tz=dt_timezone.utc)
+    amount_keys, count_keys = _bucket_keys(prefix, now)
+    buckets = dict.fromkeys(amount_keys + count_keys, 0)
+    rows = Transaction.objects.filter(user_id=user_id, type=tx_type, date__gte=since)
+    for date, amount, currency in rows.values_list("date", "amount", "currency"):
+        amount = fx.to_base(amount, currency)
+        ts = date.timestamp()
+        amount_key = f"{prefix}:a:{int(ts // AMOUNT_BUCKET_SECONDS)}"
+        count_key = f"{prefix}:c:{int(ts // COUNT_BUCKET_SECONDS)}"
+        if amount_key in buckets:
+            buckets[amount_key] += int(amount * 100)
+        if count_key in buckets:
+            buckets[count_key] += 1
+    return buckets
+
+
+def _rebuild(user_id, tx_type, now):
+    """Recount the window from Transaction rows into fresh buckets."""
+    prefix = _prefix(user_id, tx_type)
+    buckets = _count_rows(user_id, tx_type, now)
+    cache.set_many(buckets, AMOUNT_BUCKET_SECONDS * (AMOUNT_BUCKETS + 1))
+    cache.set(f"{prefix}:synced", 1, settings.SPENDING_LIMITS_RECONCILE_SECONDS)
+    return buckets
+
+
+def _incr(key, delta):
+    cache.add(key, 0, AMOUNT_BUCKET_SECONDS * (AMOUNT_BUCKETS + 1))
+    try:
+        return cache.incr(key, delta)
+    except ValueError:  # evicted between add and incr
+        cache.set(key, delta, AMOUNT_BUCKET_SECONDS * (AMOUNT_BUCKETS + 1))
+        return delta
+
+
+def _read(user_id, tx_type, now):
+    prefix = _prefix(user_id, tx_type)
+    amount_keys, count_keys = _bucket_keys(prefix, now)
+    values = cache.get_many([f"{prefix}:synced", *amount_keys, *count_keys])
+    if f"{prefix}:synced" not in values:
+        values = _rebuild(user_id, tx_type, now)
+    return values, amount_keys, count_keys
+
+
+def usage(user_id, tx_type, now=None):
+    """(kobo spent in the last 24h, postings in the last hour) for one type."""
+    now = time.time() if now is None else now
+    if not counters_shared():
+        values = _count_rows(user_id, tx_type, now)
+        amount_keys, count_keys = _bucket_keys(_prefix(user_id, tx_type), now)
+    else:
+        values, amount_keys, count_keys = _read(user_id, tx_type, now)
+    return sum(values.get(k, 0) for k in amount_keys), sum(values.get(k, 0) for k in count_keys)
+
+
+# --------------------------
+# ENFORCEMENT
+# --------------------------
+@contextlib.contextmanager
+def reserve(user, tx_type, amount):
+    """
+    Check ``amount`` of ``tx_type`` against the user's limits and count it.
+    Raises LimitExceeded; the reservation is released if the block raises.
+    ``amount`` is in the user's wallet currency.
+    """
+    if tx_type not in LIMITED_TYPES:
+        yield
+        return
+
+    limits = limits_for(tx_type, rewards.tier_for(user.reward_points).name)
+    amount = fx.to_base(amount, ledger.wallet_for(user).currency)
+    if limits.per_transaction is not None and amount > limits.per_transaction:
+        raise LimitExceeded(f"{tx_type} limit is ₦{limits.per_transaction} per transaction")
+
+    kobo = int(amount * 100)
+    if not counters_shared():
+        with transaction.atomic():
+            _lock(user.pk)
+            spent, count = usage(user.pk, tx_type)
+            _check(limits, tx_type, spent + kobo, count + 1)
+            yield
+        return
+
+    values, amount_keys, count_keys = _read(user.pk, tx_type, time.time())
+    # The current buckets are read back through incr, so concurrent
+    # reservations see each other
+    spent = sum(values.get(k, 0) for k in amount_keys[1:]) + _incr(amount_keys[0], kobo)
+    count = sum(values.get(k, 0) for k in count_keys[1:]) + _incr(count_keys[0], 1)
+    try:
+        _check(limits, tx_type, spent, count)
+        yield
+    except BaseException:
+        _incr(amount_keys[0], -kobo)
+        _incr(count_keys[0], -1)
+        raise
+
+
+def _check(limits, tx_type, spent, count):
+    if limits.daily_amount is not None and spent > limits.daily_amount * 100:
+        raise LimitExceeded(f"Daily {tx_type} limit of ₦{limits.daily_amount} reached")
+    if limits.hourly_count is not None and count > limits.hourly_count:
+        raise LimitExceeded(f"Too many {tx_type} transactions this hour, try again later")
+
+
+def _lock(user_id):
+    """
+    Serialize one user's reservations until the transaction ends. Not the
+    user's row: postings update it, and transfers would deadlock on it.
+    On SQLite the write transaction already holds the database lock.
+    """
+    if connection.vendor == "postgresql":
+        key = int.from_bytes(hashlib.sha256(f"limits:{user_id}".encode()).digest()[:8], "big", signed=True)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [key])
@@ -0,0 +1,118 @@
+"""
+Shared plumbing for the HTTP load-test commands (loadtest_flutterwave,
+bench_api, bench_workers): start the app under gunicorn in a subprocess,
+time requests, summarize latencies, read worker memory.
+"""
+import contextlib
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+# gunicorn command line per server profile. gunicorn.conf.py is picked up from
+# the working directory; these flags override its worker class and threads.
+PROFILES = {
+    "wsgi": ["backdave_bank.wsgi:application", "-k", "sync", "--threads", "1"],
+    "gthread": ["backdave_bank.wsgi:application", "-k", "gthread"],
+    "asgi": ["backdave_bank.asgi:application", "-k", "uvicorn_worker.UvicornWorker"],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def summarize(latencies, statuses, elapsed):
+    """Throughput and latency percentiles (ms) for one set of timed requests."""
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        "statuses": {str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))},
+    }
+
+
+@contextlib.contextmanager
+def serve(profile, workers, env=None, args=()):
+    """Run the project under gunicorn with ``profile``; yields its base URL once /healthz answers."""
+    port = free_port()
+    env = {**os.environ, "DJANGO_ASYNC_VIEWS": str(profile == "asgi"), **(env or {})}
+    cmd = [
+        sys.executable, "-m", "gunicorn", *PROFILES[profile],
+        "-w", str(workers), "-b", f"127.0.0.1:{port}",
+        "--timeout", "120", "--log-level", "warning", *args,
+    ]
+    server = subprocess.Popen(cmd, cwd=settings.BASE_DIR, env=env)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        _wait_ready(base, server)
+        yield base
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _wait_ready(base, server):
+    import httpx
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise CommandError("gunicorn exited during startup")
+        try:
+            if httpx.get(f"{base}/healthz").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise CommandError("gunicorn did not become ready")
+
+
+def worker_pids(master_pid):
+    """Live gunicorn workers: the master's child processes."""
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # the command name may contain spaces; fields resume after its ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == master_pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def process_memory(pid):
+    """
+    RSS, PSS and USS of one process in MB (Linux). RSS counts pages shared
+    with the master in full; PSS splits them between sharers; USS is what
+    the process alone holds, i.e. what one more worker costs.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0])
+    return {
+        "rss_mb": round(fields["Rss"] / 1024, 1),
+        "pss_mb": round(fields["Pss"] / 1024, 1),
+        "uss_mb": round((fields["Private_Clean"] + fields["Private_Dirty"]) / 1024, 1),
+    }
@@ -0,0 +1,89 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backdave_app import retention
+from backdave_app.models import RetentionRun
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply the data retention policy to dormant and closed accounts (run from cron): fold "
+        "expired transactions and points into monthly summaries in small throttled batches, "
+        "and delete profile pictures and closed accounts' optional details. Progress is "
+        "checkpointed per user; an interrupted run resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Rows per transaction (RETENTION_BATCH).")
+        parser.add_argument("--sleep", type=float, help="Seconds to pause between batches (RETENTION_SLEEP).")
+        parser.add_argument("--limit", type=int, help="Stop after this many users; rerun to continue.")
+        parser.add_argument("--restart", action="store_true", help="Abandon an unfinished run and start over.")
+        parser.add_argument("--dry-run", action="store_true", help="Only estimate what a run would reclaim.")
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            self._report_estimate(retention.estimate())
+            return
+
+        sleep = settings.RETENTION_SLEEP if options["sleep"] is None else options["sleep"]
+        run = RetentionRun.objects.filter(finished_at__isnull=True).order_by("-id").first()
+        if run and options["restart"]:
+            run.stats["abandoned"] = True
+            run.finished_at = timezone.now()
+            run.save(update_fields=["stats", "finished_at"])
+            run = None
+        if run:
+            self.stdout.write(f"Resuming retention run #{run.pk} after user {run.last_user_id}")
+        else:
+            run = RetentionRun.objects.create()
+
+        # Cutoffs stay those of the run's start, so a resumed run applies the same policy
+        now = run.started_at
+        stats = Counter(run.stats)
+        users = retention.dormant_users(now).order_by("id")
+        started, done = time.monotonic(), 0
+        while options["limit"] is None or done < options["limit"]:
+            user = users.filter(id__gt=run.last_user_id).first()
+            if user is None:
+                run.finished_at = timezone.now()
+                break
+            for model in retention.FOLDED:
+                while folded := retention.fold_batch(model, user.pk, now, options["batch_size"]):
+                    stats["rows"] += folded
+                    if sleep:
+                        time.sleep(sleep)
+            stats += retention.clear_profile(user)
+            stats["users"] += 1
+            done += 1
+            run.last_user_id = user.pk
+            run.stats = dict(stats)
+            run.save(update_fields=["last_user_id", "stats"])
+        if run.finished_at:
+            run.save(update_fields=["finished_at"])
+
+        self.stdout.write(
+            f"{'Finished' if run.finished_at else 'Paused'} retention run #{run.pk}: "
+            f"{done} users this time ({time.monotonic() - started:.1f}s); totals {dict(stats)}"
+        )
+
+    def _report_estimate(self, estimate):
+        self.stdout.write(f"{estimate['users']} dormant or closed accounts")
+        known = 0
+        for table, t in estimate["tables"].items():
+            size = "size unknown" if t["bytes"] is None else _size(t["bytes"])
+            known += t["bytes"] or 0
+            self.stdout.write(f"  {table}: {t['rows']} rows to fold ({size})")
+        self.stdout.write(f"  into up to {estimate['summaries']} monthly summaries")
+        self.stdout.write(f"  {estimate['pictures']} picture files ({_size(estimate['picture_bytes'])})")
+        self.stdout.write(
+            f"About {_size(known + estimate['picture_bytes'])} reclaimable; Postgres reuses freed "
+            "table space after VACUUM rather than returning it to the OS"
+        )
+
+
+def _size(size):
+    return f"{size / 2 ** 20:.1f} MB" if size >= 2 ** 20 else f"{size / 1024:.1f} KB"
@@ -0,0 +1,59 @@
+import time
+from datetime import datetime, time as dt_time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from backdave_app import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move transactions older than the hot window (TRANSACTION_HOT_DAYS) into the "
+        "archive in id-ordered batches (run from cron). Safe to interrupt and rerun."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", help="Archive rows dated before this day (YYYY-MM-DD); "
+                                             "defaults to the start of the hot window.")
+        parser.add_argument("--batch-size", type=int, help="Rows per transaction (TRANSACTION_ARCHIVE_BATCH).")
+        parser.add_argument("--limit", type=int, help="Stop after about this many rows.")
+        parser.add_argument("--sleep", type=float, default=0, help="Seconds to pause between batches.")
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would move.")
+
+    def handle(self, *args, **options):
+        cutoff = archive.horizon()
+        if options["before"]:
+            day = parse_date(options["before"])
+            if day is None:
+                raise CommandError("--before must be YYYY-MM-DD")
+            cutoff = timezone.make_aware(datetime.combine(day, dt_time.min))
+            if cutoff > archive.horizon():
+                raise CommandError(
+                    f"--before is inside the {settings.TRANSACTION_HOT_DAYS}-day hot window; "
+                    "lower TRANSACTION_HOT_DAYS first"
+                )
+
+        if options["dry_run"]:
+            count = archive.archivable(cutoff).count()
+            self.stdout.write(f"{count} transactions dated before {cutoff:%Y-%m-%d} would be archived")
+            return
+
+        started = time.monotonic()
+        total, batches, last_id = 0, 0, 0
+        while options["limit"] is None or total < options["limit"]:
+            moved, last_id = archive.archive_batch(cutoff, last_id, options["batch_size"])
+            if last_id is None:
+                break
+            total += moved
+            batches += 1
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        if total:
+            archive.analyze()
+        self.stdout.write(
+            f"Archived {total} transactions dated before {cutoff:%Y-%m-%d} "
+            f"in {batches} batches ({time.monotonic() - started:.1f}s)"
+        )
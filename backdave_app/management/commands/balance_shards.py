@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from backdave_app import ledger
+from backdave_app.models import LedgerAccount
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage sharded balances for hot ledger accounts. "
+        "'enable CODE... --shards N', 'disable CODE...', or 'compact [CODE...]' "
+        "(all sharded accounts when no code is given; run periodically from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["enable", "disable", "compact"])
+        parser.add_argument("codes", nargs="*", help="Account codes, e.g. wallet:42 or billers.")
+        parser.add_argument("--shards", type=int, default=16)
+
+    def handle(self, *args, action, codes, **options):
+        if action != "compact" and not codes:
+            raise CommandError(f"{action} needs at least one account code")
+
+        accounts = LedgerAccount.objects.filter(code__in=codes) if codes else \
+            LedgerAccount.objects.filter(shard_count__gt=0)
+        missing = set(codes) - {a.code for a in accounts}
+        if missing:
+            raise CommandError(f"Unknown accounts: {', '.join(sorted(missing))}")
+
+        for account in accounts:
+            if action == "enable":
+                ledger.set_shard_count(account, options["shards"])
+                self.stdout.write(f"{account.code}: {options['shards']} shards")
+            elif action == "disable":
+                ledger.set_shard_count(account, 0)
+                self.stdout.write(f"{account.code}: sharding disabled")
+            else:
+                folded = ledger.compact_shards(account)
+                self.stdout.write(f"{account.code}: folded {folded} into base balance")
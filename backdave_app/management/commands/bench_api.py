@@ -0,0 +1,320 @@
+import asyncio
+import json
+import random
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backdave_app import banks, ledger, loadtest
+from backdave_app.flutterwave_stub import FlutterwaveStub
+from backdave_app.models import LedgerAccount, Transaction, User
+
+PIN = "1234"
+WEBHOOK_HASH = "bench-hash"
+TOP_UP = Decimal("1000.00")
+OPENING_BALANCE = Decimal("1000000.00")
+OPENING_POINTS = 100_000
+HISTORY_TYPES = ("Airtime Purchase", "Data Purchase", "Bill Payment", "Deposit", "Transfer")
+# Limits high enough that the mix measures the endpoints, not 400s from velocity checks
+BENCH_LIMITS = {"*": {"*": {"per_transaction": None, "daily_amount": 10 ** 12, "hourly_count": 10 ** 9}}}
+
+# Operation -> share of requests. Reads dominate, as in the app.
+MIX = {
+    "history": 20,
+    "account": 15,
+    "dashboard": 10,
+    "post_transaction": 10,
+    "rewards": 6,
+    "webhook": 6,
+    "login": 5,
+    "internal_transfer": 5,
+    "refresh_token": 4,
+    "validate_pin": 4,
+    "transfer_verify": 4,
+    "banks": 3,
+    "init_payment": 3,
+    "verify_payment": 2,
+    "register": 1,
+    "account_update": 1,
+    "update_pin": 1,
+    "redeem_rewards": 1,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "End-to-end API benchmark: seeds --users users with --transactions rows "
+        "each, then drives a weighted mix of every route in backdave_app/urls.py "
+        "against the app under gunicorn, with Flutterwave and name enquiry "
+        "stubbed. Reports throughput and p50/p95/p99 per endpoint and writes "
+        "JSON for comparing commits (--json, --compare). Seeds the configured "
+        "database, so point DATABASE_URL at a scratch DB."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--transactions", type=int, default=50, help="History rows per user.")
+        parser.add_argument("--requests", type=int, default=3000)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--workers", type=int, default=2, help="gunicorn workers.")
+        parser.add_argument("--profile", choices=list(loadtest.PROFILES), default="wsgi")
+        parser.add_argument("--stub-latency", type=float, default=0.0, help="Flutterwave stub latency (s).")
+        parser.add_argument("--mix", help='Override weights, e.g. "history=50,login=0".')
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for the request sequence.")
+        parser.add_argument("--enforce-limits", action="store_true", help="Keep the configured spending limits.")
+        parser.add_argument("--json", dest="json_path", help="Write results to this file.")
+        parser.add_argument("--compare", help="Earlier --json output to diff against.")
+
+    def handle(self, *args, **options):
+        mix = self._mix(options["mix"])
+        rng = random.Random(options["seed"])
+        ops = rng.choices(list(mix), weights=list(mix.values()), k=options["requests"])
+        counts = {op: ops.count(op) for op in mix}
+
+        started = time.perf_counter()
+        fixture = self._seed(options["users"], options["transactions"], counts)
+        self.stdout.write(
+            f"Seeded {options['users']} users x {options['transactions']} transactions "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        env = {
+            "FLUTTERWAVE_SECRET_HASH": WEBHOOK_HASH,
+            "NAME_ENQUIRY_BACKEND": "backdave_app.name_enquiry.StubBackend",
+        }
+        if not options["enforce_limits"]:
+            env["SPENDING_LIMITS_JSON"] = json.dumps(BENCH_LIMITS)
+
+        with FlutterwaveStub(latency=options["stub_latency"], amount=str(TOP_UP)) as stub:
+            env["FLUTTERWAVE_BASE_URL"] = stub.base_url
+            with loadtest.serve(options["profile"], options["workers"], env) as base:
+                timings, elapsed = asyncio.run(self._fire(base, ops, fixture, rng, options["concurrency"]))
+
+        results = self._results(timings, elapsed, options)
+        self._report(results)
+        if options["compare"]:
+            self._compare(results, options["compare"])
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(results, f, indent=2)
+
+    def _mix(self, override):
+        mix = dict(MIX)
+        for item in filter(None, (override or "").split(",")):
+            name, _, weight = item.partition("=")
+            if name.strip() not in MIX:
+                raise CommandError(f"Unknown operation {name!r}; choose from {', '.join(MIX)}")
+            mix[name.strip()] = float(weight)
+        return {op: weight for op, weight in mix.items() if weight > 0}
+
+    # --------------------------
+    # SEED
+    # --------------------------
+    def _seed(self, n_users, n_transactions, counts):
+        run_id = uuid.uuid4().hex[:6]
+        password = make_password(PIN)  # one hash for every user
+        users = User.objects.bulk_create(
+            User(phone=f"ba-{run_id}-{i}", password=password, full_name=f"Bench {i}",
+                 email=f"ba-{run_id}-{i}@example.com", reward_points=OPENING_POINTS)
+            for i in range(n_users)
+        )
+        wallets = LedgerAccount.objects.bulk_create(
+            LedgerAccount(code=f"wallet:{u.pk}", kind=LedgerAccount.WALLET, user_id=u.pk) for u in users
+        )
+        deposits = ledger.system_account(ledger.COUNTERPARTY["Deposit"])
+        ledger.post_many([
+            {"kind": "Deposit", "lines": [(w, OPENING_BALANCE), (deposits, -OPENING_BALANCE)]} for w in wallets
+        ])
+
+        # History rows are display-only: bulk_create skips the ledger
+        now = timezone.now()
+        step = timedelta(days=90) / max(n_transactions, 1)
+        history = []
+        for user in users:
+            for i in range(n_transactions):
+                history.append(Transaction(
+                    user=user, type=HISTORY_TYPES[i % len(HISTORY_TYPES)], amount=Decimal(100 + i % 900),
+                    balance_after=OPENING_BALANCE, date=now - step * (n_transactions - i),
+                    reference=f"BA-{run_id}-{user.pk}-{i}", description="Benchmark history",
+                ))
+        Transaction.objects.bulk_create(history, batch_size=5000)
+
+        # Pending top-ups, settled by the webhook and verify operations
+        pending = {}
+        for i in range(counts.get("webhook", 0) + counts.get("verify_payment", 0)):
+            pending[f"BAF-{run_id}-{i}"] = users[i % len(users)]
+        Transaction.objects.bulk_create(
+            Transaction(user=user, type="Add Money", amount=TOP_UP, flw_tx_ref=ref, flw_status="pending",
+                        flw_currency="NGN", description="Benchmark top-up")
+            for ref, user in pending.items()
+        )
+
+        tokens = {}
+        for user in users:
+            refresh = RefreshToken.for_user(user)
+            tokens[user.pk] = (str(refresh.access_token), str(refresh))
+        return {"run_id": run_id, "users": users, "tokens": tokens, "pending": list(pending.items())}
+
+    # --------------------------
+    # REQUESTS
+    # --------------------------
+    def _request(self, op, fixture, rng, seq):
+        """(method, path, kwargs) for one operation by a random seeded user."""
+        user = rng.choice(fixture["users"])
+        access, refresh = fixture["tokens"][user.pk]
+        auth = {"Authorization": f"Bearer {access}"}
+        idem = {**auth, "Idempotency-Key": f"{fixture['run_id']}-{seq}"}
+
+        if op == "history":
+            return "GET", "/api/transactions/", {"headers": auth}
+        if op == "account":
+            return "GET", "/api/account/", {"headers": auth}
+        if op == "dashboard":
+            return "GET", "/api/dashboard/", {"headers": auth}
+        if op == "rewards":
+            return "GET", "/api/rewards/", {"headers": auth}
+        if op == "banks":
+            return "GET", "/api/banks/", {"headers": auth}
+        if op == "login":
+            return "POST", "/api/login/", {"json": {"phone": user.phone, "pin": PIN}}
+        if op == "refresh_token":
+            return "POST", "/api/refresh-token/", {"headers": {"Cookie": f"refresh_token={refresh}"}}
+        if op == "register":
+            phone = f"ba-{fixture['run_id']}-r{seq}"
+            return "POST", "/api/register/", {"json": {
+                "phone": phone, "pin": PIN, "firstName": "Bench", "lastName": "Register",
+                "dob": "1990-01-01", "email": f"{phone}@example.com",
+            }}
+        if op == "account_update":
+            return "POST", "/api/account/", {"headers": auth, "json": {"name": f"Bench {seq}"}}
+        if op == "validate_pin":
+            return "POST", "/api/validate-pin/", {"headers": auth, "json": {"pin": PIN}}
+        if op == "update_pin":
+            return "POST", "/api/update-pin/", {"headers": auth, "json": {"pin": PIN}}
+        if op == "post_transaction":
+            return "POST", "/api/transactions/", {"headers": idem, "json": {
+                "type": "Airtime Purchase", "amount": str(rng.randint(50, 500)), "phone": "08030000000",
+                "provider": "MTN", "pin": PIN,
+            }}
+        if op == "internal_transfer":
+            recipient = rng.choice(fixture["users"])
+            while recipient.pk == user.pk and len(fixture["users"]) > 1:
+                recipient = rng.choice(fixture["users"])
+            return "POST", "/api/transfer/internal/", {"headers": idem, "json": {
+                "phone": recipient.phone, "amount": str(rng.randint(10, 200)), "pin": PIN,
+            }}
+        if op == "transfer_verify":
+            return "POST", "/api/transfer/verify/", {"headers": auth, "json": {
+                "bank_name": rng.choice(banks.BANKS).name, "account_number": f"{rng.randrange(10 ** 10):010d}",
+            }}
+        if op == "redeem_rewards":
+            return "POST", "/api/rewards/redeem/", {"headers": idem, "json": {
+                "points": max(settings.REWARDS_MIN_REDEMPTION_POINTS, 100), "pin": PIN,
+            }}
+        if op == "init_payment":
+            return "POST", "/api/flutterwave/init/", {"headers": idem, "json": {"amount": str(TOP_UP)}}
+        if op == "webhook":
+            ref, _ = fixture["pending"].pop()
+            return "POST", "/api/flutterwave/webhook/", {
+                "headers": {"verif-hash": WEBHOOK_HASH},
+                "json": {"data": {"id": 10 ** 6 + seq, "tx_ref": ref, "status": "successful",
+                                  "amount": str(TOP_UP), "currency": "NGN"}},
+            }
+        if op == "verify_payment":
+            ref, owner = fixture["pending"].pop()
+            owner_auth = {"Authorization": f"Bearer {fixture['tokens'][owner.pk][0]}"}
+            return "POST", "/api/flutterwave/verify/", {"headers": owner_auth, "json": {"tx_ref": ref}}
+        raise CommandError(f"Unknown operation {op}")
+
+    async def _fire(self, base, ops, fixture, rng, concurrency):
+        import httpx
+
+        requests = [(op, *self._request(op, fixture, rng, seq)) for seq, op in enumerate(ops)]
+        sem = asyncio.Semaphore(concurrency)
+        timings = defaultdict(lambda: ([], defaultdict(int)))
+        limits = httpx.Limits(max_connections=concurrency)
+
+        async with httpx.AsyncClient(base_url=base, timeout=120, limits=limits) as client:
+            async def one(op, method, path, kwargs):
+                async with sem:
+                    start = time.perf_counter()
+                    try:
+                        code = (await client.request(method, path, **kwargs)).status_code
+                    except httpx.HTTPError:
+                        code = "error"
+                    latencies, statuses = timings[op]
+                    latencies.append(time.perf_counter() - start)
+                    statuses[code] += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(*request) for request in requests))
+            elapsed = time.perf_counter() - start
+        return timings, elapsed
+
+    # --------------------------
+    # RESULTS
+    # --------------------------
+    def _results(self, timings, elapsed, options):
+        all_latencies, all_statuses = [], defaultdict(int)
+        endpoints = {}
+        for op in sorted(timings):
+            latencies, statuses = timings[op]
+            endpoints[op] = loadtest.summarize(latencies, statuses, elapsed)
+            all_latencies += latencies
+            for code, n in statuses.items():
+                all_statuses[code] += n
+
+        return {
+            "commit": self._commit(),
+            "date": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "options": {k: options[k] for k in (
+                "users", "transactions", "requests", "concurrency", "workers", "profile",
+                "stub_latency", "mix", "seed", "enforce_limits",
+            )},
+            "elapsed_s": round(elapsed, 3),
+            "overall": loadtest.summarize(all_latencies, all_statuses, elapsed),
+            "endpoints": endpoints,
+        }
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _report(self, results):
+        self.stdout.write(f"{'endpoint':<18} {'req':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}  statuses")
+        rows = [*results["endpoints"].items(), ("overall", results["overall"])]
+        for name, r in rows:
+            self.stdout.write(
+                f"{name:<18} {r['requests']:>6} {r['rps']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+                f"{r['p99_ms']:>8}  {r['statuses']}"
+            )
+
+    def _compare(self, results, path):
+        with open(path) as f:
+            before = json.load(f)
+        self.stdout.write(f"\nvs {before.get('commit')} ({path}): p95 and req/s change")
+        rows = [*results["endpoints"].items(), ("overall", results["overall"])]
+        for name, r in rows:
+            old = before["overall"] if name == "overall" else before["endpoints"].get(name)
+            if not old or not old.get("p95_ms") or not old.get("rps"):
+                continue
+            p95 = (r["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+            rps = (r["rps"] - old["rps"]) / old["rps"] * 100
+            line = f"{name:<18} p95 {old['p95_ms']} -> {r['p95_ms']} ms ({p95:+.0f}%), req/s {rps:+.0f}%"
+            self.stdout.write(self.style.WARNING(line) if p95 > 10 else line)
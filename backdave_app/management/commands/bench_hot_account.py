@@ -0,0 +1,77 @@
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+
+from backdave_app import ledger
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Contention benchmark: many threads pay the same merchant wallet, first "
+        "unsharded then sharded. Needs Postgres (SQLite serializes every writer) "
+        "and max_connections above --threads. Writes rows to the configured DB."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=80)
+        parser.add_argument("--credits", type=int, default=25, help="Credits per thread.")
+        parser.add_argument("--shards", type=int, default=32)
+        parser.add_argument("--work-ms", type=float, default=2.0,
+                            help="Simulated in-transaction work after the posting (e.g. writing the Transaction row).")
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            self.stderr.write("SQLite takes a database-wide write lock; results will not show row contention.")
+
+        run_id = uuid.uuid4().hex[:6]
+        merchant = User.objects.create_user(phone=f"bench-m-{run_id}", password="0000", full_name="Hot Merchant")
+        wallet = ledger.wallet_for(merchant)
+        payers = []
+        for i in range(options["threads"]):
+            payer = User.objects.create_user(phone=f"bench-p-{run_id}-{i}", password="0000")
+            ledger.move(payer, Decimal(options["credits"] * 2), "Deposit")
+            payers.append(payer)
+
+        results = {}
+        for label, shards in (("unsharded", 0), ("sharded", options["shards"])):
+            ledger.set_shard_count(wallet, shards)
+            results[label] = self._run(payers, wallet, options)
+            self.stdout.write(f"{label}: {results[label]:.1f} credits/s")
+
+        ledger.compact_shards(wallet)
+        expected = Decimal(len(payers) * options["credits"] * 2)
+        self.stdout.write(
+            f"merchant balance {ledger.balance(wallet, cached=False)} (expected {expected}); "
+            f"speed-up x{results['sharded'] / results['unsharded']:.2f}"
+        )
+
+    def _run(self, payers, merchant_wallet, options):
+        barrier = threading.Barrier(len(payers) + 1)
+        work = options["work_ms"] / 1000
+
+        def pay(payer):
+            payer_wallet = ledger.wallet_for(payer)
+            barrier.wait()
+            try:
+                for _ in range(options["credits"]):
+                    with transaction.atomic():
+                        ledger.post("Betting", [(payer_wallet, Decimal("-1")), (merchant_wallet, Decimal("1"))])
+                        time.sleep(work)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=pay, args=(p,)) for p in payers]
+        for t in threads:
+            t.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for t in threads:
+            t.join()
+        return len(payers) * options["credits"] / (time.perf_counter() - start)
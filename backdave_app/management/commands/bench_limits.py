@@ -0,0 +1,73 @@
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from backdave_app import limits
+from backdave_app.models import Transaction, User
+
+TX_TYPE = "Bill Payment"
+NO_LIMITS = {"*": {"*": {"per_transaction": None, "daily_amount": 10 ** 12, "hourly_count": 10 ** 9}}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency of the spending-limit check per posting (cache counters "
+        "with a shared cache, else the row count) against a SUM/COUNT query "
+        "over the user's last 24h of rows. Creates a throwaway user with "
+        "--history rows and deletes it afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=5000)
+        parser.add_argument("--history", type=int, default=500, help="Rows in the user's last 24h.")
+
+    def handle(self, *args, **options):
+        user = User.objects.create(phone=f"bench-l-{uuid.uuid4().hex[:6]}", password=make_password(None))
+        try:
+            now = timezone.now()
+            Transaction.objects.bulk_create(
+                Transaction(user=user, type=TX_TYPE, amount=Decimal("10.00"), reference=f"BL-{user.pk}-{i}",
+                            date=now - timedelta(seconds=i * 86400 // options["history"]))
+                for i in range(options["history"])
+            )
+            with override_settings(SPENDING_LIMITS=NO_LIMITS):
+                limits.limits_for.cache_clear()
+                label = "cache counters" if limits.counters_shared() else "row count"
+                self._report(f"limit check ({label})", self._time(options["iterations"], lambda: self._check(user)))
+            limits.limits_for.cache_clear()
+
+            since = now - timedelta(days=1)
+            query = lambda: Transaction.objects.filter(user=user, type=TX_TYPE, date__gte=since).aggregate(
+                total=Sum("amount"), count=Count("id"),
+            )
+            self._report("SUM/COUNT over Transaction rows", self._time(min(options["iterations"], 1000), query))
+        finally:
+            user.delete()
+
+    def _check(self, user):
+        with limits.reserve(user, TX_TYPE, Decimal("10.00")):
+            pass
+
+    def _time(self, n, func):
+        func()  # first call rebuilds the counters / warms the connection
+        samples = []
+        for _ in range(n):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    def _report(self, label, samples):
+        samples.sort()
+        p99 = samples[int(len(samples) * 0.99) - 1]
+        self.stdout.write(
+            f"{label}: p50 {statistics.median(samples):.3f} ms, p99 {p99:.3f} ms, max {samples[-1]:.3f} ms"
+        )
@@ -0,0 +1,104 @@
+import random
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.db.models import Sum
+
+from backdave_app import fraud, ledger, transfers
+from backdave_app.models import LedgerAccount, Posting, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrency benchmark for internal transfers: random transfers among "
+        "--wallets funded wallets from --threads threads, then checks that no "
+        "money was created or lost. Writes rows to the configured DB; use "
+        "Postgres for meaningful numbers (SQLite serializes every writer)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--wallets", type=int, default=1000)
+        parser.add_argument("--threads", type=int, default=32)
+        parser.add_argument("--transfers", type=int, default=5000, help="Total transfers across all threads.")
+        parser.add_argument("--opening", type=Decimal, default=Decimal("1000.00"))
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            self.stderr.write("SQLite takes a database-wide write lock; expect serialized throughput.")
+
+        users = self._seed(options["wallets"], options["opening"])
+        wallet_ids = [u._wallet_account.pk for u in users]
+        expected = options["opening"] * len(users)
+
+        per_thread = options["transfers"] // options["threads"]
+        counts = {"ok": 0, "declined": 0, "deadlock": 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(options["threads"] + 1)
+
+        def work(seed):
+            rng = random.Random(seed)
+            local = dict.fromkeys(counts, 0)
+            barrier.wait()
+            try:
+                for _ in range(per_thread):
+                    sender, recipient = rng.sample(users, 2)
+                    try:
+                        transfers.transfer(sender, recipient, Decimal(rng.randint(1, 200)))
+                        local["ok"] += 1
+                    except (ledger.InsufficientFunds, fraud.FraudSuspected):
+                        local["declined"] += 1
+                    except OperationalError:
+                        local["deadlock"] += 1
+            finally:
+                connections.close_all()
+                with lock:
+                    for k, v in local.items():
+                        counts[k] += v
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(options["threads"])]
+        for t in threads:
+            t.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        total = LedgerAccount.objects.filter(pk__in=wallet_ids).aggregate(t=Sum("balance"))["t"]
+        mirrored = User.objects.filter(pk__in=[u.pk for u in users]).aggregate(t=Sum("balance"))["t"]
+        clearing = ledger.balance(ledger.system_account(transfers.CLEARING_ACCOUNT))
+        posted = Posting.objects.aggregate(t=Sum("amount"))["t"]
+
+        self.stdout.write(
+            f"{counts['ok']} transfers in {elapsed:.2f}s = {counts['ok'] / elapsed:.1f} transfers/s "
+            f"({counts['declined']} declined, {counts['deadlock']} lock errors)"
+        )
+        self.stdout.write(
+            f"wallets {total} / user mirror {mirrored} (expected {expected}); "
+            f"internal_transfers {clearing}; all postings {posted}"
+        )
+        if total != expected or mirrored != expected or clearing != 0 or posted != 0 or counts["deadlock"]:
+            raise CommandError("Conservation check failed")
+        self.stdout.write(self.style.SUCCESS("Balances conserved"))
+
+    def _seed(self, n, opening):
+        run_id = uuid.uuid4().hex[:6]
+        password = make_password("0000")
+        users = User.objects.bulk_create(
+            User(phone=f"bt-{run_id}-{i}", password=password, full_name=f"Bench {i}") for i in range(n)
+        )
+        wallets = LedgerAccount.objects.bulk_create(
+            LedgerAccount(code=f"wallet:{u.pk}", kind=LedgerAccount.WALLET, user_id=u.pk) for u in users
+        )
+        deposits = ledger.system_account(ledger.COUNTERPARTY["Deposit"])
+        for user, wallet in zip(users, wallets):
+            user._wallet_account = wallet
+        ledger.post_many([
+            {"kind": "Deposit", "lines": [(w, opening), (deposits, -opening)]} for w in wallets
+        ])
+        return users
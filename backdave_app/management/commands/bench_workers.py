@@ -0,0 +1,134 @@
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+
+from django.db import connection
+from django.utils import timezone
+
+from backdave_app import loadtest
+from backdave_app.flutterwave_stub import FlutterwaveStub
+
+from . import bench_api
+
+
+class Command(bench_api.Command):
+    help = (
+        "Compare gunicorn worker classes (sync, gthread, uvicorn) with and without "
+        "--preload: boots each under gunicorn.conf.py, records RSS/PSS/USS per worker "
+        "when idle and after driving the bench_api request mix, and reports req/s and "
+        "latency. USS after load is the per-worker cost gunicorn.conf.py sizes with. "
+        "Seeds the configured database, so point DATABASE_URL at a scratch DB."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--transactions", type=int, default=20, help="History rows per user.")
+        parser.add_argument("--requests", type=int, default=1000, help="Requests per run.")
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--workers", type=int, default=3, help="gunicorn workers.")
+        parser.add_argument("--threads", type=int, default=4, help="Threads per gthread worker.")
+        parser.add_argument(
+            "--profiles", nargs="+", default=list(loadtest.PROFILES), choices=list(loadtest.PROFILES),
+        )
+        parser.add_argument("--preload", choices=("on", "off", "both"), default="both")
+        parser.add_argument("--stub-latency", type=float, default=0.0, help="Flutterwave stub latency (s).")
+        parser.add_argument("--mix", help='Override weights, e.g. "history=50,login=0".')
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for the request sequence.")
+        parser.add_argument("--json", dest="json_path", help="Write results to this file.")
+
+    def handle(self, *args, **options):
+        mix = self._mix(options["mix"])
+        preloads = {"on": [True], "off": [False], "both": [True, False]}[options["preload"]]
+        results = {
+            "commit": self._commit(),
+            "date": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "options": {k: options[k] for k in (
+                "users", "transactions", "requests", "concurrency", "workers", "threads",
+                "stub_latency", "mix", "seed",
+            )},
+            "runs": {},
+        }
+
+        with FlutterwaveStub(latency=options["stub_latency"], amount=str(bench_api.TOP_UP)) as stub:
+            for profile in options["profiles"]:
+                for preload in preloads:
+                    name = f"{profile}{'' if preload else '-nopreload'}"
+                    results["runs"][name] = self._run(profile, preload, mix, stub, options)
+                    self._report_run(name, results["runs"][name])
+
+        self._report_table(results["runs"])
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(results, f, indent=2)
+
+    def _run(self, profile, preload, mix, stub, options):
+        # Same request sequence for every run, against a fresh fixture
+        rng = random.Random(options["seed"])
+        ops = rng.choices(list(mix), weights=list(mix.values()), k=options["requests"])
+        fixture = self._seed(options["users"], options["transactions"], {op: ops.count(op) for op in mix})
+
+        env = {
+            "FLUTTERWAVE_BASE_URL": stub.base_url,
+            "FLUTTERWAVE_SECRET_HASH": bench_api.WEBHOOK_HASH,
+            "NAME_ENQUIRY_BACKEND": "backdave_app.name_enquiry.StubBackend",
+            "SPENDING_LIMITS_JSON": json.dumps(bench_api.BENCH_LIMITS),
+            "GUNICORN_PRELOAD": str(preload),
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            pidfile = os.path.join(tmp, "gunicorn.pid")  # gunicorn removes it on exit
+            args = ["--pid", pidfile]
+            if profile == "gthread":
+                args += ["--threads", str(options["threads"])]
+            with loadtest.serve(profile, options["workers"], env, args) as base:
+                with open(pidfile) as f:
+                    master = int(f.read())
+                idle = self._memory(master, options["workers"])
+                timings, elapsed = asyncio.run(self._fire(base, ops, fixture, rng, options["concurrency"]))
+                loaded = self._memory(master, options["workers"])
+
+        latencies, statuses = [], defaultdict(int)
+        for op_latencies, op_statuses in timings.values():
+            latencies += op_latencies
+            for code, n in op_statuses.items():
+                statuses[code] += n
+        return {"idle": idle, "loaded": loaded, **loadtest.summarize(latencies, statuses, elapsed)}
+
+    def _memory(self, master, expected):
+        """Master and median per-worker memory, once every worker has booted."""
+        deadline = time.monotonic() + 30
+        while len(workers := loadtest.worker_pids(master)) < expected and time.monotonic() < deadline:
+            time.sleep(0.2)
+        samples = [loadtest.process_memory(pid) for pid in workers]
+        per_worker = {key: round(statistics.median(s[key] for s in samples), 1) for key in samples[0]}
+        return {
+            "master": loadtest.process_memory(master),
+            "workers": len(samples),
+            "per_worker": per_worker,
+            "total_pss_mb": round(
+                sum(s["pss_mb"] for s in samples) + loadtest.process_memory(master)["pss_mb"], 1,
+            ),
+        }
+
+    def _report_run(self, name, r):
+        self.stdout.write(
+            f"{name}: {r['rps']} req/s, p95 {r['p95_ms']} ms, {r['statuses']}; "
+            f"worker USS {r['idle']['per_worker']['uss_mb']} -> {r['loaded']['per_worker']['uss_mb']} MB"
+        )
+
+    def _report_table(self, runs):
+        self.stdout.write(
+            f"\n{'run':<18} {'req/s':>7} {'p50':>8} {'p95':>8}  "
+            f"{'RSS/w':>7} {'PSS/w':>7} {'USS/w':>7} {'total PSS':>10}  (MB per worker, after load)"
+        )
+        for name, r in runs.items():
+            mem = r["loaded"]["per_worker"]
+            self.stdout.write(
+                f"{name:<18} {r['rps']:>7} {r['p50_ms']:>8} {r['p95_ms']:>8}  "
+                f"{mem['rss_mb']:>7} {mem['pss_mb']:>7} {mem['uss_mb']:>7} {r['loaded']['total_pss_mb']:>10}"
+            )
@@ -0,0 +1,79 @@
+import json
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from backdave_app import integrity
+
+
+def _check_range(bounds, chunk_size, samples):
+    # Runs in a forked worker; it opens its own database connection
+    return integrity.check(*bounds, chunk_size=chunk_size, samples=samples)
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify wallet balances against the ledger, streaming it in one snapshot: posting chains, "
+        "stored and mirrored balances, and the transactions posted to them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=50_000, help="Rows per fetch and NumPy pass.")
+        parser.add_argument(
+            "--processes", type=int, default=1,
+            help="Split the wallet id range across this many processes, each with its own connection.",
+        )
+        parser.add_argument("--samples", type=int, default=20, help="Issues to show in full.")
+        parser.add_argument("--json", action="store_true", dest="as_json", help="Print the report as JSON.")
+
+    def handle(self, *args, chunk_size, processes, samples, as_json, **options):
+        started = time.perf_counter()
+        if processes > 1:
+            ranges = integrity.wallet_ranges(processes)
+            # Forked workers must not share the parent's connection
+            connections.close_all()
+            with multiprocessing.get_context("fork").Pool(len(ranges)) as pool:
+                parts = pool.starmap(_check_range, [(bounds, chunk_size, samples) for bounds in ranges])
+            report = _merge(parts, samples)
+        else:
+            def progress(result):
+                rate = (result["postings"] + result["transactions"]) / (time.perf_counter() - started)
+                self.stdout.write(
+                    f"  {result['postings']} postings, {result['accounts']} wallets, "
+                    f"{result['transactions']} transactions checked, {rate:.0f} rows/s"
+                )
+
+            report = integrity.check(chunk_size=chunk_size, samples=samples, progress=None if as_json else progress)
+        elapsed = time.perf_counter() - started
+        report["seconds"] = round(elapsed, 1)
+        issues = sum(report["issues"].values())
+
+        if as_json:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            for issue in report["samples"]:
+                self.stdout.write(self.style.WARNING("  " + ", ".join(f"{k}={v}" for k, v in issue.items())))
+            rate = (report["postings"] + report["transactions"]) / elapsed if elapsed else 0
+            summary = (
+                f"Checked {report['postings']} postings, {report['accounts']} wallets and "
+                f"{report['transactions']} transactions in {elapsed:.1f}s ({rate:.0f} rows/s)"
+            )
+            self.stdout.write(self.style.SUCCESS(summary) if not issues else summary)
+        if issues:
+            counts = ", ".join(f"{count} {kind}" for kind, count in report["issues"].items() if count)
+            raise CommandError(f"{issues} discrepancies: {counts}")
+
+
+def _merge(parts, samples):
+    report = {"postings": 0, "accounts": 0, "transactions": 0,
+              "issues": dict.fromkeys(integrity.ISSUE_KINDS, 0), "samples": []}
+    for part in parts:
+        for key in ("postings", "accounts", "transactions"):
+            report[key] += part[key]
+        for kind, count in part["issues"].items():
+            report["issues"][kind] += count
+        report["samples"] += part["samples"]
+    report["samples"] = report["samples"][:samples]
+    return report
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from backdave_app.flutterwave_stub import FlutterwaveStub
+
+
+class Command(BaseCommand):
+    help = "Run a local Flutterwave verify API stub (set FLUTTERWAVE_BASE_URL to the printed URL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency", type=float, default=0.0, help="Seconds to sleep per call.")
+        parser.add_argument("--amount", default="1000.00", help="Amount reported for every payment.")
+        parser.add_argument("--status", default="successful", help="Payment status reported.")
+
+    def handle(self, *args, **options):
+        stub = FlutterwaveStub(
+            host=options["host"], port=options["port"], latency=options["latency"],
+            amount=options["amount"], status=options["status"],
+        )
+        self.stdout.write(f"Flutterwave stub listening on {stub.base_url}")
+        try:
+            stub.serve_forever()
+        except KeyboardInterrupt:
+            stub.stop()
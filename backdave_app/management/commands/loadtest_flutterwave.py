@@ -0,0 +1,123 @@
+import asyncio
+import json
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from backdave_app import loadtest
+from backdave_app.flutterwave_stub import FlutterwaveStub
+from backdave_app.models import Transaction
+
+User = get_user_model()
+
+WEBHOOK_HASH = "loadtest-hash"
+AMOUNT = Decimal("1000.00")
+
+class Command(BaseCommand):
+    help = (
+        "Compare WSGI (sync views) and ASGI (async views) capacity on the Flutterwave "
+        "webhook against a local stub with injected latency. --pair also sends the "
+        "client's verify call for each payment at the same moment, as at settlement "
+        "peaks, and reports upstream verify calls per payment. Seeds rows into the "
+        "configured database, so point DATABASE_URL at a scratch DB."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Webhooks sent per profile.")
+        parser.add_argument("--concurrency", type=int, default=100)
+        parser.add_argument("--latency", type=float, default=0.5, help="Stub latency in seconds.")
+        parser.add_argument("--workers", type=int, default=2, help="gunicorn workers per profile.")
+        parser.add_argument("--profiles", nargs="+", default=list(loadtest.PROFILES), choices=list(loadtest.PROFILES))
+        parser.add_argument("--pair", action="store_true", help="Race a client verify against every webhook.")
+        parser.add_argument("--json", dest="json_path", help="Write results to this file.")
+
+    def handle(self, *args, **options):
+        n = options["requests"]
+        run_id = uuid.uuid4().hex[:8]
+        user = User.objects.create_user(phone=f"lt-{run_id}", password="0000", full_name="Load Test")
+
+        try:
+            with FlutterwaveStub(latency=options["latency"], amount=str(AMOUNT)) as stub:
+                results = {}
+                for profile in options["profiles"]:
+                    refs = self._seed(user, f"LT-{run_id}-{profile}", n)
+                    results[profile] = self._run(profile, refs, stub, options)
+                    self._report(profile, results[profile])
+        finally:
+            user.delete()
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(results, f, indent=2)
+
+    def _seed(self, user, prefix, n):
+        # bulk_create skips Transaction.save(): pending rows must not touch the balance
+        refs = [f"{prefix}-{i}" for i in range(n)]
+        Transaction.objects.bulk_create(
+            Transaction(
+                user=user, type="Add Money", amount=AMOUNT, balance_after=user.balance,
+                flw_tx_ref=ref, flw_status="pending", flw_currency="NGN",
+                description="Load test top-up",
+            )
+            for ref in refs
+        )
+        return refs
+
+    def _run(self, profile, refs, stub, options):
+        env = {"FLUTTERWAVE_BASE_URL": stub.base_url, "FLUTTERWAVE_SECRET_HASH": WEBHOOK_HASH}
+        token = None
+        if options["pair"]:
+            from rest_framework_simplejwt.tokens import RefreshToken
+            token = str(RefreshToken.for_user(Transaction.objects.get(flw_tx_ref=refs[0]).user).access_token)
+        with loadtest.serve(profile, options["workers"], env) as base:
+            calls = stub.calls
+            result = asyncio.run(self._fire(base, refs, options["concurrency"], token))
+        result["upstream_per_payment"] = round((stub.calls - calls) / len(refs), 2)
+        return result
+
+    async def _fire(self, base, refs, concurrency, token=None):
+        import httpx
+
+        sem = asyncio.Semaphore(concurrency)
+        latencies, statuses = [], {}
+        limits = httpx.Limits(max_connections=concurrency)
+
+        async with httpx.AsyncClient(base_url=base, timeout=120, limits=limits) as client:
+            async def post(path, **kwargs):
+                start = time.perf_counter()
+                try:
+                    code = (await client.post(path, **kwargs)).status_code
+                except httpx.HTTPError:
+                    code = "error"
+                latencies.append(time.perf_counter() - start)
+                statuses[code] = statuses.get(code, 0) + 1
+
+            async def one(i, ref):
+                payload = {"data": {"id": 1000 + i, "tx_ref": ref, "status": "successful",
+                                    "amount": str(AMOUNT), "currency": "NGN"}}
+                async with sem:
+                    calls = [post("/api/flutterwave/webhook/", json=payload, headers={"verif-hash": WEBHOOK_HASH})]
+                    if token:
+                        calls.append(post(
+                            "/api/flutterwave/verify/", json={"tx_ref": ref},
+                            headers={"Authorization": f"Bearer {token}"},
+                        ))
+                    await asyncio.gather(*calls)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i, ref) for i, ref in enumerate(refs)))
+            elapsed = time.perf_counter() - start
+
+        return {"concurrency": concurrency, "elapsed_s": round(elapsed, 3),
+                **loadtest.summarize(latencies, statuses, elapsed)}
+
+    def _report(self, profile, r):
+        self.stdout.write(
+            f"{profile}: {r['requests']} req @ c={r['concurrency']} in {r['elapsed_s']}s "
+            f"-> {r['rps']} req/s, p50 {r['p50_ms']}ms, p95 {r['p95_ms']}ms, "
+            f"p99 {r['p99_ms']}ms, statuses {r['statuses']}, "
+            f"{r['upstream_per_payment']} upstream verifies per payment"
+        )
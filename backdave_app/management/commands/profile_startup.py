@@ -0,0 +1,167 @@
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter under -X importtime; prints phase timings as JSON
+PROBE = """
+import json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backdave_bank.settings")
+from backdave_bank.{entry} import application
+loaded = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+routed = time.perf_counter()
+{first_request}
+served = time.perf_counter()
+print(json.dumps({{
+    "app_ms": (loaded - started) * 1000,
+    "urls_ms": (routed - loaded) * 1000,
+    "first_request_ms": (served - routed) * 1000,
+    "modules": len(sys.modules),
+}}))
+"""
+WSGI_REQUEST = """
+from wsgiref.util import setup_testing_defaults
+environ = {"PATH_INFO": "/healthz", "HTTP_HOST": "localhost"}
+setup_testing_defaults(environ)
+b"".join(application(environ, lambda status, headers, exc_info=None: None))
+"""
+ASGI_REQUEST = """
+import asyncio
+messages = [{"type": "http.request", "body": b"", "more_body": False}]
+async def receive():
+    if messages:
+        return messages.pop()
+    await asyncio.Event().wait()
+async def send(message):
+    pass
+scope = {"type": "http", "method": "GET", "path": "/healthz", "query_string": b"", "headers": [(b"host", b"localhost")],
+         "asgi": {"version": "3.0"}, "http_version": "1.1", "scheme": "http", "server": ("localhost", 80), "client": ("127.0.0.1", 1)}
+asyncio.run(application(scope, receive, send))
+"""
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+class Command(BaseCommand):
+    help = (
+        "Cold-start profile: imports the WSGI/ASGI application in a fresh interpreter "
+        "under -X importtime, serves one request, and reports interpreter-to-first-"
+        "response time plus the slowest imports. --json/--compare track it across "
+        "commits; Render scales to zero, so this is the latency a cold request sees."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entry", choices=("wsgi", "asgi"), default="wsgi")
+        parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters; medians are reported.")
+        parser.add_argument("--top", type=int, default=15, help="Slowest imports to list.")
+        parser.add_argument("--json", dest="json_path", help="Write results to this file.")
+        parser.add_argument("--compare", help="Earlier --json output to diff against.")
+
+    def handle(self, *args, **options):
+        runs = [self._probe(options["entry"]) for _ in range(options["runs"])]
+        phases = {
+            key: round(statistics.median(run[key] for run in runs), 1)
+            for key in ("total_ms", "interpreter_ms", "app_ms", "urls_ms", "first_request_ms")
+        }
+        imports = self._merge([run["imports"] for run in runs])
+        results = {
+            "commit": self._commit(),
+            "entry": options["entry"],
+            "runs": options["runs"],
+            "modules": runs[-1]["modules"],
+            **phases,
+            "packages_ms": self._by_package(imports),
+            "slowest_imports_ms": dict(sorted(
+                ((name, cumulative) for name, (_, cumulative, depth) in imports.items() if depth == 0),
+                key=lambda kv: -kv[1],
+            )[:options["top"]]),
+        }
+        self._report(results)
+        if options["compare"]:
+            self._compare(results, options["compare"])
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(results, f, indent=2)
+
+    def _probe(self, entry):
+        script = PROBE.format(entry=entry, first_request=WSGI_REQUEST if entry == "wsgi" else ASGI_REQUEST)
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", script],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        total = (time.perf_counter() - started) * 1000
+        if proc.returncode:
+            raise CommandError(f"Probe failed:\n{proc.stderr[-2000:]}")
+
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["total_ms"] = total
+        result["interpreter_ms"] = total - result["app_ms"] - result["urls_ms"] - result["first_request_ms"]
+        result["imports"] = {}
+        for line in proc.stderr.splitlines():
+            match = IMPORT_LINE.match(line)
+            if match:
+                own, cumulative, indent, name = match.groups()
+                result["imports"][name] = (int(own) / 1000, int(cumulative) / 1000, len(indent) // 2)
+        return result
+
+    def _merge(self, runs):
+        """Median (self ms, cumulative ms, depth) per module over the runs that imported it."""
+        names = set().union(*runs)
+        return {
+            name: (
+                statistics.median(run[name][0] for run in runs if name in run),
+                statistics.median(run[name][1] for run in runs if name in run),
+                min(run[name][2] for run in runs if name in run),
+            )
+            for name in names
+        }
+
+    def _by_package(self, imports):
+        totals = {}
+        for name, (own, _, _) in imports.items():
+            package = name.split(".")[0]
+            totals[package] = totals.get(package, 0) + own
+        return {k: round(v, 1) for k, v in sorted(totals.items(), key=lambda kv: -kv[1]) if v >= 1}
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _report(self, r):
+        self.stdout.write(
+            f"{r['entry']} cold start (median of {r['runs']}): {r['total_ms']} ms to first response = "
+            f"interpreter {r['interpreter_ms']} + app import {r['app_ms']} + URLconf {r['urls_ms']} "
+            f"+ first request {r['first_request_ms']} ms; {r['modules']} modules"
+        )
+        self.stdout.write("\nSelf time by package (ms):")
+        for package, ms in list(r["packages_ms"].items())[:len(r["slowest_imports_ms"])]:
+            self.stdout.write(f"  {package:<28} {ms:>8}")
+        self.stdout.write("\nSlowest top-level imports (cumulative ms):")
+        for name, ms in r["slowest_imports_ms"].items():
+            self.stdout.write(f"  {name:<40} {ms:>8.1f}")
+
+    def _compare(self, results, path):
+        with open(path) as f:
+            before = json.load(f)
+        self.stdout.write(f"\nvs {before.get('commit')} ({path}):")
+        for key in ("total_ms", "app_ms", "urls_ms", "first_request_ms"):
+            old, new = before[key], results[key]
+            line = f"  {key:<18} {old} -> {new} ms ({(new - old) / old * 100:+.0f}%)"
+            self.stdout.write(self.style.WARNING(line) if new > old * 1.1 else line)
+        for package in sorted(set(before["packages_ms"]) | set(results["packages_ms"])):
+            old, new = before["packages_ms"].get(package, 0), results["packages_ms"].get(package, 0)
+            if abs(new - old) >= 5:
+                self.stdout.write(f"  {package:<18} {old} -> {new} ms")
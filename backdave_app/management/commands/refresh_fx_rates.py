@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from backdave_app import fx
+
+
+class Command(BaseCommand):
+    help = (
+        "Fetch exchange rates from FX_RATES_PROVIDER and publish them as a new version; "
+        "processes pick it up within FX_RATES_RELOAD_SECONDS (run from cron)."
+    )
+
+    def handle(self, *args, **options):
+        try:
+            version = fx.refresh()
+        except fx.FxError as e:
+            raise CommandError(f"Exchange rates not refreshed: {e}")
+        rates = fx.table().rates
+        self.stdout.write(
+            f"Published exchange rates version {version}: "
+            + ", ".join(f"{code} {rate}" for code, rate in sorted(rates.items()))
+        )
@@ -0,0 +1,27 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backdave_app import fraud
+
+
+class Command(BaseCommand):
+    help = "Recompute fraud risk scores for all debits in a date range with the current model (vectorized)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Rescore debits from the last N days.")
+        parser.add_argument("--users-per-chunk", type=int, default=5000)
+
+    def handle(self, *args, days, users_per_chunk, **options):
+        since = timezone.now() - timedelta(days=days)
+        started = time.perf_counter()
+
+        def progress(scored, last_user_id):
+            rate = scored / (time.perf_counter() - started)
+            self.stdout.write(f"  {scored} debits scored (users up to {last_user_id}), {rate:.0f} rows/s")
+
+        scored = fraud.rescore(since, users_per_chunk=users_per_chunk, progress=progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Rescored {scored} debits since {since:%Y-%m-%d} in {elapsed:.1f}s"))
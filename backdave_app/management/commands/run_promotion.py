@@ -0,0 +1,39 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backdave_app import jobs, rewards
+
+
+class Command(BaseCommand):
+    help = (
+        "Promotion batch redemption: cash out every user's points (at least "
+        "--min-points) at --naira-per-point, in chunks of REWARDS_BATCH_CHUNK "
+        "users. Queued for runworker by default; --inline runs it here. "
+        "Safe to re-run: users already paid for CODE are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("code", help="Promotion code (1-12 letters/digits), used in references.")
+        parser.add_argument("--naira-per-point", type=Decimal, default=settings.REWARDS_NAIRA_PER_POINT)
+        parser.add_argument("--min-points", type=int, default=settings.REWARDS_MIN_REDEMPTION_POINTS)
+        parser.add_argument("--inline", action="store_true")
+
+    def handle(self, *args, code, naira_per_point, min_points, inline, **options):
+        if not rewards.PROMOTION_CODE.match(code):
+            raise CommandError("Promotion code must be 1-12 letters or digits")
+
+        if not inline:
+            jobs.enqueue("redeem_promotion_chunk", promotion=code, naira_per_point=str(naira_per_point),
+                         min_points=min_points)
+            self.stdout.write(f"Queued promotion {code}; run manage.py runworker to process it")
+            return
+
+        after_id, total = 0, 0
+        while after_id is not None:
+            redeemed, after_id = rewards.redeem_batch(code, naira_per_point, min_points, after_id=after_id)
+            total += redeemed
+            if after_id is not None:
+                self.stdout.write(f"  up to user {after_id}: {total} redeemed")
+        self.stdout.write(self.style.SUCCESS(f"Promotion {code}: {total} users redeemed"))
@@ -0,0 +1,58 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from backdave_app import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (see backdave_app/jobs.py). Stops cleanly on SIGINT/SIGTERM."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY,
+                            help="Worker threads (default JOB_WORKER_CONCURRENCY).")
+        parser.add_argument("--batch", type=int, default=10, help="Jobs claimed per poll, per thread.")
+        parser.add_argument("--poll-interval", type=float, default=settings.JOB_POLL_INTERVAL)
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty.")
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: self.stop.set())
+
+        self.done = self.failed = 0
+        self.lock = threading.Lock()
+        threads = [
+            threading.Thread(target=self._loop, args=(f"{jobs.worker_id()}:{i}", options), daemon=True)
+            for i in range(options["concurrency"])
+        ]
+        self.stdout.write(f"Worker {jobs.worker_id()} running {len(threads)} threads")
+        for t in threads:
+            t.start()
+        for t in threads:
+            while t.is_alive():
+                t.join(timeout=0.5)
+        self.stdout.write(f"Stopped: {self.done} done, {self.failed} failed")
+
+    def _loop(self, locked_by, options):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                claimed = jobs.claim(options["batch"], locked_by)
+                if not claimed:
+                    if options["once"]:
+                        return
+                    self.stop.wait(options["poll_interval"])
+                    continue
+                for job in claimed:
+                    ok = jobs.run(job)
+                    with self.lock:
+                        if ok:
+                            self.done += 1
+                        else:
+                            self.failed += 1
+        finally:
+            connection.close()
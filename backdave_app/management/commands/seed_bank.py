@@ -0,0 +1,263 @@
+import csv
+import io
+import itertools
+import time
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from backdave_app import ledger
+from backdave_app.models import JournalEntry, LedgerAccount, Posting, Transaction, User
+
+# type: (share of rows, median naira, lognormal sigma, credit?)
+TYPES = {
+    "Deposit": (0.05, 20_000, 0.9, True),
+    "Add Money": (0.12, 10_000, 0.8, True),
+    "Transfer": (0.15, 5_000, 1.0, False),
+    "Withdrawal": (0.05, 8_000, 0.9, False),
+    "Airtime Purchase": (0.25, 500, 0.7, False),
+    "Data Purchase": (0.18, 1_500, 0.6, False),
+    "Bill Payment": (0.12, 6_000, 0.8, False),
+    "Betting": (0.08, 1_000, 1.0, False),
+}
+NETWORKS = ("MTN", "Airtel", "Glo", "9mobile")
+BILLERS = ("IKEDC", "EKEDC", "DSTV", "GOtv", "Startimes", "LAWMA")
+FIRST_NAMES = ("Ada", "Bola", "Chinedu", "Dayo", "Emeka", "Funmi", "Gbenga", "Halima", "Ifeoma", "Tunde")
+LAST_NAMES = ("Adeyemi", "Bello", "Chukwu", "Danjuma", "Eze", "Fashola", "Okafor", "Usman")
+MAX_AMOUNT = 200_000
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a deterministic synthetic bank: --users users and --transactions "
+        "transactions with consistent balance_after chains, computed with NumPy and "
+        "inserted in chunks with COPY (Postgres) or one prepared INSERT per chunk "
+        "(--method bulk uses bulk_create, ~5x slower). Every user shares one "
+        "precomputed PIN hash, and each wallet opens with one Opening Balance entry "
+        "carrying the final balance (as in migration 0021), so the ledger stays "
+        "balanced. Run rescore_transactions afterwards for fraud scores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument("--transactions", type=int, default=1_000_000, help="Total rows across all users.")
+        parser.add_argument("--days", type=int, default=365, help="History spread over this many days.")
+        parser.add_argument("--until", help="Last day of history (YYYY-MM-DD, default today); fixes the dates.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="seed", help="Phone/reference prefix; must be unused.")
+        parser.add_argument("--pin", default="0000")
+        parser.add_argument("--chunk", type=int, default=100_000, help="Transactions per insert.")
+        parser.add_argument("--method", choices=("auto", "copy", "insert", "bulk"), default="auto")
+
+    def handle(self, *args, **options):
+        n_users, n_rows = options["users"], options["transactions"]
+        if n_users < 1 or n_rows < n_users:
+            raise CommandError("Need at least one user and one transaction per user")
+        method = options["method"]
+        if method == "auto":
+            method = "copy" if connection.vendor == "postgresql" else "insert"
+        if method == "copy" and connection.vendor != "postgresql":
+            raise CommandError("--method copy needs PostgreSQL")
+        if User.objects.filter(phone__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"Users with prefix {options['prefix']!r} already exist; pick another --prefix")
+
+        started = time.perf_counter()
+        rows = self._generate(n_users, n_rows, options)
+        self.stdout.write(f"Generated {n_rows} transactions in {time.perf_counter() - started:.1f}s")
+
+        with transaction.atomic():
+            step = time.perf_counter()
+            user_ids = self._insert_users(rows, options)
+            self.stdout.write(f"Inserted {n_users} users, wallets and openings in {time.perf_counter() - step:.1f}s")
+
+            step = time.perf_counter()
+            insert = {"copy": self._copy, "insert": self._insert, "bulk": self._bulk_create}[method]
+            for start in range(0, n_rows, options["chunk"]):
+                insert(rows, user_ids, start, min(start + options["chunk"], n_rows), options["prefix"])
+            elapsed = time.perf_counter() - step
+            self.stdout.write(f"Inserted {n_rows} transactions ({method}) in {elapsed:.1f}s = {n_rows / elapsed:,.0f} rows/s")
+
+        self.stdout.write(self.style.SUCCESS(f"Seeded in {time.perf_counter() - started:.1f}s"))
+
+    # --------------------------
+    # GENERATION
+    # --------------------------
+    def _generate(self, n_users, n_rows, options):
+        """Column arrays for every row, sorted by (user, date)."""
+        rng = np.random.default_rng(options["seed"])
+
+        # Skewed activity: a few heavy users, a long tail of light ones; at least one row each
+        weights = rng.lognormal(0, 1.0, n_users)
+        counts = 1 + rng.multinomial(n_rows - n_users, weights / weights.sum())
+        user = np.repeat(np.arange(n_users), counts)
+        starts = np.r_[0, np.cumsum(counts)[:-1]]
+
+        until = datetime.strptime(options["until"], "%Y-%m-%d").date() if options["until"] else timezone.now().date()
+        end = datetime.combine(until, dt_time.max, tzinfo=dt_timezone.utc).timestamp()
+        seconds = rng.uniform(end - options["days"] * 86400, end, n_rows)
+        seconds = seconds[np.lexsort((seconds, user))]
+
+        names = list(TYPES)
+        shares = np.array([TYPES[t][0] for t in names])
+        kind = rng.choice(len(names), n_rows, p=shares / shares.sum())
+        kind[starts] = names.index("Deposit")  # every history opens with a deposit
+        medians = np.array([TYPES[t][1] for t in names], dtype=float)
+        sigmas = np.array([TYPES[t][2] for t in names])
+        credit = np.array([TYPES[t][3] for t in names])
+        naira = np.clip(np.round(medians[kind] * rng.lognormal(0, sigmas[kind])), 50, MAX_AMOUNT).astype(np.int64)
+
+        # Size each opening deposit so the balance never goes negative:
+        # running balance before it is 0, so it must cover the lowest point after
+        signed = np.where(credit[kind], naira, -naira) * 100  # kobo
+        signed[starts] = 0
+        total = np.cumsum(signed)
+        relative = total - np.repeat(total[starts] - signed[starts], counts)
+        lowest = np.minimum.reduceat(relative, starts)
+        opening = np.maximum(naira[starts] * 100, -lowest)
+        opening = (opening + 9_999) // 10_000 * 10_000  # round up to ₦100
+        naira[starts] = opening // 100
+        balance = relative + np.repeat(opening, counts)
+
+        return {
+            "counts": counts, "user": user, "seconds": seconds, "kind": kind, "names": names,
+            "naira": naira, "balance": balance, "final": balance[np.cumsum(counts) - 1],
+            "first": seconds[starts], "detail": rng.integers(0, 10 ** 9, n_rows),
+        }
+
+    # --------------------------
+    # USERS AND LEDGER
+    # --------------------------
+    def _insert_users(self, rows, options):
+        prefix, n_users = options["prefix"], len(rows["counts"])
+        password = make_password(options["pin"])  # one hash for every user
+        final = [Decimal(int(k)) / 100 for k in rows["final"]]
+        users = User.objects.bulk_create(
+            (
+                User(
+                    phone=f"{prefix}-{i:07d}", password=password,
+                    full_name=f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)]}",
+                    email=f"{prefix}-{i:07d}@example.com", balance=final[i],
+                    date_joined=datetime.fromtimestamp(rows["first"][i] - 3600, tz=dt_timezone.utc),
+                )
+                for i in range(n_users)
+            ),
+            batch_size=5000,
+        )
+        wallets = LedgerAccount.objects.bulk_create(
+            (LedgerAccount(code=f"wallet:{u.pk}", kind=LedgerAccount.WALLET, user_id=u.pk, balance=final[i])
+             for i, u in enumerate(users)),
+            batch_size=5000,
+        )
+        funded = [(w, final[i]) for i, w in enumerate(wallets) if final[i]]
+        entries = JournalEntry.objects.bulk_create(
+            (JournalEntry(kind="Opening Balance", reference=w.code) for w, _ in funded), batch_size=5000,
+        )
+        opening = ledger.system_account("opening_balances")
+        Posting.objects.bulk_create(
+            itertools.chain.from_iterable(
+                (Posting(entry=entry, account=wallet, amount=amount, balance_after=amount),
+                 Posting(entry=entry, account=opening, amount=-amount))
+                for entry, (wallet, amount) in zip(entries, funded)
+            ),
+            batch_size=5000,
+        )
+        return np.array([u.pk for u in users])
+
+    # --------------------------
+    # TRANSACTIONS
+    # --------------------------
+    def _columns(self, rows, user_ids, lo, hi, prefix):
+        """Transaction column -> values for rows [lo, hi)."""
+        names = rows["names"]
+        kinds = [names[k] for k in rows["kind"][lo:hi].tolist()]
+        naira = rows["naira"][lo:hi].tolist()
+        detail = rows["detail"][lo:hi].tolist()
+        references = [f"{prefix.upper()}-{i:x}" for i in range(lo, hi)]
+        details = []
+        for kind, amount, d in zip(kinds, naira, detail):
+            phone = provider = recipient = category = account_number = None
+            if kind in ("Airtime Purchase", "Data Purchase"):
+                phone, provider = f"080{d % 10 ** 8:08d}", NETWORKS[d % len(NETWORKS)]
+                text = f"{kind} of ₦{amount}.00 to {phone} via {provider}"
+            elif kind == "Bill Payment":
+                recipient, category = BILLERS[d % len(BILLERS)], "Utilities"
+                text = f"{kind} of ₦{amount}.00 to {recipient} ({category})"
+            elif kind == "Betting":
+                recipient = "Bet9ja"
+                text = f"Betting - {recipient} (₦{amount}.00)"
+            elif kind in ("Transfer", "Withdrawal"):
+                # Four in five go to a few regular payees, the rest to new accounts
+                account_number = f"{3_000_000_000 + d % 6:010d}" if d % 5 else f"{d:010d}"
+                recipient = "Seeded payee"
+                text = f"Transfer of ₦{amount}.00 to {recipient}" if kind == "Transfer" else f"{kind} of ₦{amount}.00"
+            else:
+                text = f"{kind} of ₦{amount}.00"
+            details.append((phone, provider, recipient, category, account_number, text))
+        phone, provider, recipient, category, account_number, description = zip(*details)
+
+        add_money = [k == "Add Money" for k in kinds]
+        return {
+            "user_id": user_ids[rows["user"][lo:hi]].tolist(),
+            "type": kinds,
+            "amount": [f"{a}.00" for a in naira],
+            "balance_after": [f"{b // 100}.{b % 100:02d}" for b in rows["balance"][lo:hi].tolist()],
+            "description": description,
+            "date": [datetime.fromtimestamp(s, tz=dt_timezone.utc) for s in rows["seconds"][lo:hi].tolist()],
+            "reference": references,
+            "phone": phone, "provider": provider, "recipient": recipient, "category": category,
+            "account_number": account_number,
+            "flw_tx_ref": [ref if m else None for ref, m in zip(references, add_money)],
+            "flw_status": ["successful" if m else None for m in add_money],
+            "processed": add_money,
+        }
+
+    def _rows(self, rows, user_ids, lo, hi, prefix):
+        """(Transaction fields, row tuples) for rows [lo, hi); unset fields get their defaults."""
+        columns = self._columns(rows, user_ids, lo, hi, prefix)
+        fields = [f for f in Transaction._meta.concrete_fields if not f.primary_key]
+        values = []
+        for field in fields:
+            if field.attname in columns:
+                values.append(columns[field.attname])
+            else:
+                values.append(itertools.repeat(field.get_default() if field.has_default() else None, hi - lo))
+        return fields, zip(*values)
+
+    def _copy(self, rows, user_ids, lo, hi, prefix):
+        fields, values = self._rows(rows, user_ids, lo, hi, prefix)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in values:
+            # COPY csv: an unquoted empty field is NULL
+            writer.writerow(["" if v is None else ("t" if v is True else "f" if v is False else v) for v in row])
+        buffer.seek(0)
+        table = connection.ops.quote_name(Transaction._meta.db_table)
+        names = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({names}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    def _insert(self, rows, user_ids, lo, hi, prefix):
+        """One prepared INSERT run over the chunk: bulk_create without building model instances."""
+        fields, values = self._rows(rows, user_ids, lo, hi, prefix)
+        adapt = [
+            connection.ops.adapt_datetimefield_value if f.get_internal_type() == "DateTimeField" else None
+            for f in fields
+        ]
+        values = [tuple(a(v) if a else v for a, v in zip(adapt, row)) for row in values]
+        table = connection.ops.quote_name(Transaction._meta.db_table)
+        names = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+        with connection.cursor() as cursor:
+            cursor.executemany(f"INSERT INTO {table} ({names}) VALUES ({', '.join(['%s'] * len(fields))})", values)
+
+    def _bulk_create(self, rows, user_ids, lo, hi, prefix):
+        columns = self._columns(rows, user_ids, lo, hi, prefix)
+        names = list(columns)
+        Transaction.objects.bulk_create(
+            (Transaction(**dict(zip(names, values))) for values in zip(*columns.values())),
+            batch_size=5000,
+        )
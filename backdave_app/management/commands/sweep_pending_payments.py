@@ -0,0 +1,106 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from backdave_app import flutterwave
+from backdave_app.models import Transaction
+
+logger = logging.getLogger(__name__)
+
+FAILED_STATUSES = {"failed", "cancelled"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify stale pending Flutterwave top-ups with bounded parallelism and "
+        "settle, fail or expire them in batched updates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=30,
+                            help="Only sweep rows pending for at least this many minutes.")
+        parser.add_argument("--expire-after", type=int, default=24,
+                            help="Expire rows still pending upstream after this many hours.")
+        parser.add_argument("--workers", type=int, default=32, help="Concurrent verify calls.")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--limit", type=int, help="Stop after this many rows.")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        import requests
+
+        now = timezone.now()
+        cutoff = now - timedelta(minutes=options["older_than"])
+        expire_before = now - timedelta(hours=options["expire_after"])
+        local = threading.local()
+
+        def verify(row):
+            # One pooled session per worker thread
+            if not hasattr(local, "session"):
+                local.session = requests.Session()
+            try:
+                res = flutterwave.verify_by_reference(row["flw_tx_ref"], session=local.session)
+                return row, res.get("data") or {}
+            except (requests.RequestException, ValueError) as e:
+                logger.warning("Sweep verify failed for tx_ref=%s: %s", row["flw_tx_ref"], e)
+                return row, None
+
+        totals = {"seen": 0, "settled": 0, "failed": 0, "expired": 0, "mismatch": 0, "errors": 0}
+        last = None
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            while options["limit"] is None or totals["seen"] < options["limit"]:
+                size = options["batch_size"]
+                if options["limit"] is not None:
+                    size = min(size, options["limit"] - totals["seen"])
+                # Oldest first, keyset-paginated on the (flw_status, date) index
+                pending = Transaction.objects.filter(flw_status="pending", processed=False, date__lte=cutoff)
+                if last:
+                    pending = pending.filter(Q(date__gt=last[0]) | Q(date=last[0], id__gt=last[1]))
+                rows = list(
+                    pending.order_by("date", "id")
+                    .values("id", "flw_tx_ref", "amount", "flw_amount", "flw_currency", "date")[:size]
+                )
+                if not rows:
+                    break
+                last = (rows[-1]["date"], rows[-1]["id"])
+                totals["seen"] += len(rows)
+
+                settle, failed, expired = {}, [], []
+                for row, data in pool.map(verify, rows):
+                    if data is None:
+                        totals["errors"] += 1
+                    elif data.get("status") == "successful":
+                        charged = row["amount"] if row["flw_amount"] is None else row["flw_amount"]
+                        if (Decimal(str(data.get("amount"))) != charged
+                                or data.get("currency") != row["flw_currency"]):
+                            totals["mismatch"] += 1
+                            logger.error("Sweep mismatch for tx_ref=%s: %s", row["flw_tx_ref"], data)
+                        else:
+                            settle[row["id"]] = data
+                    elif data.get("status") in FAILED_STATUSES:
+                        failed.append(row["id"])
+                    elif row["date"] < expire_before:
+                        expired.append(row["id"])
+
+                if options["dry_run"]:
+                    totals["settled"] += len(settle)
+                    totals["failed"] += len(failed)
+                    totals["expired"] += len(expired)
+                else:
+                    settled, unsettled = flutterwave.settle_verified_batch(settle) if settle else (0, 0)
+                    totals["settled"] += settled
+                    totals["errors"] += unsettled
+                    totals["failed"] += flutterwave.close_pending(failed, "failed") if failed else 0
+                    totals["expired"] += flutterwave.close_pending(expired, "expired") if expired else 0
+
+                self.stdout.write(f"... {totals['seen']} rows checked")
+
+        prefix = "[dry run] " if options["dry_run"] else ""
+        self.stdout.write(prefix + ", ".join(f"{k}={v}" for k, v in totals.items()))
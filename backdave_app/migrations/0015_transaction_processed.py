@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0014_transaction_flw_currency_transaction_flw_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='processed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0015_transaction_processed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='reference',
+            field=models.CharField(blank=True, max_length=32, null=True, unique=True),
+        ),
+    ]
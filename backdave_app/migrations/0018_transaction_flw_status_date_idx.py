@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0017_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['flw_status', 'date'], name='tx_flw_status_date_idx'),
+        ),
+    ]
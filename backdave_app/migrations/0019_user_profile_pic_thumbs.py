@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0018_transaction_flw_status_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_pic_thumbs',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
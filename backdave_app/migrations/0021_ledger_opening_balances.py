@@ -0,0 +1,53 @@
+from django.db import migrations
+
+SYSTEM_ACCOUNTS = (
+    "opening_balances", "cash_deposits", "flutterwave_clearing", "withdrawals",
+    "outbound_transfers", "data_vendors", "airtime_vendors", "billers",
+    "betting_providers", "rewards_expense",
+)
+CHUNK = 2000
+
+
+def open_wallets(apps, schema_editor):
+    """Give every existing user a wallet account carrying today's balance."""
+    User = apps.get_model("backdave_app", "User")
+    LedgerAccount = apps.get_model("backdave_app", "LedgerAccount")
+    JournalEntry = apps.get_model("backdave_app", "JournalEntry")
+    Posting = apps.get_model("backdave_app", "Posting")
+
+    for code in SYSTEM_ACCOUNTS:
+        LedgerAccount.objects.get_or_create(code=code, defaults={"kind": "system", "metered": False})
+    opening = LedgerAccount.objects.get(code="opening_balances")
+
+    users = User.objects.order_by("pk").values_list("pk", "balance")
+    last_pk = 0
+    while True:
+        chunk = list(users.filter(pk__gt=last_pk)[:CHUNK])
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+
+        wallets = LedgerAccount.objects.bulk_create(
+            LedgerAccount(code=f"wallet:{pk}", kind="wallet", user_id=pk, metered=True, balance=bal)
+            for pk, bal in chunk
+        )
+        funded = [(w, bal) for w, (_, bal) in zip(wallets, chunk) if bal]
+        entries = JournalEntry.objects.bulk_create(
+            JournalEntry(kind="Opening Balance", reference=w.code) for w, _ in funded
+        )
+        postings = []
+        for entry, (wallet, bal) in zip(entries, funded):
+            postings.append(Posting(entry=entry, account=wallet, amount=bal, balance_after=bal))
+            postings.append(Posting(entry=entry, account=opening, amount=-bal))
+        Posting.objects.bulk_create(postings)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0020_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(open_wallets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0021_ledger_opening_balances'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ledgeraccount',
+            name='shard_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='BalanceShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='backdave_app.ledgeraccount')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('account', 'index'), name='unique_balance_shard')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0022_balance_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='counterparty',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='type',
+            field=models.CharField(choices=[('Deposit', 'Deposit'), ('Withdrawal', 'Withdrawal'), ('Transfer', 'Transfer'), ('Transfer Received', 'Transfer Received'), ('Add Money', 'Add Money'), ('Data Purchase', 'Data Purchase'), ('Airtime Purchase', 'Airtime Purchase'), ('Bill Payment', 'Bill Payment'), ('Betting', 'Betting'), ('Reward Points', 'Reward Points'), ('Reward Redemption', 'Reward Redemption')], max_length=20),
+        ),
+    ]
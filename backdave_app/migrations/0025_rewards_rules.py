@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0024_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RewardRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_type', models.CharField(blank=True, choices=[('Deposit', 'Deposit'), ('Withdrawal', 'Withdrawal'), ('Transfer', 'Transfer'), ('Transfer Received', 'Transfer Received'), ('Add Money', 'Add Money'), ('Data Purchase', 'Data Purchase'), ('Airtime Purchase', 'Airtime Purchase'), ('Bill Payment', 'Bill Payment'), ('Betting', 'Betting'), ('Reward Points', 'Reward Points'), ('Reward Redemption', 'Reward Redemption')], max_length=20)),
+                ('min_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('max_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('points', models.PositiveIntegerField(default=0)),
+                ('points_per_naira', models.DecimalField(decimal_places=4, default=0, max_digits=8)),
+                ('max_points', models.PositiveIntegerField(blank=True, null=True)),
+                ('active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['transaction_type', 'min_amount'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RewardsVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=1)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RewardTier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30, unique=True)),
+                ('min_points', models.PositiveIntegerField(unique=True)),
+                ('multiplier', models.DecimalField(decimal_places=2, default=1, max_digits=5)),
+            ],
+            options={
+                'ordering': ['min_points'],
+            },
+        ),
+    ]
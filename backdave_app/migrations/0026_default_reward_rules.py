@@ -0,0 +1,28 @@
+from django.db import migrations
+
+# The rules that were hard-coded before the engine existed
+TIERS = (("Bronze", 0), ("Silver", 1000), ("Gold", 2500), ("Platinum", 5000))
+FLAT_POINTS = 100
+
+
+def seed(apps, schema_editor):
+    RewardTier = apps.get_model("backdave_app", "RewardTier")
+    RewardRule = apps.get_model("backdave_app", "RewardRule")
+    RewardsVersion = apps.get_model("backdave_app", "RewardsVersion")
+
+    for name, min_points in TIERS:
+        RewardTier.objects.get_or_create(name=name, defaults={"min_points": min_points})
+    if not RewardRule.objects.exists():
+        RewardRule.objects.create(transaction_type="", points=FLAT_POINTS)
+    RewardsVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0025_rewards_rules'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:11
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill(apps, schema_editor):
+    """reward_points = SUM(points) of each user's Reward Points/Redemption rows."""
+    User = apps.get_model("backdave_app", "User")
+    Transaction = apps.get_model("backdave_app", "Transaction")
+    totals = (
+        Transaction.objects.filter(user=OuterRef("pk"), type__in=("Reward Points", "Reward Redemption"))
+        .order_by().values("user").annotate(total=Sum("points")).values("total")
+    )
+    User.objects.update(reward_points=Coalesce(Subquery(totals), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0026_default_reward_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='reward_points',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
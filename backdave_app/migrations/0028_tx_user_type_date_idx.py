@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0027_user_reward_points'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'type', 'date'], name='tx_user_type_date_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0028_tx_user_type_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiskProfile',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='risk_profile', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('amount_sum', models.FloatField(default=0)),
+                ('amount_sumsq', models.FloatField(default=0)),
+                ('recent_times', models.JSONField(default=list)),
+                ('recipients', models.JSONField(default=list)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='risk_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+TABLE = "backdave_app_transaction_archive"
+
+
+def create_archive_table(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        # Same columns as the hot table, partitioned by month on date; the
+        # monthly partitions are created by archive_transactions as it needs them
+        schema_editor.execute(
+            f"CREATE TABLE {TABLE} (LIKE backdave_app_transaction INCLUDING DEFAULTS) PARTITION BY RANGE (date)"
+        )
+        schema_editor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, date)")
+    else:
+        # create_model skips the indexes of unmanaged models
+        schema_editor.create_model(apps.get_model("backdave_app", "ArchivedTransaction"))
+    schema_editor.execute(f"CREATE INDEX tx_archive_user_date_idx ON {TABLE} (user_id, date)")
+
+
+def drop_archive_table(apps, schema_editor):
+    schema_editor.execute(f"DROP TABLE {TABLE}" + (" CASCADE" if schema_editor.connection.vendor == "postgresql" else ""))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0029_fraud_scoring'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('type', models.CharField(choices=[('Deposit', 'Deposit'), ('Withdrawal', 'Withdrawal'), ('Transfer', 'Transfer'), ('Transfer Received', 'Transfer Received'), ('Add Money', 'Add Money'), ('Data Purchase', 'Data Purchase'), ('Airtime Purchase', 'Airtime Purchase'), ('Bill Payment', 'Bill Payment'), ('Betting', 'Betting'), ('Reward Points', 'Reward Points'), ('Reward Redemption', 'Reward Redemption')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('balance_after', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('description', models.CharField(blank=True, max_length=255, null=True)),
+                ('date', models.DateTimeField()),
+                ('points', models.IntegerField(default=0)),
+                ('reference', models.CharField(blank=True, max_length=32, null=True)),
+                ('phone', models.CharField(blank=True, max_length=20, null=True)),
+                ('provider', models.CharField(blank=True, max_length=50, null=True)),
+                ('expiry', models.DateField(blank=True, null=True)),
+                ('account_number', models.CharField(blank=True, max_length=50, null=True)),
+                ('category', models.CharField(blank=True, max_length=50, null=True)),
+                ('recipient', models.CharField(blank=True, max_length=100, null=True)),
+                ('planLabel', models.CharField(blank=True, max_length=100, null=True)),
+                ('flw_tx_ref', models.CharField(blank=True, max_length=100, null=True)),
+                ('flw_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('flw_status', models.CharField(blank=True, max_length=50, null=True)),
+                ('flw_payment_type', models.CharField(blank=True, max_length=50, null=True)),
+                ('flw_currency', models.CharField(default='NGN', max_length=10)),
+                ('processed', models.BooleanField(default=False)),
+                ('risk_score', models.FloatField(blank=True, null=True)),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to=settings.AUTH_USER_MODEL)),
+                ('counterparty', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('journal_entry', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='backdave_app.journalentry')),
+            ],
+            options={
+                'db_table': 'backdave_app_transaction_archive',
+                'managed': False,
+                'indexes': [models.Index(fields=['user', 'date'], name='tx_archive_user_date_idx')],
+            },
+        ),
+        migrations.RunPython(create_archive_table, drop_archive_table),
+    ]
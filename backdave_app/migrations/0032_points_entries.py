@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:14
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0031_tx_user_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_tx_id', models.BigIntegerField(blank=True, null=True, unique=True)),
+                ('delta', models.IntegerField()),
+                ('ts', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='points_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'points entries',
+                'indexes': [models.Index(fields=['user', 'ts'], name='points_user_ts_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,97 @@
+from django.core.management.color import no_style
+from django.db import migrations, transaction
+
+BATCH = 5000
+
+
+def _source_ids(apps, references):
+    """Source transaction id by reference, from the hot table or the archive."""
+    ids = {}
+    for name in ("Transaction", "ArchivedTransaction"):
+        model = apps.get_model("backdave_app", name)
+        missing = references - ids.keys()
+        if missing:
+            ids.update(model.objects.filter(reference__in=missing).values_list("reference", "id"))
+    return ids
+
+
+def compact(apps, schema_editor):
+    """
+    Move "Reward Points" rows, hot and archived, into PointsEntry with the
+    same ids, one committed batch at a time; a rerun resumes where it
+    stopped. User.reward_points already counts these points.
+    """
+    PointsEntry = apps.get_model("backdave_app", "PointsEntry")
+    for name in ("Transaction", "ArchivedTransaction"):
+        model = apps.get_model("backdave_app", name)
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    model.objects.filter(type="Reward Points", id__gt=last_id).order_by("id")
+                    .values("id", "user_id", "points", "date", "reference")[:BATCH]
+                )
+                if not rows:
+                    break
+                sources = _source_ids(apps, {
+                    row["reference"][len("RWD-"):] for row in rows if (row["reference"] or "").startswith("RWD-")
+                })
+                PointsEntry.objects.bulk_create(
+                    PointsEntry(
+                        id=row["id"], user_id=row["user_id"], delta=row["points"], ts=row["date"],
+                        source_tx_id=sources.get((row["reference"] or "")[len("RWD-"):]),
+                    )
+                    for row in rows
+                )
+                model.objects.filter(id__in=[row["id"] for row in rows]).delete()
+                last_id = rows[-1]["id"]
+    _reset_sequence(schema_editor, PointsEntry)
+
+
+def expand(apps, schema_editor):
+    """
+    Reverse: one "Reward Points" Transaction per entry again. Entries
+    awarded since the compaction may share ids with transactions, so these
+    rows get fresh ids.
+    """
+    PointsEntry = apps.get_model("backdave_app", "PointsEntry")
+    Transaction = apps.get_model("backdave_app", "Transaction")
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            entries = list(PointsEntry.objects.filter(id__gt=last_id).order_by("id")[:BATCH])
+            if not entries:
+                break
+            references = dict(
+                Transaction.objects.filter(id__in=[e.source_tx_id for e in entries if e.source_tx_id])
+                .values_list("id", "reference")
+            )
+            Transaction.objects.bulk_create(
+                Transaction(
+                    user_id=e.user_id, type="Reward Points", amount=0, points=e.delta, date=e.ts,
+                    reference=f"RWD-{references[e.source_tx_id]}" if e.source_tx_id in references else None,
+                    description=f"Earned {e.delta} reward points",
+                )
+                for e in entries
+            )
+            PointsEntry.objects.filter(id__in=[e.id for e in entries]).delete()
+            last_id = entries[-1].id
+
+
+def _reset_sequence(schema_editor, model):
+    # Rows were inserted with explicit ids; move the id sequence past them (Postgres)
+    for sql in schema_editor.connection.ops.sequence_reset_sql(no_style(), [model]):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own instead of one transaction over the whole table
+    atomic = False
+
+    dependencies = [
+        ('backdave_app', '0032_points_entries'),
+    ]
+
+    operations = [
+        migrations.RunPython(compact, expand),
+    ]
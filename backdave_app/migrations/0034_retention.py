@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0033_compact_reward_points'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetentionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('last_user_id', models.BigIntegerField(default=0)),
+                ('stats', models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TransactionSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('type', models.CharField(choices=[('Deposit', 'Deposit'), ('Withdrawal', 'Withdrawal'), ('Transfer', 'Transfer'), ('Transfer Received', 'Transfer Received'), ('Add Money', 'Add Money'), ('Data Purchase', 'Data Purchase'), ('Airtime Purchase', 'Airtime Purchase'), ('Bill Payment', 'Bill Payment'), ('Betting', 'Betting'), ('Reward Points', 'Reward Points'), ('Reward Redemption', 'Reward Redemption')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('points', models.IntegerField(default=0)),
+                ('last_date', models.DateTimeField(blank=True, null=True)),
+                ('last_id', models.BigIntegerField(blank=True, null=True)),
+                ('balance_after', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'transaction summaries',
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'type'), name='unique_tx_summary_per_month')],
+            },
+        ),
+    ]
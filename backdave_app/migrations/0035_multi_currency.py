@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:51
+
+from django.db import migrations, models
+
+ARCHIVE = "backdave_app_transaction_archive"
+# The archive is unmanaged: it gets the new Transaction columns by hand
+# (on Postgres the partitions follow the parent)
+ARCHIVE_COLUMNS = [
+    ("currency", "varchar(3) DEFAULT 'NGN' NOT NULL"),
+    ("flw_amount", "decimal(14, 2) NULL"),
+    ("fx_rate", "decimal(18, 8) NULL"),
+]
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0034_retention'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ledgeraccount',
+            name='currency',
+            field=models.CharField(default='NGN', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='currency',
+            field=models.CharField(default='NGN', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='flw_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='fx_rate',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=18, null=True),
+        ),
+        migrations.CreateModel(
+            name='FxRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('currency', models.CharField(max_length=3)),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('version', 'currency'), name='unique_fx_rate_per_version')],
+            },
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='archivedtransaction',
+                    name='currency',
+                    field=models.CharField(default='NGN', max_length=3),
+                ),
+                migrations.AddField(
+                    model_name='archivedtransaction',
+                    name='flw_amount',
+                    field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+                ),
+                migrations.AddField(
+                    model_name='archivedtransaction',
+                    name='fx_rate',
+                    field=models.DecimalField(blank=True, decimal_places=8, max_digits=18, null=True),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    f"ALTER TABLE {ARCHIVE} ADD COLUMN {column} {definition}",
+                    f"ALTER TABLE {ARCHIVE} DROP COLUMN {column}",
+                )
+                for column, definition in ARCHIVE_COLUMNS
+            ],
+        ),
+    ]
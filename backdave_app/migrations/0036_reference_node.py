@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0035_multi_currency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceNode',
+            fields=[
+                ('node_id', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ('holder', models.CharField(max_length=100)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backdave_app', '0036_reference_node'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerifyLease',
+            fields=[
+                ('tx_ref', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('token', models.CharField(max_length=32)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -3,8 +3,9 @@ from django.db import models, transaction as db_transaction
 from django.utils import timezone
 from django.conf import settings
 from django.contrib.auth.hashers import make_password, check_password
-import random
-from django.db.models import Sum
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .references import next_reference
 
 
 # ----------------------------------
@@ -38,8 +39,13 @@ class User(AbstractBaseUser, PermissionsMixin):
     dob = models.DateField(blank=True, null=True)
     state = models.CharField(max_length=50, blank=True, null=True)
     city = models.CharField(max_length=50, blank=True, null=True)
+    # Mirror of the wallet's LedgerAccount balance; only ledger.py writes it
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    # Running total of PointsEntry awards and Reward Redemption rows; only rewards.py writes it
+    reward_points = models.IntegerField(default=0)
     profilePic = models.ImageField(upload_to="profile_pics/", blank=True, null=True)
+    # WebP renditions of profilePic by size, filled in by images.py
+    profile_pic_thumbs = models.JSONField(default=dict, blank=True)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     date_joined = models.DateTimeField(default=timezone.now)
@@ -56,30 +62,26 @@ class User(AbstractBaseUser, PermissionsMixin):
     # BANK OPERATIONS
     # --------------------------
     def total_points(self):
-        earned = self.transactions.filter(type="Reward Points").aggregate(Sum('points'))['points__sum'] or 0
-        redeemed = self.transactions.filter(type="Reward Redemption").aggregate(Sum('points'))['points__sum'] or 0
-        return earned + redeemed
+        return self.reward_points
 
     def deposit(self, amount):
-        self.balance += amount
-        self.save(update_fields=["balance"])
+        from . import ledger
+        ledger.move(self, amount, "Deposit")
         return self.balance
 
     def withdraw(self, amount):
-        if amount > self.balance:
-            raise ValueError("Insufficient funds")
-        self.balance -= amount
-        self.save(update_fields=["balance"])
+        from . import ledger
+        ledger.move(self, -amount, "Withdrawal")
         return self.balance
 
     # --------------------------
-    # MOCK BANK ACCOUNT VERIFICATION
+    # BANK ACCOUNT VERIFICATION
     # --------------------------
     def verify_bank_account(self, account_number: str, bank_name: str):
+        from . import name_enquiry
         if not account_number or not bank_name:
             raise ValueError("Both account_number and bank_name are required")
-        fake_names = ["John Doe", "Jane Smith", "Chinedu Okafor", "Ngozi Ude"]
-        return random.choice(fake_names)
+        return name_enquiry.resolve(bank_name, account_number)
 
     # --------------------------
     # PIN HANDLING
@@ -101,6 +103,7 @@ class Transaction(models.Model):
         ("Deposit", "Deposit"),
         ("Withdrawal", "Withdrawal"),
         ("Transfer", "Transfer"),
+        ("Transfer Received", "Transfer Received"),
         ("Add Money", "Add Money"),
         ("Data Purchase", "Data Purchase"),
         ("Airtime Purchase", "Airtime Purchase"),
@@ -110,13 +113,17 @@ class Transaction(models.Model):
         ("Reward Redemption", "Reward Redemption"),
     )
 
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="transactions")
+    # Indexed together with date below: history reads a user's newest rows
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False, related_name="transactions"
+    )
     type = models.CharField(max_length=20, choices=TRANSACTION_TYPES)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     balance_after = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
     description = models.CharField(max_length=255, blank=True, null=True)
     date = models.DateTimeField(default=timezone.now)
     points = models.IntegerField(default=0)
+    reference = models.CharField(max_length=32, blank=True, null=True, unique=True)
 
     # Extra fields
     phone = models.CharField(max_length=20, blank=True, null=True)
@@ -126,6 +133,10 @@ class Transaction(models.Model):
     category = models.CharField(max_length=50, blank=True, null=True)
     recipient = models.CharField(max_length=100, blank=True, null=True)
     planLabel = models.CharField(max_length=100, blank=True, null=True)
+    # Other wallet of an internal (wallet-to-wallet) transfer
+    counterparty = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True, related_name="+"
+    )
 
     # Flutterwave fields
     flw_tx_ref = models.CharField(max_length=100, blank=True, null=True, unique=True)
@@ -133,60 +144,482 @@ class Transaction(models.Model):
     flw_status = models.CharField(max_length=50, blank=True, null=True)
     flw_payment_type = models.CharField(max_length=50, blank=True, null=True)
     flw_currency = models.CharField(max_length=10, default="NGN")
+    # Charged in flw_currency when it is not the wallet's; amount is then
+    # the wallet credit, converted at fx_rate when the top-up posts
+    flw_amount = models.DecimalField(max_digits=14, decimal_places=2, blank=True, null=True)
+    processed = models.BooleanField(default=False)
+    # Currency of amount and balance_after: the wallet's
+    currency = models.CharField(max_length=3, default="NGN")
+    fx_rate = models.DecimalField(max_digits=18, decimal_places=8, blank=True, null=True)
+    # Fraud model output for debits (fraud.py); null for unscored rows
+    risk_score = models.FloatField(blank=True, null=True)
+
+    # Ledger entry that moved the money (empty for pending top-ups and reward points)
+    journal_entry = models.OneToOneField(
+        "JournalEntry", on_delete=models.PROTECT, blank=True, null=True, related_name="source_transaction"
+    )
+
+    class Meta:
+        indexes = [
+            # Pending-payment sweeps: flw_status="pending" AND date < cutoff
+            models.Index(fields=["flw_status", "date"], name="tx_flw_status_date_idx"),
+            # Spending-limit reconciliation: one user's rows of a type in the last day
+            models.Index(fields=["user", "type", "date"], name="tx_user_type_date_idx"),
+            # History and statements: one user's rows by date (also serves the user FK)
+            models.Index(fields=["user", "date"], name="tx_user_date_idx"),
+        ]
 
     def save(self, *args, **kwargs):
-        from decimal import Decimal
+        from . import fraud, fx, ledger, rewards
         with db_transaction.atomic():
-            amount = Decimal(self.amount)
-
-            # -----------------------------
-            # Determine balance change
-            # -----------------------------
-            if self.type in ("Deposit", "Add Money"):
-                new_balance = self.user.balance + amount
-            elif self.type in ("Withdrawal", "Transfer", "Data Purchase", "Airtime Purchase", "Bill Payment", "Betting"):
-                if amount > self.user.balance:
-                    raise ValueError("Insufficient balance for this transaction")
-                new_balance = self.user.balance - amount
-            elif self.type == "Reward Redemption":
-                new_balance = self.user.balance + amount
-            elif self.type == "Reward Points":
-                new_balance = self.user.balance
-            else:
-                new_balance = self.user.balance
-
-            self.balance_after = new_balance
-            self.user.balance = new_balance
-            self.user.save(update_fields=["balance"])
+            if not self.reference:
+                self.reference = next_reference("TXN")
+            if self._state.adding:
+                self.currency = ledger.wallet_for(self.user).currency
+                # As the wallet posting will be: whole units for UGX and the like
+                self.amount = fx.quantize(self.amount, self.currency)
 
             # -----------------------------
             # Auto-generate description
             # -----------------------------
             if not self.description:
+                amount = fx.money(self.amount, self.currency)
                 if self.type in ("Data Purchase", "Airtime Purchase"):
                     network = self.provider or "Unknown"
-                    self.description = f"{self.type} of ₦{self.amount} to {self.phone} via {network}"
+                    self.description = f"{self.type} of {amount} to {self.phone} via {network}"
                     if self.planLabel:
                         self.description += f" ({self.planLabel})"
                 elif self.type == "Bill Payment":
                     category = self.category or "General"
-                    self.description = f"{self.type} of ₦{self.amount} to {self.recipient} ({category})"
+                    self.description = f"{self.type} of {amount} to {self.recipient} ({category})"
                 elif self.type == "Betting":
                     recipient = self.recipient or "Unknown"
-                    self.description = f"Betting - {recipient} (₦{self.amount})"
+                    self.description = f"Betting - {recipient} ({amount})"
                     if self.planLabel:
                         self.description += f" [{self.planLabel}]"
                 elif self.type == "Transfer":
                     recipient = self.recipient or "Unknown"
-                    self.description = f"Transfer of ₦{self.amount} to {recipient}"
+                    self.description = f"Transfer of {amount} to {recipient}"
+                elif self.type == "Transfer Received":
+                    sender = self.counterparty.phone if self.counterparty_id else "Unknown"
+                    self.description = f"Transfer of {amount} from {sender}"
                 elif self.type == "Reward Redemption":
-                    self.description = f"Redeemed {abs(self.points)} points for ₦{self.amount}"
+                    self.description = f"Redeemed {abs(self.points)} points for {amount}"
                 elif self.type == "Reward Points":
                     self.description = f"Earned {self.points} reward points"
+                elif self.flw_amount is not None:
+                    self.description = f"{self.type} of {fx.money(self.flw_amount, self.flw_currency)}"
                 else:
-                    self.description = f"{self.type} of ₦{self.amount}"
+                    self.description = f"{self.type} of {amount}"
+
+            # -----------------------------
+            # Post to the ledger (new rows only; pending top-ups post on settlement)
+            # -----------------------------
+            if self._state.adding and self.journal_entry_id is None:
+                self.journal_entry, self.balance_after = ledger.post_transaction(self)
+            if self._state.adding and self.type in rewards.POINTS_TYPES and self.points:
+                rewards.apply_points(self)
+            # After the ledger so the wallet row is always locked before the risk profile
+            if self._state.adding and self.type in ledger.DEBIT_TYPES:
+                fraud.assess(self)
 
             super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.type} of ₦{self.amount} for {self.user.phone} on {self.date.strftime('%Y-%m-%d %H:%M:%S')}"
+        from . import fx
+        return f"{self.type} of {fx.money(self.amount, self.currency)} for {self.user.phone} on {self.date.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+# ----------------------------------
+# TRANSACTION ARCHIVE
+# ----------------------------------
+class ArchivedTransaction(models.Model):
+    """
+    Transaction rows moved out of the hot table by archive_transactions
+    (see archive.py), with their original ids. The table is created by
+    migration 0030: range-partitioned by month on Postgres, a plain table
+    elsewhere. Read-only apart from the archiver.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False, related_name="archived_transactions"
+    )
+    type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    description = models.CharField(max_length=255, blank=True, null=True)
+    date = models.DateTimeField()
+    points = models.IntegerField(default=0)
+    reference = models.CharField(max_length=32, blank=True, null=True)
+
+    phone = models.CharField(max_length=20, blank=True, null=True)
+    provider = models.CharField(max_length=50, blank=True, null=True)
+    expiry = models.DateField(blank=True, null=True)
+    account_number = models.CharField(max_length=50, blank=True, null=True)
+    category = models.CharField(max_length=50, blank=True, null=True)
+    recipient = models.CharField(max_length=100, blank=True, null=True)
+    planLabel = models.CharField(max_length=100, blank=True, null=True)
+    counterparty = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, db_constraint=False, blank=True, null=True,
+        related_name="+",
+    )
+
+    flw_tx_ref = models.CharField(max_length=100, blank=True, null=True)
+    flw_id = models.CharField(max_length=100, blank=True, null=True)
+    flw_status = models.CharField(max_length=50, blank=True, null=True)
+    flw_payment_type = models.CharField(max_length=50, blank=True, null=True)
+    flw_currency = models.CharField(max_length=10, default="NGN")
+    flw_amount = models.DecimalField(max_digits=14, decimal_places=2, blank=True, null=True)
+    processed = models.BooleanField(default=False)
+    currency = models.CharField(max_length=3, default="NGN")
+    fx_rate = models.DecimalField(max_digits=18, decimal_places=8, blank=True, null=True)
+    risk_score = models.FloatField(blank=True, null=True)
+
+    journal_entry = models.ForeignKey(
+        "JournalEntry", on_delete=models.DO_NOTHING, db_constraint=False, blank=True, null=True, related_name="+"
+    )
+
+    class Meta:
+        managed = False
+        db_table = "backdave_app_transaction_archive"
+        indexes = [
+            models.Index(fields=["user", "date"], name="tx_archive_user_date_idx"),
+        ]
+
+    def __str__(self):
+        from . import fx
+        return f"{self.type} of {fx.money(self.amount, self.currency)} on {self.date.strftime('%Y-%m-%d %H:%M:%S')} (archived)"
+
+
+# ----------------------------------
+# REWARD POINTS
+# ----------------------------------
+class PointsEntry(models.Model):
+    """
+    Points earned by one transaction (rewards.award). A narrow row instead
+    of a full "Reward Points" Transaction; history() still lists it in
+    that shape (as_transaction).
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False, related_name="points_entries"
+    )
+    # Plain id, not a foreign key: the source may move to the transaction archive
+    source_tx_id = models.BigIntegerField(blank=True, null=True, unique=True)
+    delta = models.IntegerField()
+    ts = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = "points entries"
+        indexes = [
+            models.Index(fields=["user", "ts"], name="points_user_ts_idx"),
+        ]
+
+    def as_transaction(self, source_reference=None):
+        """
+        The legacy "Reward Points" row this entry replaces (unsaved; for
+        display). Its id is negative so it never collides with a real
+        transaction's.
+        """
+        return Transaction(
+            id=-self.id, user_id=self.user_id, type="Reward Points", amount=0, points=self.delta, date=self.ts,
+            reference=f"RWD-{source_reference}" if source_reference else None,
+            description=f"Earned {self.delta} reward points",
+        )
+
+    def __str__(self):
+        return f"{self.delta:+} points for user {self.user_id}"
+
+
+# ----------------------------------
+# DATA RETENTION
+# ----------------------------------
+class TransactionSummary(models.Model):
+    """
+    One user's transactions of one type in one month, folded together by
+    the retention job (see retention.py) once the rows themselves expire.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="transaction_summaries")
+    # First day of the month (UTC)
+    month = models.DateField()
+    type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
+    count = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    points = models.IntegerField(default=0)
+    # Latest folded row with a balance: keeps balance_at() right after its rows are gone
+    last_date = models.DateTimeField(blank=True, null=True)
+    last_id = models.BigIntegerField(blank=True, null=True)
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+
+    class Meta:
+        verbose_name_plural = "transaction summaries"
+        constraints = [
+            models.UniqueConstraint(fields=["user", "month", "type"], name="unique_tx_summary_per_month"),
+        ]
+
+    def __str__(self):
+        return f"{self.count} x {self.type} in {self.month:%Y-%m} for user {self.user_id}"
+
+
+class RetentionRun(models.Model):
+    """Progress of one apply_retention pass; an unfinished run is resumed after its last user."""
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    last_user_id = models.BigIntegerField(default=0)
+    # Running totals: users, rows folded, summaries, pictures and fields cleared
+    stats = models.JSONField(default=dict)
+
+    def __str__(self):
+        state = f"finished {self.finished_at:%Y-%m-%d %H:%M}" if self.finished_at else f"at user {self.last_user_id}"
+        return f"Retention run #{self.pk} ({state})"
+
+
+# ----------------------------------
+# LEDGER
+# ----------------------------------
+class LedgerAccount(models.Model):
+    """
+    A double-entry account (see ledger.py). Metered accounts (every wallet)
+    keep their running balance on the row; unmetered system accounts such
+    as clearing and vendor accounts are never locked or updated, and their
+    balance is the sum of their postings.
+    """
+    WALLET = "wallet"
+    SYSTEM = "system"
+    KIND_CHOICES = (
+        (WALLET, "Wallet"),
+        (SYSTEM, "System"),
+    )
+
+    code = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True, related_name="wallet_account"
+    )
+    metered = models.BooleanField(default=True)
+    # Postings and balance are in this currency; an entry balances per currency
+    currency = models.CharField(max_length=3, default="NGN")
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # >0 spreads credits over this many BalanceShard rows (hot, high fan-in
+    # accounts); balance is then the compacted base and the live total is
+    # balance + SUM(shards)
+    shard_count = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.code
+
+
+class BalanceShard(models.Model):
+    account = models.ForeignKey(LedgerAccount, on_delete=models.CASCADE, related_name="shards")
+    index = models.PositiveSmallIntegerField()
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["account", "index"], name="unique_balance_shard"),
+        ]
+
+    def __str__(self):
+        return f"{self.account} #{self.index}"
+
+
+class JournalEntry(models.Model):
+    """One balanced, append-only set of postings."""
+    kind = models.CharField(max_length=30)
+    reference = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+    description = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = "journal entries"
+
+    def __str__(self):
+        return f"{self.kind} {self.reference or self.pk}"
+
+
+class Posting(models.Model):
+    entry = models.ForeignKey(JournalEntry, on_delete=models.PROTECT, related_name="postings")
+    account = models.ForeignKey(LedgerAccount, on_delete=models.PROTECT, related_name="postings")
+    # Positive increases the account balance, negative decreases it
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    # Running-balance checkpoint; only recorded for metered accounts
+    balance_after = models.DecimalField(max_digits=14, decimal_places=2, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["account", "id"], name="posting_account_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.account} {self.amount:+}"
+
+
+# ----------------------------------
+# EXCHANGE RATES
+# ----------------------------------
+class FxRate(models.Model):
+    """
+    One currency's rate in a published version (see fx.py): BASE_CURRENCY
+    units per one unit. Each refresh adds a whole new version.
+    """
+    version = models.PositiveIntegerField()
+    currency = models.CharField(max_length=3)
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["version", "currency"], name="unique_fx_rate_per_version"),
+        ]
+
+    def __str__(self):
+        return f"{self.currency} {self.rate} (v{self.version})"
+
+
+# ----------------------------------
+# REFERENCE NODES
+# ----------------------------------
+class ReferenceNode(models.Model):
+    """A Snowflake node id leased by one live process (see references.py)."""
+    node_id = models.PositiveSmallIntegerField(primary_key=True)
+    # host:pid:token of the process holding it
+    holder = models.CharField(max_length=100)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"node {self.node_id} ({self.holder})"
+
+
+# ----------------------------------
+# VERIFY LEASES
+# ----------------------------------
+class VerifyLease(models.Model):
+    """Cross-worker single-flight lease on a tx_ref, off Postgres (see flutterwave.py)."""
+    tx_ref = models.CharField(max_length=100, primary_key=True)
+    token = models.CharField(max_length=32)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.tx_ref} until {self.expires_at}"
+
+
+# ----------------------------------
+# IDEMPOTENCY KEYS
+# ----------------------------------
+class IdempotencyKey(models.Model):
+    """Response snapshot for a client-supplied Idempotency-Key (see idempotency.py)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    # Null while the original request is still running
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    response_body = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+    # When the running request took the key; a retry may take over a claim older than IDEMPOTENCY_CLAIM_TIMEOUT
+    claimed_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_idempotency_key_per_user"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} for user {self.user_id}"
+
+
+# ----------------------------------
+# BACKGROUND JOBS
+# ----------------------------------
+class Job(models.Model):
+    """A queued side effect, run by ``manage.py runworker`` (see jobs.py)."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (FAILED, "Failed"),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Worker poll: status="queued" AND run_at <= now ORDER BY run_at
+            models.Index(fields=["status", "run_at"], name="job_status_run_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+# ----------------------------------
+# REWARDS RULES (compiled by rewards.py)
+# ----------------------------------
+class RewardTier(models.Model):
+    name = models.CharField(max_length=30, unique=True)
+    min_points = models.PositiveIntegerField(unique=True)
+    # Applied to every award earned while in this tier
+    multiplier = models.DecimalField(max_digits=5, decimal_places=2, default=1)
+
+    class Meta:
+        ordering = ["min_points"]
+
+    def __str__(self):
+        return f"{self.name} ({self.min_points}+ points)"
+
+
+class RewardRule(models.Model):
+    """
+    Points for one transaction type (blank: any type without its own rules)
+    within an amount band [min_amount, max_amount): ``points`` plus
+    ``points_per_naira`` x amount, capped at ``max_points``.
+    """
+    transaction_type = models.CharField(max_length=20, blank=True, choices=Transaction.TRANSACTION_TYPES)
+    min_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    max_amount = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    points = models.PositiveIntegerField(default=0)
+    points_per_naira = models.DecimalField(max_digits=8, decimal_places=4, default=0)
+    max_points = models.PositiveIntegerField(blank=True, null=True)
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ["transaction_type", "min_amount"]
+
+    def __str__(self):
+        band = f"₦{self.min_amount}+" if self.max_amount is None else f"₦{self.min_amount}-{self.max_amount}"
+        return f"{self.transaction_type or 'Any type'} {band}"
+
+
+class RewardsVersion(models.Model):
+    """Single row bumped whenever a rule or tier changes; workers reload on a new version."""
+    version = models.PositiveBigIntegerField(default=1)
+
+
+# ----------------------------------
+# FRAUD SCORING
+# ----------------------------------
+class RiskProfile(models.Model):
+    """Running per-user state behind the fraud features (see fraud.py)."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="risk_profile"
+    )
+    count = models.PositiveIntegerField(default=0)
+    amount_sum = models.FloatField(default=0)
+    amount_sumsq = models.FloatField(default=0)
+    # Epoch seconds of the latest debits inside the burst window
+    recent_times = models.JSONField(default=list)
+    # CRC32s of recent recipients, least recently used first
+    recipients = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"Risk profile for user {self.user_id}"
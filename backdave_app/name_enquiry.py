@@ -0,0 +1,146 @@
+"""
+Bank account name enquiry.
+
+Lookups go to the backend named by NAME_ENQUIRY_BACKEND, behind the
+Django cache: resolved names are kept for NAME_ENQUIRY_CACHE_SECONDS and
+"no such account" answers for NAME_ENQUIRY_NEGATIVE_CACHE_SECONDS.
+Concurrent misses for the same account within a process share one
+upstream call. Provider errors are never cached.
+"""
+import functools
+import hashlib
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from . import banks
+
+_NOT_FOUND = "-"  # cached marker for accounts the provider does not know
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class NameEnquiryError(Exception):
+    """The provider could not answer (timeout, outage); safe to retry."""
+
+
+class UnknownBank(ValueError):
+    pass
+
+
+class AccountNotFound(ValueError):
+    pass
+
+
+# --------------------------
+# BACKENDS
+# --------------------------
+# A backend has lookup(bank, account_number) -> account name, or None when
+# the account does not exist; it raises NameEnquiryError on failure.
+class StubBackend:
+    """Local provider: stable made-up names; numbers ending in 000 do not exist."""
+    FIRST_NAMES = ("John", "Jane", "Chinedu", "Ngozi", "Tunde", "Aisha", "Emeka", "Funmi")
+    LAST_NAMES = ("Doe", "Smith", "Okafor", "Ude", "Bakare", "Bello", "Eze", "Adeyemi")
+
+    def __init__(self):
+        self.latency = settings.NAME_ENQUIRY_STUB_LATENCY
+        self.calls = 0
+
+    def lookup(self, bank, account_number):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if account_number.endswith("000"):
+            return None
+        digest = int(hashlib.sha256(f"{bank.code}:{account_number}".encode()).hexdigest(), 16)
+        first = self.FIRST_NAMES[digest % len(self.FIRST_NAMES)]
+        last = self.LAST_NAMES[(digest >> 8) % len(self.LAST_NAMES)]
+        return f"{first} {last}".upper()
+
+
+class FlutterwaveBackend:
+    """Flutterwave's account resolve API."""
+
+    def __init__(self):
+        import requests
+        self.session = requests.Session()
+
+    def lookup(self, bank, account_number):
+        from . import flutterwave
+        import requests
+
+        try:
+            res = flutterwave.resolve_account(account_number, bank.code, session=self.session)
+        except (requests.RequestException, ValueError) as e:
+            raise NameEnquiryError(str(e))
+        if res.get("status") == "success":
+            return res["data"]["account_name"]
+        if res.get("_http_status") == 400:
+            return None
+        raise NameEnquiryError(res.get("message") or "Name enquiry failed")
+
+
+@functools.cache
+def backend():
+    return import_string(settings.NAME_ENQUIRY_BACKEND)()
+
+
+# --------------------------
+# CACHED LOOKUP
+# --------------------------
+def _cache_key(bank, account_number):
+    return f"name_enquiry:{bank.code}:{account_number}"
+
+
+def resolve(bank_name, account_number):
+    """
+    Account holder's name for (bank name or code, account number). Raises
+    UnknownBank, AccountNotFound or NameEnquiryError.
+    """
+    account_number = (account_number or "").strip()
+    if not account_number.isdigit() or len(account_number) != 10:
+        raise AccountNotFound("Account number must be 10 digits")
+    bank = banks.find(bank_name)
+    if bank is None:
+        raise UnknownBank(f"Unknown bank: {bank_name}")
+
+    key = _cache_key(bank, account_number)
+    name = cache.get(key)
+    if name is None:
+        name = _coalesced(key, bank, account_number)
+    if name == _NOT_FOUND:
+        raise AccountNotFound("Account not found")
+    return name
+
+
+def _coalesced(key, bank, account_number):
+    """Make one upstream call per key at a time; other callers wait for its result."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+
+    if not leader:
+        return future.result()
+
+    try:
+        name = backend().lookup(bank, account_number)
+        if name is None:
+            name = _NOT_FOUND
+            cache.set(key, name, settings.NAME_ENQUIRY_NEGATIVE_CACHE_SECONDS)
+        else:
+            cache.set(key, name, settings.NAME_ENQUIRY_CACHE_SECONDS)
+        future.set_result(name)
+        return name
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
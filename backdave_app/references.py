@@ -0,0 +1,256 @@
+"""
+Time-ordered, collision-free transaction references.
+
+Snowflake layout in 63 bits: milliseconds since EPOCH_MS (41 bits), node id
+(10 bits) and a per-millisecond sequence (12 bits), rendered as 13 fixed-width
+Crockford base32 characters so string order matches creation order and
+B-tree inserts on the unique reference columns stay append-only.
+
+Each process leases its node id from a ReferenceNode row for
+REFERENCE_NODE_LEASE_SECONDS and renews it halfway through, so no two
+live processes, forked workers included, share one. A lease is taken
+outside the caller's transaction (on its own connection on Postgres) so
+a rollback cannot hand it back while it is still in use. Finding the
+row held by another process before the lease ran out raises
+NodeLeaseError rather than risk duplicate references.
+"""
+import atexit
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford base32
+WIDTH = 13
+
+
+def encode(value):
+    chars = []
+    for _ in range(WIDTH):
+        value, rem = divmod(value, 32)
+        chars.append(ALPHABET[rem])
+    return "".join(reversed(chars))
+
+
+def decode(ref):
+    value = 0
+    for char in ref[-WIDTH:]:
+        value = value * 32 + ALPHABET.index(char)
+    return value
+
+
+class ReferenceGenerator:
+    def __init__(self, node_id):
+        if not 0 <= node_id <= MAX_NODE:
+            raise ValueError(f"node_id must be between 0 and {MAX_NODE}")
+        self.node_id = node_id
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            # Never step backwards if the wall clock does
+            now = max(int(time.time() * 1000) - EPOCH_MS, self._last_ms)
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # 4096 ids this millisecond: borrow the next one
+                    now += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return (now << (NODE_BITS + SEQUENCE_BITS)) | (self.node_id << SEQUENCE_BITS) | self._sequence
+
+    def next_reference(self, prefix):
+        return f"{prefix}-{encode(self.next_id())}"
+
+
+# --------------------------
+# NODE LEASES
+# --------------------------
+class NodeLeaseError(RuntimeError):
+    """No node id is free, or another process holds this process's."""
+
+
+class Lease:
+    def __init__(self, node_id, holder):
+        self.node_id = node_id
+        self.holder = holder
+        self.pid = os.getpid()
+        # False while the row is only in a SQLite transaction that may still roll back
+        self.confirmed = False
+        self.expires = self.renew_at = 0.0
+
+    def renewed(self):
+        now = time.monotonic()
+        self.confirmed = True
+        self.expires = now + settings.REFERENCE_NODE_LEASE_SECONDS
+        self.renew_at = now + settings.REFERENCE_NODE_LEASE_SECONDS / 2
+
+
+def _leasing_connection():
+    """(connection, owned): where a lease is written so that it commits on its own."""
+    if not connection.in_atomic_block or connection.vendor == "sqlite":
+        # SQLite has one writer: a second connection would wait on our own lock
+        return connection, False
+    return connections.create_connection(DEFAULT_DB_ALIAS), True
+
+
+def _once_committed(conn, owned, apply):
+    """Run ``apply`` once what was just written on ``conn`` has committed."""
+    if owned or not conn.in_atomic_block:
+        apply()
+    else:
+        transaction.on_commit(apply)
+
+
+def _execute(conn, sql, params=()):
+    from .models import ReferenceNode
+
+    table = conn.ops.quote_name(ReferenceNode._meta.db_table)
+    with conn.cursor() as cursor:
+        cursor.execute(sql.format(table=table), params)
+        return cursor.rowcount, cursor.fetchall() if sql.startswith("SELECT") else None
+
+
+def lease():
+    """Lease a free node id, or one whose lease ran out. Raises NodeLeaseError."""
+    holder = f"{socket.gethostname()[:80]}:{os.getpid()}:{secrets.token_hex(4)}"
+    conn, owned = _leasing_connection()
+    try:
+        now = timezone.now()
+        stamp = conn.ops.adapt_datetimefield_value
+        expires = stamp(now + timedelta(seconds=settings.REFERENCE_NODE_LEASE_SECONDS))
+        _, lapsed = _execute(
+            conn, "SELECT node_id FROM {table} WHERE expires_at < %s ORDER BY expires_at", [stamp(now)],
+        )
+        for (node_id,) in lapsed:
+            # Only if nobody renewed or took it since the SELECT
+            updated, _ = _execute(
+                conn, "UPDATE {table} SET holder = %s, expires_at = %s WHERE node_id = %s AND expires_at < %s",
+                [holder, expires, node_id, stamp(now)],
+            )
+            if updated:
+                current = Lease(node_id, holder)
+                _once_committed(conn, owned, current.renewed)
+                return current
+        _, rows = _execute(conn, "SELECT node_id FROM {table}")
+        taken = {node_id for node_id, in rows}
+        for node_id in range(MAX_NODE + 1):
+            if node_id in taken:
+                continue
+            try:
+                _execute(
+                    conn, "INSERT INTO {table} (node_id, holder, expires_at) VALUES (%s, %s, %s)",
+                    [node_id, holder, expires],
+                )
+            except IntegrityError:  # another process took it first
+                continue
+            current = Lease(node_id, holder)
+            _once_committed(conn, owned, current.renewed)
+            return current
+    finally:
+        if owned:
+            conn.close()
+    raise NodeLeaseError(f"All {MAX_NODE + 1} reference node ids are leased")
+
+
+def renew(current):
+    """Extend ``current``; False if its row is gone or held by another process."""
+    conn, owned = _leasing_connection()
+    try:
+        expires = timezone.now() + timedelta(seconds=settings.REFERENCE_NODE_LEASE_SECONDS)
+        updated, _ = _execute(
+            conn, "UPDATE {table} SET expires_at = %s WHERE node_id = %s AND holder = %s",
+            [conn.ops.adapt_datetimefield_value(expires), current.node_id, current.holder],
+        )
+        if updated:
+            _once_committed(conn, owned, current.renewed)
+    finally:
+        if owned:
+            conn.close()
+    return bool(updated)
+
+
+def _still_held(current):
+    """For an unconfirmed lease: is the row still ours (its transaction may have rolled back)?"""
+    _, rows = _execute(connection, "SELECT holder FROM {table} WHERE node_id = %s", [current.node_id])
+    return bool(rows) and rows[0][0] == current.holder
+
+
+def release():
+    """Give this process's node id back (at exit)."""
+    current = _lease
+    if current is None or current.pid != os.getpid():
+        return  # forked children inherit the handler, not the lease
+    try:
+        _execute(
+            connection, "DELETE FROM {table} WHERE node_id = %s AND holder = %s", [current.node_id, current.holder],
+        )
+    except Exception:  # the row expires on its own
+        logger.warning("Could not release reference node %s", current.node_id, exc_info=True)
+
+
+atexit.register(release)
+
+
+# --------------------------
+# GENERATION
+# --------------------------
+_generator = None
+_lease = None
+_generator_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # Forked workers must not share the parent's node id and sequence
+    global _generator, _lease, _generator_lock
+    _generator = None
+    _lease = None
+    _generator_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _current_generator():
+    global _generator, _lease
+    with _generator_lock:
+        current = _lease
+        if current is None:
+            pass
+        elif not current.confirmed:
+            if not _still_held(current):
+                current = None  # leased in a transaction that rolled back
+        elif time.monotonic() >= current.renew_at and not renew(current):
+            if time.monotonic() < current.expires:
+                _lease = _generator = None
+                logger.critical("Reference node %s is held by another process", current.node_id)
+                raise NodeLeaseError(f"Reference node {current.node_id} is held by another process")
+            current = None  # lapsed while idle and taken since: nothing was generated after it ran out
+        if current is None:
+            current = lease()
+        if _generator is None or _generator.node_id != current.node_id:
+            _generator = ReferenceGenerator(current.node_id)
+        _lease = current
+        return _generator
+
+
+def next_reference(prefix):
+    return _current_generator().next_reference(prefix)
@@ -0,0 +1,241 @@
+"""
+Data retention for dormant and closed accounts (manage.py apply_retention).
+
+A customer account is dormant once it has gone RETENTION_DORMANT_DAYS
+without a login, transaction or points award; a closed one
+(is_active=False) after RETENTION_CLOSED_DAYS. For a dormant account:
+
+- transactions, hot and archived, and points entries older than their
+  type's RETENTION_POLICIES age are folded into monthly
+  TransactionSummary rows and deleted, a small batch per transaction.
+  Their journal entries lose the description, which repeats phone
+  numbers and names; amounts and balances stay in the ledger.
+- the profile picture and its renditions are deleted;
+- a closed account also loses its email, date of birth, state and city.
+
+Pending top-ups are never folded. A batch's delete and its summary
+update commit together, so an interrupted run loses nothing.
+"""
+import datetime
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from . import archive, images
+from .models import ArchivedTransaction, JournalEntry, PointsEntry, Transaction, TransactionSummary, User
+
+POINTS_TYPE = "Reward Points"
+# Folded in this order; each table is drained for a user before the next
+FOLDED = (Transaction, ArchivedTransaction, PointsEntry)
+PROFILE_FIELDS = ("email", "dob", "state", "city")
+
+
+# --------------------------
+# SELECTION
+# --------------------------
+def dormant_users(now=None):
+    now = now or timezone.now()
+    closed = now - timedelta(days=settings.RETENTION_CLOSED_DAYS)
+    dormant = now - timedelta(days=settings.RETENTION_DORMANT_DAYS)
+    return User.objects.filter(is_staff=False).filter(
+        Q(is_active=False) & _quiet_since(closed, now) | Q(is_active=True) & _quiet_since(dormant, now)
+    )
+
+
+def _quiet_since(cutoff, now):
+    recent = [
+        Transaction.objects.filter(user=OuterRef("pk"), date__gte=cutoff),
+        PointsEntry.objects.filter(user=OuterRef("pk"), ts__gte=cutoff),
+    ]
+    # Archived rows are all older than the hot window
+    if cutoff < archive.horizon(now):
+        recent.append(ArchivedTransaction.objects.filter(user=OuterRef("pk"), date__gte=cutoff))
+    quiet = Q(date_joined__lt=cutoff) & (Q(last_login__isnull=True) | Q(last_login__lt=cutoff))
+    for rows in recent:
+        quiet &= ~Exists(rows)
+    return quiet
+
+
+def policy_days(type):
+    """Days rows of ``type`` are kept, or None to keep them for good."""
+    return settings.RETENTION_POLICIES.get(type, settings.RETENTION_POLICIES.get("*"))
+
+
+def expired(model, users, now):
+    """``model`` rows of ``users`` (ids or a subquery) past their type's retention age."""
+    rows = model.objects.filter(user_id__in=users)
+    if model is PointsEntry:
+        days = policy_days(POINTS_TYPE)
+        return rows.none() if days is None else rows.filter(ts__lt=now - timedelta(days=days))
+
+    typed = [t for t in settings.RETENTION_POLICIES if t != "*"]
+    old = Q(pk__in=[])
+    for type in typed:
+        old |= Q(type=type, date__lt=now - timedelta(days=settings.RETENTION_POLICIES[type]))
+    if "*" in settings.RETENTION_POLICIES:
+        old |= Q(date__lt=now - timedelta(days=settings.RETENTION_POLICIES["*"])) & ~Q(type__in=typed)
+    return rows.filter(old).exclude(flw_status="pending")
+
+
+# --------------------------
+# FOLDING
+# --------------------------
+def fold_batch(model, user_id, now, batch_size=None):
+    """Fold one batch of the user's expired ``model`` rows into summaries and delete them. Returns rows folded."""
+    batch_size = batch_size or settings.RETENTION_BATCH
+    with transaction.atomic():
+        queryset = expired(model, [user_id], now).order_by("id").select_for_update()
+        if model is PointsEntry:
+            rows = [
+                {"id": pk, "type": POINTS_TYPE, "date": ts, "amount": 0, "points": delta,
+                 "balance_after": None, "journal_entry_id": None}
+                for pk, ts, delta in queryset.values_list("id", "ts", "delta")[:batch_size]
+            ]
+        else:
+            rows = list(queryset.values(
+                "id", "type", "date", "amount", "points", "balance_after", "journal_entry_id",
+            )[:batch_size])
+        if not rows:
+            return 0
+
+        _add_to_summaries(user_id, rows)
+        entries = [row["journal_entry_id"] for row in rows if row["journal_entry_id"]]
+        if entries:
+            JournalEntry.objects.filter(id__in=entries).update(description=None)
+        model.objects.filter(id__in=[row["id"] for row in rows]).delete()
+    return len(rows)
+
+
+def _add_to_summaries(user_id, rows):
+    groups = {}
+    for row in rows:
+        key = (_month(row["date"]), row["type"])
+        group = groups.setdefault(key, TransactionSummary(user_id=user_id, month=key[0], type=key[1]))
+        group.count += 1
+        group.amount += row["amount"]
+        group.points += row["points"]
+        if row["balance_after"] is not None:
+            _keep_latest(group, row["date"], row["id"], row["balance_after"])
+
+    existing = TransactionSummary.objects.select_for_update().filter(
+        user_id=user_id, month__in={month for month, _ in groups}, type__in={type for _, type in groups},
+    )
+    merged = []
+    for summary in existing:
+        group = groups.pop((summary.month, summary.type), None)
+        if group is None:
+            continue
+        summary.count += group.count
+        summary.amount += group.amount
+        summary.points += group.points
+        if group.last_date is not None:
+            _keep_latest(summary, group.last_date, group.last_id, group.balance_after)
+        merged.append(summary)
+    TransactionSummary.objects.bulk_update(
+        merged, ["count", "amount", "points", "last_date", "last_id", "balance_after"],
+    )
+    TransactionSummary.objects.bulk_create(groups.values())
+
+
+def _keep_latest(summary, date, pk, balance_after):
+    if summary.last_date is None or (date, pk) > (summary.last_date, summary.last_id):
+        summary.last_date, summary.last_id, summary.balance_after = date, pk, balance_after
+
+
+def _month(moment):
+    return moment.astimezone(datetime.timezone.utc).date().replace(day=1)
+
+
+# --------------------------
+# PROFILE
+# --------------------------
+def clear_profile(user):
+    """Delete the user's picture, and a closed account's optional details. Returns counts for the run stats."""
+    files = images.owned_files(user)
+    freed = sum(_file_size(name) for name in files)
+    updates = {}
+    if user.profilePic or user.profile_pic_thumbs:
+        updates.update(profilePic=None, profile_pic_thumbs={})
+    cleared = not user.is_active and any(getattr(user, field) for field in PROFILE_FIELDS)
+    if cleared:
+        updates.update(dict.fromkeys(PROFILE_FIELDS))
+    if updates:
+        User.objects.filter(pk=user.pk).update(**updates)
+    # After the row stops pointing at them: a failure here only orphans files
+    for name in files:
+        default_storage.delete(name)
+    return Counter(pictures=len(files), picture_bytes=freed, profiles=int(cleared))
+
+
+def _file_size(name):
+    try:
+        return default_storage.size(name)
+    except OSError:
+        return 0
+
+
+# --------------------------
+# DRY RUN
+# --------------------------
+def estimate(now=None):
+    """What a run now would fold and free: per table rows and approximate bytes, plus pictures."""
+    now = now or timezone.now()
+    users = dormant_users(now)
+    ids = users.values("id")
+    result = {"users": users.count(), "tables": {}, "summaries": 0, "pictures": 0, "picture_bytes": 0}
+
+    for model in FOLDED:
+        rows = expired(model, ids, now)
+        count = rows.count()
+        per_row = row_bytes(model)
+        result["tables"][model._meta.db_table] = {
+            "rows": count, "bytes": 0 if not count else None if per_row is None else round(count * per_row),
+        }
+        date = "ts" if model is PointsEntry else "date"
+        groups = rows.annotate(month=TruncMonth(date, tzinfo=datetime.timezone.utc)).values("user_id", "month")
+        if model is not PointsEntry:
+            groups = groups.values("user_id", "month", "type")
+        # Upper bound: the same month and type may already have, or get, a summary from another table
+        result["summaries"] += groups.distinct().count()
+
+    for user in users.exclude(profilePic__isnull=True).exclude(profilePic="").only("profilePic", "profile_pic_thumbs"):
+        files = images.owned_files(user)
+        result["pictures"] += len(files)
+        result["picture_bytes"] += sum(_file_size(name) for name in files)
+    return result
+
+
+def row_bytes(model):
+    """Average on-disk bytes per row of ``model``, indexes included, or None if unknown."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            # The table itself, or the archive's monthly partitions
+            cursor.execute(
+                "SELECT sum(pg_total_relation_size(oid))::float8, sum(greatest(reltuples, 0)) FROM pg_class "
+                "WHERE oid = %s::regclass OR oid IN (SELECT relid FROM pg_partition_tree(%s::regclass))",
+                [table, table],
+            )
+        elif connection.vendor == "sqlite":
+            try:
+                cursor.execute(
+                    "SELECT sum(pgsize), (SELECT count(*) FROM " + connection.ops.quote_name(table) + ") "
+                    "FROM dbstat WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name = %s)",
+                    [table],
+                )
+            except Exception:  # SQLite built without the dbstat table
+                return None
+        else:
+            return None
+        size, rows = cursor.fetchone()
+    if not rows:
+        if connection.vendor != "postgresql" or not size:
+            return None
+        rows = model.objects.count()  # never analyzed
+    return size / rows if rows else None
@@ -0,0 +1,262 @@
+"""
+Rewards rules engine.
+
+RewardRule and RewardTier rows are compiled once per process into a
+RuleSet: a dispatch table of amount bands keyed by transaction type, and
+the tiers sorted by threshold. Evaluating an award is then a dict lookup
+plus a scan of that type's few bands, with no queries. Any change to the
+rules bumps RewardsVersion; each process re-reads the stamp at most every
+REWARDS_RELOAD_SECONDS and recompiles when it moved.
+
+Tier thresholds live only here (tier_for).
+
+Points are materialized on User.reward_points. Awards are narrow
+PointsEntry rows written by award(); redemptions are Reward Redemption
+transactions that go through apply_points and convert points to naira in
+the same transaction as the ledger credit. Points are earned and valued
+in naira (BASE_CURRENCY); other wallets convert at the current rate.
+"""
+import math
+import re
+import threading
+import time
+from decimal import ROUND_DOWN, Decimal
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import fx, ledger
+from .models import LedgerAccount, PointsEntry, RewardRule, RewardsVersion, RewardTier, Transaction, User
+
+ANY_TYPE = ""
+# Types that never earn points
+NON_EARNING_TYPES = ("Reward Points", "Reward Redemption", "Transfer Received")
+# Types whose (signed) points move User.reward_points
+POINTS_TYPES = ("Reward Points", "Reward Redemption")
+PROMOTION_CODE = re.compile(r"^[A-Za-z0-9]{1,12}$")
+
+
+class RedemptionError(ValueError):
+    pass
+
+
+class InsufficientPoints(RedemptionError):
+    pass
+
+
+class Tier(NamedTuple):
+    name: str
+    min_points: int
+    multiplier: Decimal
+
+
+class Band(NamedTuple):
+    min_amount: Decimal
+    max_amount: Decimal  # None: open-ended
+    points: int
+    points_per_naira: Decimal
+    max_points: int  # None: uncapped
+
+
+class RuleSet(NamedTuple):
+    version: int
+    by_type: dict  # transaction type -> bands, highest min_amount first
+    tiers: tuple  # highest threshold first
+
+
+BASE_TIER = Tier("Bronze", 0, Decimal("1"))
+
+_ruleset = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+# --------------------------
+# COMPILATION
+# --------------------------
+def current_version():
+    return RewardsVersion.objects.values_list("version", flat=True).filter(pk=1).first() or 0
+
+
+def compile_rules(version):
+    by_type = {}
+    for rule in RewardRule.objects.filter(active=True).order_by("-min_amount"):
+        by_type.setdefault(rule.transaction_type, []).append(Band(
+            rule.min_amount, rule.max_amount, rule.points, rule.points_per_naira, rule.max_points,
+        ))
+    tiers = tuple(
+        Tier(t.name, t.min_points, t.multiplier) for t in RewardTier.objects.order_by("-min_points")
+    )
+    return RuleSet(version, {k: tuple(v) for k, v in by_type.items()}, tiers or (BASE_TIER,))
+
+
+def ruleset():
+    """The compiled rules, recompiled when the version stamp has moved."""
+    global _ruleset, _checked_at
+    now = time.monotonic()
+    if _ruleset is not None and now - _checked_at < settings.REWARDS_RELOAD_SECONDS:
+        return _ruleset
+    with _lock:
+        if _ruleset is None or now - _checked_at >= settings.REWARDS_RELOAD_SECONDS:
+            version = current_version()
+            if _ruleset is None or _ruleset.version != version:
+                _ruleset = compile_rules(version)
+            _checked_at = now
+    return _ruleset
+
+
+@receiver(post_save, sender=RewardRule)
+@receiver(post_delete, sender=RewardRule)
+@receiver(post_save, sender=RewardTier)
+@receiver(post_delete, sender=RewardTier)
+def bump_version(**kwargs):
+    global _checked_at
+    if not RewardsVersion.objects.filter(pk=1).update(version=F("version") + 1):
+        RewardsVersion.objects.get_or_create(pk=1)
+    _checked_at = 0.0  # this process reloads on its next evaluation
+
+
+# --------------------------
+# EVALUATION
+# --------------------------
+def tier_for(points, rules=None):
+    for tier in (rules or ruleset()).tiers:
+        if points >= tier.min_points:
+            return tier
+    return BASE_TIER
+
+
+def points_for(tx_type, amount, tier=BASE_TIER, rules=None):
+    """Points earned by a transaction of ``tx_type`` and ``amount`` in ``tier``."""
+    if tx_type in NON_EARNING_TYPES:
+        return 0
+    rules = rules or ruleset()
+    amount = Decimal(amount)
+    bands = rules.by_type.get(tx_type) or rules.by_type.get(ANY_TYPE, ())
+    for band in bands:
+        if amount >= band.min_amount and (band.max_amount is None or amount < band.max_amount):
+            points = band.points + math.floor(amount * band.points_per_naira)
+            if band.max_points is not None:
+                points = min(points, band.max_points)
+            return math.floor(points * tier.multiplier)
+    return 0
+
+
+# --------------------------
+# POINTS BALANCE
+# --------------------------
+def award(source, points):
+    """Credit ``points`` earned by transaction ``source``, at most once per source."""
+    with transaction.atomic():
+        _, created = PointsEntry.objects.get_or_create(
+            source_tx_id=source.pk, defaults={"user_id": source.user_id, "delta": points},
+        )
+        if created:
+            User.objects.filter(pk=source.user_id).update(reward_points=F("reward_points") + points)
+
+
+def apply_points(tx):
+    """Add ``tx.points`` (negative for redemptions) to the user's points, never below zero."""
+    users = User.objects.filter(pk=tx.user_id)
+    if tx.points < 0:
+        users = users.filter(reward_points__gte=-tx.points)
+    if not users.update(reward_points=F("reward_points") + tx.points):
+        raise InsufficientPoints("Not enough reward points")
+
+
+def points_value(points, naira_per_point=None):
+    rate = settings.REWARDS_NAIRA_PER_POINT if naira_per_point is None else Decimal(naira_per_point)
+    return (Decimal(points) * rate).quantize(ledger.CENT, rounding=ROUND_DOWN)
+
+
+def in_wallet_currency(user, value):
+    """(``value`` in BASE_CURRENCY converted to the user's wallet currency, the rate or None)."""
+    currency = ledger.wallet_for(user).currency
+    if currency == settings.BASE_CURRENCY:
+        return value, None
+    return fx.convert(value, settings.BASE_CURRENCY, currency)
+
+
+# --------------------------
+# REDEMPTION
+# --------------------------
+def redeem(user, points):
+    """
+    Convert ``points`` into wallet money. The ledger credit (wallet row
+    lock) and the conditional points decrement commit together or not at
+    all. Raises RedemptionError / InsufficientPoints.
+    """
+    try:
+        points = int(points)
+    except (TypeError, ValueError):
+        raise RedemptionError("Invalid points")
+    if points < settings.REWARDS_MIN_REDEMPTION_POINTS:
+        raise RedemptionError(f"Redeem at least {settings.REWARDS_MIN_REDEMPTION_POINTS} points")
+
+    amount, rate = in_wallet_currency(user, points_value(points))
+    with transaction.atomic():
+        tx = Transaction.objects.create(
+            user=user, type="Reward Redemption", points=-points, amount=amount, fx_rate=rate,
+        )
+    user.reward_points = User.objects.values_list("reward_points", flat=True).get(pk=user.pk)
+    return tx
+
+
+def redeem_batch(promotion, naira_per_point, min_points, after_id=0, chunk=None):
+    """
+    Promotion: cash out all points of users after ``after_id`` holding at
+    least ``min_points``, one chunk of users per call. Re-running a chunk
+    skips users already paid for this promotion. Returns
+    (users redeemed, last user id scanned or None when done).
+    """
+    if not PROMOTION_CODE.match(promotion):
+        raise RedemptionError("Promotion code must be 1-12 letters or digits")
+    chunk = chunk or settings.REWARDS_BATCH_CHUNK
+    prefix = f"PRM-{promotion}-"
+
+    with transaction.atomic():
+        ids = list(User.objects.filter(pk__gt=after_id).order_by("pk").values_list("pk", flat=True)[:chunk])
+        if not ids:
+            return 0, None
+        paid = list(Transaction.objects.filter(
+            reference__in=[f"{prefix}{pk}" for pk in ids],
+        ).values_list("user_id", flat=True))
+
+        # Same lock order as every posting: wallet accounts, then user rows
+        list(LedgerAccount.objects.select_for_update().filter(user_id__in=ids).order_by("pk"))
+        users = list(
+            User.objects.select_for_update().filter(pk__in=ids, reward_points__gte=max(min_points, 1))
+            .exclude(pk__in=paid).order_by("pk")
+        )
+        users = [u for u in users if points_value(u.reward_points, naira_per_point) > 0]
+        ledger.attach_wallets(users)
+
+        txs, specs = [], []
+        for user in users:
+            wallet = ledger.wallet_for(user)
+            expense = ledger.system_account(ledger.COUNTERPARTY["Reward Redemption"], wallet.currency)
+            amount, rate = in_wallet_currency(user, points_value(user.reward_points, naira_per_point))
+            tx = Transaction(
+                user=user, type="Reward Redemption", points=-user.reward_points, amount=amount,
+                currency=wallet.currency, fx_rate=rate, reference=f"{prefix}{user.pk}",
+                description=(
+                    f"Redeemed {user.reward_points} points for {fx.money(amount, wallet.currency)} "
+                    f"({promotion} promotion)"
+                ),
+            )
+            txs.append(tx)
+            specs.append({"kind": tx.type, "lines": [(wallet, amount), (expense, -amount)],
+                          "reference": tx.reference, "description": tx.description})
+
+        for tx, entry in zip(txs, ledger.post_many(specs)):
+            tx.journal_entry = entry
+            tx.balance_after = entry.balances.get(ledger.wallet_for(tx.user).pk)
+        Transaction.objects.bulk_create(txs)
+        for user in users:
+            user.reward_points = 0
+        User.objects.bulk_update(users, ["reward_points"])
+    return len(users), ids[-1]
@@ -2,8 +2,9 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model                          
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.db.models import Sum
+from django.conf import settings
 from django.db import transaction as db_transaction
+from . import archive, flutterwave, images, ledger, rewards
 from .models import Transaction
 
 
@@ -19,7 +20,6 @@ class VerifyFlutterwavePaymentSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         import requests
-        from django.conf import settings
 
         user = self.context["request"].user
         tx_ref = validated_data["tx_ref"]
@@ -34,7 +34,7 @@ class VerifyFlutterwavePaymentSerializer(serializers.Serializer):
         if response.get("status") != "success" or data.get("status") != "successful":
             raise serializers.ValidationError("Transaction verification failed")
 
-        if data.get("currency") != "NGN":
+        if data.get("currency") not in settings.TOP_UP_CURRENCIES:
             raise serializers.ValidationError("Invalid currency")
 
         amount = data.get("amount")
@@ -44,17 +44,18 @@ class VerifyFlutterwavePaymentSerializer(serializers.Serializer):
         if Transaction.objects.filter(flw_tx_ref=tx_ref).exists():
             return {"message": "Transaction already recorded"}
 
-        tx = Transaction.objects.create(
-            user=user,
-            type="Add Money",
-            amount=amount,
-            flw_tx_ref=tx_ref,
-            flw_id=data.get("id"),
-            flw_status="pending",
-            flw_payment_type=data.get("payment_type"),
-            flw_currency="NGN",
-            description=f"Wallet top-up via Flutterwave (tx_ref: {tx_ref})"
-        )
+        try:
+            tx = flutterwave.create_top_up(
+                user,
+                amount,
+                data.get("currency"),
+                flw_tx_ref=tx_ref,
+                flw_id=data.get("id"),
+                flw_payment_type=data.get("payment_type"),
+                description=f"Wallet top-up via Flutterwave (tx_ref: {tx_ref})"
+            )
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
 
         return {"transaction_id": tx.id, "amount": amount}
 
@@ -69,10 +70,12 @@ class RegisterSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(required=True)
     state = serializers.CharField(required=False, allow_blank=True)
     city = serializers.CharField(required=False, allow_blank=True)
+    # The wallet's currency, fixed once it is opened
+    currency = serializers.ChoiceField(choices=settings.WALLET_CURRENCIES, required=False)
 
     class Meta:
         model = User
-        fields = ["id", "phone", "email", "firstName", "lastName", "dob", "state", "city", "pin"]
+        fields = ["id", "phone", "email", "firstName", "lastName", "dob", "state", "city", "pin", "currency"]
 
     def validate_phone(self, value):
         if User.objects.filter(phone=value.strip()).exists():
@@ -94,6 +97,7 @@ class RegisterSerializer(serializers.ModelSerializer):
             state=validated_data.get("state", ""),
             city=validated_data.get("city", ""),
         )
+        ledger.wallet_for(user, validated_data.get("currency"))
         return user
 
 
@@ -132,15 +136,27 @@ class TransactionSerializer(serializers.ModelSerializer):
     pin = serializers.CharField(write_only=True, required=True)
     balance_after = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
     description = serializers.CharField(read_only=True)
+    reference = serializers.CharField(read_only=True)
+    currency = serializers.CharField(read_only=True)
+    flw_amount = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    flw_currency = serializers.CharField(read_only=True)
+    fx_rate = serializers.DecimalField(max_digits=18, decimal_places=8, read_only=True)
 
     class Meta:
         model = Transaction
         fields = [
-            "id", "type", "amount", "recipient", "account_number", "description",
+            "id", "reference", "type", "amount", "currency", "recipient", "account_number", "description",
             "pin", "phone", "provider", "expiry", "category", "planLabel",
-            "points", "balance_after"
+            "points", "balance_after", "flw_amount", "flw_currency", "fx_rate"
         ]
 
+    def validate_type(self, value):
+        if value == "Transfer Received":
+            raise serializers.ValidationError("Incoming transfers are created by the sender's transfer")
+        if value in ("Reward Points", "Reward Redemption"):
+            raise serializers.ValidationError("Reward points are awarded automatically; redeem via rewards/redeem/")
+        return value
+
     def validate_pin(self, value):
         user = self.context['request'].user
         if not user.check_pin(value):
@@ -156,37 +172,44 @@ class TransactionSerializer(serializers.ModelSerializer):
 # --------------------------
 class AccountSerializer(serializers.ModelSerializer):
     profilePic = serializers.SerializerMethodField()
+    profilePicThumbs = serializers.SerializerMethodField()
     total_points = serializers.SerializerMethodField()
     tier = serializers.SerializerMethodField()
     recent_transactions = serializers.SerializerMethodField()
+    currency = serializers.SerializerMethodField()
+    # Includes a sharded wallet's credits not yet folded into the mirror
+    balance = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ["id", "full_name", "email", "phone", "balance",
-                  "profilePic", "date_joined", "total_points", "tier", "recent_transactions"]
+        fields = ["id", "full_name", "email", "phone", "balance", "currency",
+                  "profilePic", "profilePicThumbs", "date_joined", "total_points", "tier", "recent_transactions"]
+
+    def _absolute(self, url):
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
 
     def get_profilePic(self, obj):
+        # Once processed this is the 512px WebP rendition, not the raw upload
         if obj.profilePic:
-            request = self.context.get("request")
-            return request.build_absolute_uri(obj.profilePic.url)
+            return self._absolute(obj.profilePic.url)
         return None
 
+    def get_profilePicThumbs(self, obj):
+        return {size: self._absolute(url) for size, url in images.thumbnail_urls(obj).items()}
+
     def get_total_points(self, obj):
-        txns = obj.transactions.all()
-        earned = txns.filter(type="Reward Points").aggregate(Sum('points'))['points__sum'] or 0
-        redeemed = txns.filter(type="Reward Redemption").aggregate(Sum('points'))['points__sum'] or 0
-        return earned - redeemed
+        return obj.total_points()
 
     def get_tier(self, obj):
-        total_points = self.get_total_points(obj)
-        if total_points >= 5000:
-            return "Platinum"
-        elif total_points >= 2500:
-            return "Gold"
-        elif total_points >= 1000:
-            return "Silver"
-        return "Bronze"
+        return rewards.tier_for(obj.total_points()).name
+
+    def get_balance(self, obj):
+        return str(ledger.wallet_balance(obj.pk))
+
+    def get_currency(self, obj):
+        return ledger.wallet_for(obj).currency
 
     def get_recent_transactions(self, obj):
-        txns = obj.transactions.order_by('-date')[:5]
+        txns = archive.history(obj.pk, limit=5)
         return TransactionSerializer(txns, many=True, context=self.context).data
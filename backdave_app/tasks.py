@@ -0,0 +1,36 @@
+"""
+Job handlers (see jobs.py). Each runs in its own transaction and must be
+safe to run more than once.
+"""
+from . import fx, images, jobs, rewards
+from .jobs import task
+from .models import Transaction
+
+
+@task("award_reward_points")
+def award_reward_points(transaction_id):
+    """Credit reward points for a completed transaction, once."""
+    source = Transaction.objects.select_related("user").filter(pk=transaction_id).first()
+    if source is None:
+        return
+    rules = rewards.ruleset()
+    tier = rewards.tier_for(source.user.total_points(), rules)
+    points = rewards.points_for(source.type, fx.to_base(source.amount, source.currency), tier, rules)
+    if points <= 0:
+        return
+    rewards.award(source, points)
+
+
+@task("redeem_promotion_chunk")
+def redeem_promotion_chunk(promotion, naira_per_point, min_points, after_id=0):
+    """Pay one chunk of a promotion, then queue the next chunk."""
+    _, last_id = rewards.redeem_batch(promotion, naira_per_point, min_points, after_id=after_id)
+    if last_id is not None:
+        jobs.enqueue("redeem_promotion_chunk", promotion=promotion, naira_per_point=naira_per_point,
+                     min_points=min_points, after_id=last_id)
+
+
+@task("render_profile_thumbnails")
+def render_profile_thumbnails(user_id, source_name):
+    """Attach the small WebP renditions of a freshly uploaded profile picture."""
+    images.render_user_thumbnails(user_id, source_name)
@@ -0,0 +1,68 @@
+import itertools
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from backdave_app import fx, ledger, references
+from backdave_app.models import LedgerAccount, Posting, User
+
+PIN = "1234"
+STUB_RATES = {"USD": "1500.00", "GBP": "2000.00"}
+
+_phones = itertools.count(8000000000)
+
+
+bank_settings = override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    FX_STUB_RATES=STUB_RATES,
+)
+
+
+class BankTestMixin:
+    """Fresh caches and published stub exchange rates for every test."""
+
+    def setUp(self):
+        cache.clear()
+        ledger._system_accounts.clear()  # rows from earlier tests were rolled back
+        fx._table = None
+        fx.refresh()
+        # Node leases live in the test database; never carry one past it
+        self.addCleanup(setattr, references, "_lease", None)
+        self.addCleanup(setattr, references, "_generator", None)
+
+    def make_user(self, balance=0, currency=None, **fields):
+        user = User.objects.create_user(phone=f"0{next(_phones)}", password=PIN, full_name="Test User", **fields)
+        ledger.wallet_for(user, currency)
+        if balance:
+            user.deposit(Decimal(balance))
+        return user
+
+    def assertBalance(self, user, expected):
+        """What the user sees, and what the ledger says, are both ``expected``."""
+        self.assertEqual(ledger.wallet_balance(user.pk), Decimal(expected))
+        self.assertEqual(ledger.balance(ledger.wallet_for(user), cached=False), Decimal(expected))
+
+    def assertLedgerConsistent(self):
+        """Every entry balances in each currency; wallets agree with their postings and user mirrors."""
+        totals = {}
+        for entry_id, currency, amount in Posting.objects.values_list("entry_id", "account__currency", "amount"):
+            totals[entry_id, currency] = totals.get((entry_id, currency), 0) + amount
+        self.assertEqual({key: total for key, total in totals.items() if total}, {})
+        for wallet in LedgerAccount.objects.filter(kind=LedgerAccount.WALLET).select_related("user"):
+            posted = wallet.postings.aggregate(total=Sum("amount"))["total"] or 0
+            self.assertEqual(ledger.balance(wallet, cached=False), posted, wallet)
+            self.assertEqual(ledger.wallet_balance(wallet.user_id), posted, wallet)
+            # The mirror holds the base; a sharded wallet's unfolded credits are on its shards
+            self.assertEqual(wallet.user.balance, wallet.balance, wallet)
+
+
+@bank_settings
+class BankTestCase(BankTestMixin, TestCase):
+    pass
+
+
+@bank_settings
+class BankTransactionTestCase(BankTestMixin, TransactionTestCase):
+    """For code that sets up its own transactions: rows are committed, then flushed after each test."""
@@ -0,0 +1,48 @@
+from decimal import Decimal
+
+from django.urls import reverse
+
+from backdave_app import ledger
+from backdave_app.models import JournalEntry, Transaction
+
+from .base import BankTestCase
+
+
+class AdminCorrectionTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user(is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+        self.user = self.make_user(balance=5000)
+        self.tx = Transaction.objects.create(user=self.user, type="Bill Payment", amount=Decimal("1200"))
+
+    def test_posted_amounts_and_balances_are_read_only(self):
+        url = reverse("admin:backdave_app_transaction_change", args=[self.tx.pk])
+        form = self.client.get(url).context["adminform"].form
+        data = {name: form[name].value() for name in form.fields if form[name].value() is not None}
+        res = self.client.post(url, {**data, "type": "Deposit", "amount": "999999", "description": "fixed"})
+
+        self.assertEqual(res.status_code, 302)
+        self.tx.refresh_from_db()
+        self.assertEqual((self.tx.type, self.tx.amount, self.tx.description), ("Bill Payment", Decimal("1200.00"), "fixed"))
+        self.assertBalance(self.user, "3800.00")
+
+        user_url = reverse("admin:backdave_app_user_change", args=[self.user.pk])
+        form = self.client.get(user_url).context["adminform"].form
+        self.assertNotIn("balance", form.fields)
+        self.assertNotIn("reward_points", form.fields)
+
+    def test_reverse_action_posts_a_compensating_entry(self):
+        changelist = reverse("admin:backdave_app_transaction_changelist")
+        action = {"action": "reverse", "_selected_action": [self.tx.pk]}
+
+        self.client.post(changelist, action)
+        self.assertBalance(self.user, "5000.00")
+        reversal = JournalEntry.objects.get(kind=ledger.REVERSAL)
+        self.assertEqual(reversal.reference, f"REV-{self.tx.journal_entry_id}")
+        self.assertEqual(sum(p.amount for p in reversal.postings.all()), 0)
+
+        # A second reversal is refused rather than paying the bill back twice
+        self.client.post(changelist, action)
+        self.assertBalance(self.user, "5000.00")
+        self.assertEqual(JournalEntry.objects.filter(kind=ledger.REVERSAL).count(), 1)
@@ -0,0 +1,105 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.forms.models import model_to_dict
+from django.utils import timezone
+
+from backdave_app import archive, rewards
+from backdave_app.models import ArchivedTransaction, PointsEntry, Transaction
+
+from .base import BankTestCase
+
+
+class HistoryTests(BankTestCase):
+    def test_points_rows_never_share_an_id_with_a_transaction(self):
+        user = self.make_user(balance=5000)
+        payment = Transaction.objects.create(user=user, type="Bill Payment", amount=Decimal("1000"))
+        rewards.award(payment, 25)
+        entry = PointsEntry.objects.get(source_tx_id=payment.pk)
+
+        rows = archive.history(user.pk)
+
+        ids = [row.id for row in rows]
+        self.assertEqual(len(ids), len(set(ids)))
+        points = next(row for row in rows if row.type == "Reward Points")
+        self.assertEqual((points.id, points.points), (-entry.pk, 25))
+        self.assertEqual(points.reference, f"RWD-{payment.reference}")
+        self.assertEqual(points.balance_after, Decimal("4000.00"))
+        self.assertFalse(Transaction.objects.filter(pk=points.id).exists())
+
+
+class ArchiveTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        # Partitions made by an earlier test were rolled back with it
+        archive._partitions.clear()
+        self.addCleanup(archive._partitions.clear)
+        self.now = timezone.now()
+        self.user = self.make_user(balance=5000)
+        for days, type, amount in (
+            (400, "Bill Payment", "100"),
+            (380, "Airtime Purchase", "20"),
+            (300, "Deposit", "250"),
+            (250, "Bill Payment", "40"),
+            (100, "Airtime Purchase", "15"),  # inside the hot window
+        ):
+            Transaction.objects.create(user=self.user, type=type, amount=Decimal(amount), date=self.days_ago(days))
+        self.pending = Transaction.objects.create(
+            user=self.user, type="Add Money", amount=Decimal("300"), flw_status="pending",
+            flw_tx_ref="FLW-OLD", date=self.days_ago(350),
+        )
+
+    def days_ago(self, days):
+        return self.now - timedelta(days=days)
+
+    def archive_all(self, cutoff=None, batch_size=None):
+        cutoff, after_id, batches = cutoff or archive.horizon(), 0, []
+        while True:
+            moved, after_id = archive.archive_batch(cutoff, after_id, batch_size)
+            batches.append(moved)
+            if after_id is None:
+                return batches
+
+    def test_rows_move_with_their_ids_and_values(self):
+        old = [model_to_dict(t) for t in archive.archivable(archive.horizon()).order_by("id")]
+
+        self.archive_all()
+
+        fields = [f.name for f in ArchivedTransaction._meta.concrete_fields]
+        moved = [model_to_dict(t, fields) for t in ArchivedTransaction.objects.order_by("id")]
+        self.assertEqual(moved, [{k: row[k] for k in fields} for row in old])
+        self.assertEqual(len(moved), 4)
+        self.assertFalse(Transaction.objects.filter(id__in=[row["id"] for row in old]).exists())
+
+    def test_pending_and_hot_rows_stay(self):
+        self.archive_all()
+
+        hot = Transaction.objects.filter(user=self.user).order_by("date")
+        self.assertEqual([t.pk for t in hot], [self.pending.pk, hot.get(type="Airtime Purchase").pk])
+
+    def test_cutoff_inside_the_hot_window_is_refused(self):
+        with self.assertRaises(ValueError):
+            archive.archive_batch(archive.horizon() + timedelta(seconds=1))
+        self.assertFalse(ArchivedTransaction.objects.exists())
+
+    def test_batches_page_through_to_the_end(self):
+        self.assertEqual(self.archive_all(batch_size=3), [3, 1, 0])
+        self.assertEqual(archive.archive_batch(archive.horizon()), (0, None))
+
+    def test_reads_are_the_same_before_and_after(self):
+        moments = [self.days_ago(d) for d in (500, 390, 320, 200, 50, 0)]
+        start, end = self.days_ago(390), self.days_ago(50)
+
+        def reads():
+            return (
+                [(t.id, t.type, t.amount, t.balance_after) for t in archive.history(self.user.pk)],
+                [(t.id, t.balance_after) for t in archive.history(self.user.pk, limit=2)],
+                [archive.balance_at(self.user.pk, m) for m in moments],
+                archive.statement(self.user.pk, start, end)["opening_balance"],
+                archive.statement(self.user.pk, start, end)["closing_balance"],
+                [t.id for t in archive.statement(self.user.pk, start, end)["transactions"]],
+            )
+
+        before = reads()
+        self.archive_all()
+        self.assertEqual(reads(), before)
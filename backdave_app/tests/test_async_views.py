@@ -0,0 +1,118 @@
+import json
+from decimal import Decimal
+from unittest import mock
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.test import AsyncRequestFactory, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backdave_app import async_views, flutterwave
+from backdave_app.models import Transaction
+
+from .base import BankTestCase
+
+
+def paid(tx_ref, amount, flw_id=1):
+    return {"data": {"id": flw_id, "status": "successful", "amount": str(amount), "currency": "NGN", "tx_ref": tx_ref}}
+
+
+def upstream_down(*args):
+    raise httpx.ConnectTimeout("timed out")
+
+
+# The async views are only routed under ASGI (DJANGO_ASYNC_VIEWS), so they are called directly
+@override_settings(FLUTTERWAVE_SECRET_HASH="test-hash")
+class AsyncFlutterwaveTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.factory = AsyncRequestFactory()
+        self.auth = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def post(self, path, data, **headers):
+        return self.factory.post(path, json.dumps(data), content_type="application/json", headers=headers)
+
+    async def top_up(self, amount="5000", tx_ref="FLW-ASYNC"):
+        return await sync_to_async(flutterwave.create_top_up)(self.user, amount, None, flw_tx_ref=tx_ref)
+
+    async def webhook(self, tx, flw_id=1):
+        data = {"data": {"id": flw_id, "tx_ref": tx.flw_tx_ref, "status": "successful"}}
+        request = self.post("/api/flutterwave/webhook/", data, **{"verif-hash": "test-hash"})
+        return await async_views.flutterwave_webhook(request)
+
+    async def verify(self, tx):
+        request = self.post("/api/flutterwave/verify/", {"tx_ref": tx.flw_tx_ref}, **self.auth)
+        return await async_views.flutterwave_verify(request)
+
+    async def test_init_creates_a_pending_top_up(self):
+        request = self.post("/api/flutterwave/init/", {"amount": "2500"}, **self.auth)
+        res = await async_views.init_flutterwave_payment(request)
+
+        self.assertEqual(res.status_code, 200)
+        body = json.loads(res.content)
+        tx = await Transaction.objects.aget(flw_tx_ref=body["tx_ref"])
+        self.assertEqual((tx.user_id, tx.flw_status, tx.processed), (self.user.pk, "pending", False))
+        self.assertEqual((body["amount"], body["currency"], body["credit"]), ("2500.00", "NGN", "2500.00"))
+
+    async def test_init_needs_a_token(self):
+        res = await async_views.init_flutterwave_payment(self.post("/api/flutterwave/init/", {"amount": "2500"}))
+        self.assertEqual(res.status_code, 401)
+
+    async def test_verify_settles_then_reports_already_processed(self):
+        tx = await self.top_up()
+        upstream = mock.AsyncMock(return_value=paid(tx.flw_tx_ref, "5000.00"))
+
+        with mock.patch.object(flutterwave, "averify_by_reference", upstream):
+            first = await self.verify(tx)
+            second = await self.verify(tx)
+
+        self.assertEqual(first.status_code, 200, first.content)
+        self.assertEqual(json.loads(second.content), {"status": "already_processed"})
+        upstream.assert_awaited_once()
+        await sync_to_async(self.assertBalance)(self.user, "5000.00")
+
+    async def test_verify_provider_error(self):
+        tx = await self.top_up()
+
+        with mock.patch.object(flutterwave, "averify_by_reference", side_effect=upstream_down), \
+                self.assertLogs("backdave_app.async_views", "ERROR"):
+            res = await self.verify(tx)
+
+        self.assertEqual((res.status_code, json.loads(res.content)), (500, {"error": "Verification timeout"}))
+        await tx.arefresh_from_db()
+        self.assertEqual((tx.processed, tx.flw_status), (False, "pending"))
+
+    async def test_webhook_settles_then_reports_already_processed(self):
+        tx = await self.top_up()
+        upstream = mock.AsyncMock(return_value=paid(tx.flw_tx_ref, "5000.00", flw_id=7))
+
+        with mock.patch.object(flutterwave, "averify_transaction", upstream):
+            first = await self.webhook(tx, flw_id=7)
+            second = await self.webhook(tx, flw_id=7)
+
+        self.assertEqual(first.status_code, 200, first.content)
+        self.assertEqual(json.loads(second.content), {"status": "already_processed"})
+        upstream.assert_awaited_once_with(7)
+        await tx.arefresh_from_db()
+        self.assertEqual((tx.processed, tx.balance_after), (True, Decimal("5000.00")))
+
+    async def test_webhook_provider_error(self):
+        tx = await self.top_up()
+
+        with mock.patch.object(flutterwave, "averify_transaction", side_effect=upstream_down), \
+                self.assertLogs("backdave_app.async_views", "ERROR"):
+            res = await self.webhook(tx)
+
+        self.assertEqual((res.status_code, json.loads(res.content)), (500, {"error": "Verification timeout"}))
+        await tx.arefresh_from_db()
+        self.assertFalse(tx.processed)
+
+    async def test_webhook_with_a_bad_signature_is_refused(self):
+        tx = await self.top_up()
+        request = self.post("/api/flutterwave/webhook/", {"data": {"tx_ref": tx.flw_tx_ref}}, **{"verif-hash": "x"})
+
+        with self.assertLogs("backdave_app.async_views", "WARNING"):
+            res = await async_views.flutterwave_webhook(request)
+
+        self.assertEqual(res.status_code, 401)
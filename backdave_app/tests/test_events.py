@@ -0,0 +1,84 @@
+import asyncio
+import contextlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.test import override_settings
+
+from backdave_app import events
+from backdave_app.models import Transaction
+
+from .base import BankTransactionTestCase
+
+
+def parse(event):
+    """An SSE event as (id, name, data)."""
+    fields = dict(line.split(": ", 1) for line in event.strip().splitlines())
+    return int(fields["id"]) if "id" in fields else None, fields["event"], json.loads(fields["data"])
+
+
+# Committed for real: streams read on the shared executor's own connections
+@override_settings(EVENTS_FANOUT="backdave_app.events.LocalFanout", EVENTS_HEARTBEAT_SECONDS=0.2)
+class EventStreamTests(BankTransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        events.fanout.cache_clear()
+        self.addCleanup(events.fanout.cache_clear)
+        self.user = self.make_user(balance=1000)
+
+    def deposit(self, amount, user=None):
+        return Transaction.objects.create(user=user or self.user, type="Deposit", amount=Decimal(amount))
+
+    async def next_event(self, stream):
+        return await asyncio.wait_for(stream.__anext__(), 5)
+
+    @contextlib.asynccontextmanager
+    async def streaming(self, *args):
+        """
+        events.stream(*args), with its pooled reads on one executor thread
+        whose connection is closed afterwards; an open one would keep the
+        test database from being dropped.
+        """
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=1)
+        loop.set_default_executor(executor)
+        stream = events.stream(*args)
+        try:
+            yield stream
+        finally:
+            await stream.aclose()
+            await loop.run_in_executor(executor, connections.close_all)
+            executor.shutdown()
+
+    async def test_posting_reaches_the_owners_stream(self):
+        other = await sync_to_async(self.make_user)()
+        async with self.streaming(self.user.pk) as stream:
+            self.assertTrue((await self.next_event(stream)).startswith("retry:"))
+            _, name, data = parse(await self.next_event(stream))
+            self.assertEqual((name, data), ("balance", {"balance": "1000.00"}))
+
+            # Someone else's posting does not wake this stream
+            await sync_to_async(self.deposit)("75", other)
+            self.assertEqual(await self.next_event(stream), ": keepalive\n\n")
+
+            tx = await sync_to_async(self.deposit)("50")
+            event_id, name, data = parse(await self.next_event(stream))
+            self.assertEqual((event_id, name), (tx.journal_entry_id, "transaction"))
+            self.assertEqual((data["reference"], data["amount"], data["balance_after"]),
+                             (tx.reference, "50.00", "1050.00"))
+            self.assertEqual(parse(await self.next_event(stream))[1:], ("balance", {"balance": "1050.00"}))
+        self.assertEqual(events.hub._subscriptions, {})
+
+    async def test_resume_replays_only_later_entries(self):
+        seen, *missed = [await sync_to_async(self.deposit)(amount) for amount in ("10", "20", "30")]
+        async with self.streaming(self.user.pk, seen.journal_entry_id) as stream:
+            await self.next_event(stream)  # retry
+            replayed = [parse(await self.next_event(stream)) for _ in missed]
+            self.assertEqual(
+                [(event_id, name, data["amount"]) for event_id, name, data in replayed],
+                [(tx.journal_entry_id, "transaction", str(tx.amount)) for tx in missed],
+            )
+            self.assertEqual(parse(await self.next_event(stream))[1:], ("balance", {"balance": "1060.00"}))
@@ -0,0 +1,200 @@
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from backdave_app import flutterwave, fx, ledger
+from backdave_app.models import Transaction, VerifyLease
+
+from .base import BankTestCase
+
+
+def paid(tx, amount, currency, flw_id=1):
+    return {"id": flw_id, "status": "successful", "amount": str(amount), "currency": currency, "tx_ref": tx.flw_tx_ref}
+
+
+class TopUpSettlementTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def top_up(self, amount, currency=None, tx_ref="FLW-TEST"):
+        return flutterwave.create_top_up(self.user, amount, currency, flw_tx_ref=tx_ref)
+
+    def test_same_currency_top_up(self):
+        tx = self.top_up("5000")
+        self.assertIsNone(tx.flw_amount)
+
+        body, code = flutterwave.settle_webhook_payment(tx.flw_tx_ref, 7, paid(tx, "5000.00", "NGN"))
+
+        self.assertEqual(code, 200, body)
+        tx.refresh_from_db()
+        self.assertTrue(tx.processed)
+        self.assertEqual(tx.balance_after, Decimal("5000.00"))
+        self.assertBalance(self.user, "5000.00")
+
+    def test_foreign_top_up_is_converted_when_it_posts(self):
+        tx = self.top_up("10", "USD")
+        self.assertEqual((tx.flw_amount, tx.flw_currency), (Decimal("10.00"), "USD"))
+        self.assertEqual(tx.amount, Decimal("15000.00"))  # indicative, at init
+
+        with override_settings(FX_STUB_RATES={"USD": "1600.00"}):
+            fx.refresh()
+        body, code = flutterwave.settle_webhook_payment(tx.flw_tx_ref, 7, paid(tx, "10.00", "USD"))
+
+        self.assertEqual(code, 200, body)
+        tx.refresh_from_db()
+        self.assertEqual(tx.amount, Decimal("16000.00"))
+        self.assertEqual(tx.fx_rate, Decimal("1600"))
+        self.assertBalance(self.user, "16000.00")
+        # Each currency balances through its fx_position account
+        self.assertEqual(ledger.balance(ledger.fx_position("NGN")), Decimal("-16000.00"))
+        self.assertEqual(ledger.balance(ledger.fx_position("USD")), Decimal("10.00"))
+        self.assertEqual(ledger.balance(ledger.system_account("flutterwave_clearing", "USD")), Decimal("-10.00"))
+
+    def test_webhook_rejects_currency_mismatch(self):
+        tx = self.top_up("10", "USD")
+
+        body, code = flutterwave.settle_webhook_payment(tx.flw_tx_ref, 7, paid(tx, "10.00", "NGN"))
+
+        self.assertEqual((code, body), (400, {"error": "Currency mismatch"}))
+        tx.refresh_from_db()
+        self.assertFalse(tx.processed)
+        self.assertBalance(self.user, "0.00")
+
+    def test_verify_rejects_currency_mismatch(self):
+        # Started in USD, paid the same number of naira
+        tx = self.top_up("10", "USD")
+
+        with mock.patch.object(flutterwave, "verify_by_reference", return_value={"data": paid(tx, "10", "NGN")}):
+            res = self.client.post("/api/flutterwave/verify/", {"tx_ref": tx.flw_tx_ref}, format="json")
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json(), {"error": "Currency mismatch"})
+        tx.refresh_from_db()
+        self.assertEqual((tx.processed, tx.flw_status), (False, "pending"))
+        self.assertBalance(self.user, "0.00")
+
+    def test_verify_rejects_amount_mismatch(self):
+        tx = self.top_up("10", "USD")
+
+        body, code = flutterwave.settle_reference_payment(self.user, tx, paid(tx, "9.99", "USD"))
+
+        self.assertEqual((code, body), (400, {"error": "Amount mismatch"}))
+        self.assertBalance(self.user, "0.00")
+
+    def test_stale_rates_leave_top_up_pending(self):
+        tx = self.top_up("10", "USD")
+
+        with override_settings(FX_RATES_MAX_AGE_SECONDS=-1):
+            body, code = flutterwave.settle_reference_payment(self.user, tx, paid(tx, "10.00", "USD"))
+
+        self.assertEqual(code, 503, body)
+        tx.refresh_from_db()
+        self.assertEqual((tx.processed, tx.flw_status, tx.journal_entry_id), (False, "pending", None))
+        self.assertBalance(self.user, "0.00")
+
+    def test_batch_settles_around_a_row_without_a_rate(self):
+        naira = self.top_up("5000", tx_ref="FLW-NGN")
+        dollars = self.top_up("10", "USD", tx_ref="FLW-USD")
+        with override_settings(FX_STUB_RATES={"GBP": "2000.00"}):
+            fx.refresh()  # the newest rates have no USD
+
+        settled, pending = flutterwave.settle_verified_batch({
+            naira.id: paid(naira, "5000.00", "NGN", flw_id=1), dollars.id: paid(dollars, "10.00", "USD", flw_id=2),
+        })
+
+        self.assertEqual((settled, pending), (1, 1))
+        naira.refresh_from_db()
+        dollars.refresh_from_db()
+        self.assertTrue(naira.processed)
+        self.assertEqual((dollars.processed, dollars.flw_status, dollars.journal_entry_id), (False, "pending", None))
+        self.assertBalance(self.user, "5000.00")
+
+    def test_batch_falls_back_to_one_row_at_a_time(self):
+        good = self.top_up("5000", tx_ref="FLW-GOOD")
+        bad = self.top_up("7000", tx_ref="FLW-BAD")
+        lines = ledger.transaction_lines
+
+        def failing_lines(tx):
+            if tx.pk == bad.pk:
+                raise ledger.LedgerError("broken row")
+            return lines(tx)
+
+        with mock.patch.object(ledger, "transaction_lines", failing_lines):
+            settled, pending = flutterwave.settle_verified_batch({
+                good.id: paid(good, "5000.00", "NGN", flw_id=1), bad.id: paid(bad, "7000.00", "NGN", flw_id=2),
+            })
+
+        self.assertEqual((settled, pending), (1, 1))
+        bad.refresh_from_db()
+        self.assertFalse(bad.processed)
+        self.assertBalance(self.user, "5000.00")
+
+    def test_unsupported_top_up_currency(self):
+        with self.assertRaises(fx.UnsupportedCurrency):
+            self.top_up("10", "JPY")
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+
+
+@skipIf(connection.vendor == "postgresql", "Postgres leases with an advisory lock")
+class SingleFlightLeaseTests(BankTestCase):
+    def test_lease_row_is_held_until_released(self):
+        with flutterwave.single_flight("FLW-1"):
+            held = VerifyLease.objects.get(tx_ref="FLW-1")
+            # Another worker waits out its deadline, then goes ahead unleased
+            with override_settings(FLUTTERWAVE_VERIFY_LEASE_SECONDS=0):
+                self.assertIsNone(flutterwave._acquire_lease("FLW-1"))
+            self.assertEqual(VerifyLease.objects.get().token, held.token)
+        self.assertFalse(VerifyLease.objects.exists())
+
+    def test_lease_of_a_dead_worker_lapses(self):
+        VerifyLease.objects.create(tx_ref="FLW-1", token="gone", expires_at=timezone.now() - timedelta(seconds=1))
+
+        lease = flutterwave._acquire_lease("FLW-1")
+
+        self.assertEqual(VerifyLease.objects.get(tx_ref="FLW-1").token, lease)
+        flutterwave._release_lease("FLW-1", lease)
+        self.assertFalse(VerifyLease.objects.exists())
+
+
+@mock.patch.object(flutterwave, "_release_lease", lambda tx_ref, lease: None)
+@mock.patch.object(flutterwave, "_acquire_lease", lambda tx_ref: None)
+class SingleFlightCoalescingTests(BankTestCase):
+    def run_flights(self, tx_refs, body):
+        def fly(tx_ref):
+            with flutterwave.single_flight(tx_ref):
+                body(tx_ref)
+
+        threads = [threading.Thread(target=fly, args=(tx_ref,)) for tx_ref in tx_refs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(flutterwave._flights, {})
+
+    def test_callers_for_one_tx_ref_go_one_at_a_time(self):
+        inside, overlaps = [], []
+
+        def body(tx_ref):
+            inside.append(tx_ref)
+            overlaps.append(len(inside))
+            time.sleep(0.01)
+            inside.remove(tx_ref)
+
+        self.run_flights(["FLW-1"] * 4, body)
+
+        self.assertEqual(overlaps, [1, 1, 1, 1])
+
+    def test_different_tx_refs_do_not_wait_for_each_other(self):
+        both_inside = threading.Barrier(2, timeout=5)
+        self.run_flights(["FLW-1", "FLW-2"], lambda tx_ref: both_inside.wait())
+        self.assertFalse(both_inside.broken)
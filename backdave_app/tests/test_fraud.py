@@ -0,0 +1,71 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.test import override_settings
+from django.utils import timezone
+
+from backdave_app import fraud
+from backdave_app.models import JournalEntry, RiskProfile, Transaction
+
+from .base import BankTestCase
+
+
+class FraudTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user(balance=2_000_000)
+        self.start = timezone.now() - timedelta(days=1)
+
+    def pay(self, amount, recipient, minutes=0):
+        return Transaction.objects.create(
+            user=self.user, type="Bill Payment", amount=Decimal(amount), recipient=recipient,
+            date=self.start + timedelta(minutes=minutes),
+        )
+
+    def test_usual_debit_passes(self):
+        for i in range(5):
+            self.pay("100", "NEPA", minutes=10 * i)
+
+        tx = self.pay("120", "NEPA", minutes=60)
+
+        self.assertLess(tx.risk_score, settings.FRAUD_BLOCK_SCORE)
+        self.assertBalance(self.user, "1999380.00")
+        self.assertEqual(RiskProfile.objects.get(user=self.user).count, 6)
+
+    def test_outlier_debit_is_blocked_and_rolled_back(self):
+        for i in range(5):
+            self.pay("100", "NEPA", minutes=10 * i)
+        entries = JournalEntry.objects.count()
+
+        with self.assertLogs("backdave_app.fraud", "WARNING"), self.assertRaises(fraud.FraudSuspected):
+            self.pay("1000000", "Stranger", minutes=60)
+
+        self.assertEqual(JournalEntry.objects.count(), entries)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 5)
+        self.assertBalance(self.user, "1999500.00")
+        self.assertEqual(RiskProfile.objects.get(user=self.user).count, 5)
+        self.assertLedgerConsistent()
+
+    @override_settings(FRAUD_BLOCK_SCORE=1.01)  # score the outliers rather than refuse them
+    def test_rescore_matches_inline_scores(self):
+        other = self.make_user(balance=50_000)
+        # Bursts, repeat and new recipients, a spread of amounts, and a second user in between
+        plan = [(0, "500", "A"), (1, "20", "B"), (2, "20", "B"), (3, "7500", "C"), (30, "40", "A"),
+                (31, "45", "D"), (200, "300", "A"), (201, "3000", "E"), (202, "25", "B")]
+        for minutes, amount, recipient in plan:
+            self.pay(amount, recipient, minutes=minutes)
+            Transaction.objects.create(
+                user=other, type="Airtime Purchase", amount=Decimal("100"), phone="08030000000",
+                date=self.start + timedelta(minutes=minutes, seconds=30),
+            )
+        inline = dict(Transaction.objects.filter(type__in=("Bill Payment", "Airtime Purchase"))
+                      .values_list("id", "risk_score"))
+        Transaction.objects.update(risk_score=None)
+
+        self.assertEqual(fraud.rescore(self.start - timedelta(minutes=1), users_per_chunk=1), len(inline))
+
+        rescored = dict(Transaction.objects.filter(id__in=inline).values_list("id", "risk_score"))
+        self.assertEqual(rescored.keys(), inline.keys())
+        for pk, score in inline.items():
+            self.assertAlmostEqual(rescored[pk], score, places=9, msg=pk)
@@ -0,0 +1,93 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from backdave_app import idempotency, ledger
+from backdave_app.models import IdempotencyKey, Transaction
+
+from .base import PIN, BankTestCase
+
+
+class IdempotencyTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sender = self.make_user(balance=1000)
+        self.recipient = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.sender)
+
+    def send(self, amount, key="key-1"):
+        return self.client.post(
+            "/api/transfer/internal/", {"phone": self.recipient.phone, "amount": amount, "pin": PIN},
+            format="json", headers={"Idempotency-Key": key},
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.send("100")
+        retry = self.send("100")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.json()), (201, first.json()))
+        self.assertEqual(retry.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(Transaction.objects.filter(type="Transfer").count(), 1)
+        self.assertBalance(self.sender, "900.00")
+
+    def test_key_reused_for_another_request_is_refused(self):
+        self.send("100")
+
+        res = self.send("200")
+
+        self.assertEqual(res.status_code, 422)
+        self.assertBalance(self.sender, "900.00")
+
+    def test_request_still_running_conflicts(self):
+        self.send("100")
+        # As if the first request had not finished yet
+        IdempotencyKey.objects.filter(key="key-1").update(status_code=None, response_body=None)
+
+        res = self.send("100")
+
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(Transaction.objects.filter(type="Transfer").count(), 1)
+
+    def test_client_errors_are_replayed_too(self):
+        self.assertEqual(self.send("5000").status_code, 400)  # insufficient funds
+        self.assertEqual(self.send("5000").headers.get("Idempotent-Replayed"), "true")
+        self.assertEqual(self.send("100", key="key-2").status_code, 201)
+        self.assertBalance(self.sender, "900.00")
+
+    def test_claim_left_by_a_dead_request_is_taken_over(self):
+        # The worker is killed mid-transfer: nothing commits, but the claim stays
+        with mock.patch.object(ledger, "post_many", side_effect=SystemExit), self.assertRaises(SystemExit):
+            self.send("100")
+        self.assertEqual(self.send("100").status_code, 409)
+
+        stale = timezone.now() - settings.IDEMPOTENCY_CLAIM_TIMEOUT - timedelta(seconds=1)
+        IdempotencyKey.objects.filter(key="key-1").update(claimed_at=stale)
+
+        self.assertEqual(self.send("100").status_code, 201)
+        self.assertEqual(self.send("100").headers.get("Idempotent-Replayed"), "true")
+        self.assertEqual(Transaction.objects.filter(type="Transfer").count(), 1)
+        self.assertBalance(self.sender, "900.00")
+
+    def test_superseded_request_leaves_the_new_claim_alone(self):
+        first, _ = idempotency.claim(self.sender, "key-9", "hash")
+        stale = timezone.now() - settings.IDEMPOTENCY_CLAIM_TIMEOUT - timedelta(seconds=1)
+        IdempotencyKey.objects.filter(pk=first.pk).update(claimed_at=stale)
+        first.claimed_at = stale
+
+        second, replay = idempotency.claim(self.sender, "key-9", "hash")
+        self.assertFalse(replay)
+        with self.assertRaises(idempotency.IdempotencyError):
+            idempotency.claim(self.sender, "key-9", "hash")  # taken over once only
+
+        # The original request finishing late neither stores its response nor frees the key
+        idempotency.store(first, {"late": True}, 201)
+        idempotency.release(first)
+        row = IdempotencyKey.objects.get(pk=first.pk)
+        self.assertEqual((row.status_code, row.claimed_at), (None, second.claimed_at))
+        idempotency.store(second, {"ok": True}, 201)
+        self.assertEqual(idempotency.claim(self.sender, "key-9", "hash")[0].response_body, {"ok": True})
@@ -0,0 +1,125 @@
+import io
+import shutil
+import tempfile
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from backdave_app import jobs
+from backdave_app.models import Job
+
+from .base import BankTestCase
+
+
+def png(color):
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (300, 300), color).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def jpeg_with_gps():
+    from PIL import Image
+
+    exif = Image.Exif()
+    exif[0x8825] = {1: "N", 2: (6.0, 27.0, 0.0)}  # GPSInfo
+    buf = io.BytesIO()
+    Image.new("RGB", (800, 600), "red").save(buf, "JPEG", exif=exif)
+    return buf.getvalue()
+
+
+class ProfilePictureTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, raw, user=None, render=True):
+        """Post ``raw`` as ``user``'s picture and, with ``render``, run its thumbnail job."""
+        client = self.client
+        if user is not None:
+            client = APIClient()
+            client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            res = client.post("/api/account/", {"profilePic": SimpleUploadedFile("me.png", raw)}, format="multipart")
+        self.assertEqual(res.status_code, 200, res.content)
+        if render:
+            self.assertTrue(jobs.run(Job.objects.filter(name="render_profile_thumbnails").latest("id")))
+        (user or self.user).refresh_from_db()
+
+    def stored(self):
+        return set(default_storage.listdir("profile_pics")[1])
+
+    def names(self, user):
+        return {name.split("/")[-1] for name in user.profile_pic_thumbs.values()}
+
+    def test_only_metadata_free_renditions_are_stored(self):
+        from PIL import Image
+
+        raw = jpeg_with_gps()
+        upload = SimpleUploadedFile("me.jpg", raw, content_type="image/jpeg")
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post("/api/account/", {"profilePic": upload}, format="multipart")
+
+        self.assertEqual(res.status_code, 200, res.content)
+        self.user.refresh_from_db()
+        stored = default_storage.listdir("profile_pics")[1]
+        self.assertEqual(stored, [self.user.profilePic.name.split("/")[-1]])
+        with default_storage.open(self.user.profilePic.name) as f, Image.open(f) as img:
+            self.assertEqual((img.format, img.size), ("WEBP", (512, 512)))
+            self.assertFalse(img.getexif())
+
+        job = Job.objects.get(name="render_profile_thumbnails")
+        self.assertTrue(jobs.run(job))
+        self.user.refresh_from_db()
+        self.assertEqual(set(self.user.profile_pic_thumbs), {"512", "256", "64"})
+        self.assertEqual(len(default_storage.listdir("profile_pics")[1]), 3)
+
+    def test_replaced_picture_files_are_deleted_after_commit(self):
+        self.upload(png("red"))
+        red = self.names(self.user)
+
+        self.upload(png("blue"))
+
+        self.assertEqual(len(red), 3)
+        self.assertEqual(self.stored(), self.names(self.user))
+        self.assertFalse(red & self.stored())
+
+    def test_files_shared_with_another_user_are_kept(self):
+        other = self.make_user()
+        self.upload(png("red"))
+        self.upload(png("red"), user=other)
+        red = self.names(self.user)
+
+        self.upload(png("blue"))
+
+        self.assertEqual(self.names(other), red)
+        self.assertEqual(self.stored(), red | self.names(self.user))
+
+    def test_same_picture_uploaded_again_is_kept(self):
+        self.upload(png("red"))
+        red = self.names(self.user)
+
+        self.upload(png("red"))
+
+        self.assertEqual(self.stored(), red)
+        self.assertEqual(self.names(self.user), red)
+
+    def test_thumbnail_job_of_a_replaced_upload_does_nothing(self):
+        self.upload(png("red"), render=False)
+        stale = Job.objects.get(name="render_profile_thumbnails")
+
+        self.upload(png("blue"))
+
+        self.assertTrue(jobs.run(stale))
+        self.assertEqual(self.stored(), self.names(self.user))
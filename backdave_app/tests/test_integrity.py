@@ -0,0 +1,88 @@
+import unittest
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from backdave_app import integrity, ledger
+from backdave_app.models import LedgerAccount, Posting, Transaction, User
+
+from .base import BankTransactionTestCase
+
+
+# check() sets its own isolation level on Postgres, so it cannot run inside a test transaction
+class IntegrityTests(BankTransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user(balance=1000)
+        self.other = self.make_user(balance=500)
+        self.wallet = ledger.wallet_for(self.user)
+        self.payment = Transaction.objects.create(user=self.user, type="Bill Payment", amount=Decimal("200"))
+        Transaction.objects.create(user=self.other, type="Deposit", amount=Decimal("75"))
+
+    def assertIssues(self, report, **expected):
+        self.assertEqual(report["issues"], {**dict.fromkeys(integrity.ISSUE_KINDS, 0), **expected})
+
+    def test_clean_ledger_reports_nothing(self):
+        report = integrity.check()
+
+        self.assertIssues(report)
+        self.assertEqual(report["accounts"], 2)
+        self.assertEqual(report["transactions"], 2)
+
+    def test_clean_sharded_ledger_reports_nothing(self):
+        ledger.set_shard_count(self.wallet, 4)
+        for _ in range(5):
+            Transaction.objects.create(user=self.user, type="Deposit", amount=Decimal("40"))
+        Transaction.objects.create(user=self.user, type="Bill Payment", amount=Decimal("30"))
+
+        self.assertIssues(integrity.check(chunk_size=3))
+        ledger.compact_shards(self.wallet)
+        self.assertIssues(integrity.check(chunk_size=3))
+
+    def test_broken_chain_is_reported(self):
+        posting = Posting.objects.filter(account=self.wallet).earliest("id")  # the opening deposit
+        Posting.objects.filter(pk=posting.pk).update(balance_after=Decimal("1.00"))
+
+        report = integrity.check()
+
+        self.assertIssues(report, chain=1)
+        self.assertEqual(report["samples"][0]["posting"], posting.pk)
+
+    def test_stored_balance_off_its_postings_is_reported(self):
+        LedgerAccount.objects.filter(pk=self.wallet.pk).update(balance=Decimal("900.00"))
+        User.objects.filter(pk=self.user.pk).update(balance=Decimal("900.00"))
+
+        self.assertIssues(integrity.check(), balance=1)
+
+    def test_stale_mirror_is_reported(self):
+        User.objects.filter(pk=self.other.pk).update(balance=Decimal("1.00"))
+
+        report = integrity.check()
+
+        self.assertIssues(report, mirror=1)
+        self.assertEqual(report["samples"][0]["user"], self.other.pk)
+
+    def test_transaction_off_its_posting_is_reported(self):
+        Transaction.objects.filter(pk=self.payment.pk).update(amount=Decimal("250.00"))
+
+        report = integrity.check()
+
+        self.assertIssues(report, transaction=1)
+        self.assertEqual(report["samples"][0]["transaction"], self.payment.pk)
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "forked workers need a database server")
+    def test_forked_workers_check_the_whole_range(self):
+        for _ in range(4):
+            self.make_user(balance=100)
+        ledger.set_shard_count(self.wallet, 4)
+        Transaction.objects.create(user=self.user, type="Deposit", amount=Decimal("40"))
+
+        out = StringIO()
+        call_command("check_balances", processes=2, as_json=True, stdout=out)
+        self.assertIn('"accounts": 6', out.getvalue())
+
+        User.objects.filter(pk=self.other.pk).update(balance=Decimal("1.00"))
+        with self.assertRaisesMessage(CommandError, "1 mirror"):
+            call_command("check_balances", processes=2, stdout=StringIO())
@@ -0,0 +1,138 @@
+import signal
+import threading
+import unittest
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from backdave_app import jobs
+from backdave_app.models import Job
+
+calls = []
+
+
+@jobs.task("test_record")
+def record(value, fail=False):
+    if fail:
+        raise RuntimeError("handler failed")
+    calls.append(value)
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_waits_for_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue("test_record", value=1)
+            self.assertFalse(Job.objects.exists())
+
+        job = Job.objects.get()
+        self.assertEqual((job.name, job.payload, job.status), ("test_record", {"value": 1}, Job.QUEUED))
+
+    def test_rolled_back_enqueue_queues_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                jobs.enqueue("test_record", value=1)
+                raise RuntimeError
+
+        self.assertFalse(Job.objects.exists())
+
+    def test_unknown_job_is_refused(self):
+        with self.assertRaises(KeyError):
+            jobs.enqueue("no_such_job")
+
+    def test_claimed_job_is_not_claimed_again(self):
+        Job.objects.create(name="test_record", payload={"value": 1})
+        Job.objects.create(name="test_record", payload={"value": 2}, run_at=timezone.now() + timedelta(hours=1))
+
+        first = jobs.claim(10, "a")
+        self.assertEqual([(j.status, j.locked_by, j.attempts) for j in first], [(Job.RUNNING, "a", 1)])
+        self.assertEqual(jobs.claim(10, "b"), [])
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_orphaned_job_is_claimed_again(self):
+        job = Job.objects.create(name="test_record", payload={"value": 1}, status=Job.RUNNING, attempts=1,
+                                 locked_by="gone", locked_at=timezone.now() - timedelta(seconds=61))
+
+        self.assertEqual([(j.pk, j.locked_by, j.attempts) for j in jobs.claim(10, "b")], [(job.pk, "b", 2)])
+
+    def test_finished_job_is_deleted(self):
+        Job.objects.create(name="test_record", payload={"value": 7})
+
+        self.assertTrue(jobs.run(jobs.claim(1, "a")[0]))
+
+        self.assertEqual(calls, [7])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOB_MAX_ATTEMPTS=2)
+    def test_failure_backs_off_then_gives_up(self):
+        Job.objects.create(name="test_record", payload={"value": 1, "fail": True})
+
+        with self.assertLogs("backdave_app.jobs", "ERROR"):
+            before = timezone.now()
+            self.assertFalse(jobs.run(jobs.claim(1, "a")[0]))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.QUEUED, 1, ""))
+        self.assertIn("handler failed", job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=2))
+        self.assertEqual(jobs.claim(1, "a"), [])  # not due yet
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs("backdave_app.jobs", "ERROR"):
+            self.assertFalse(jobs.run(jobs.claim(1, "a")[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(jobs.claim(1, "a"), [])
+
+
+# Committed for real: the worker's threads use connections of their own
+class WorkerTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.addCleanup(signal.signal, sig, signal.getsignal(sig))
+
+    def test_runworker_drains_the_queue(self):
+        for value in range(5):
+            Job.objects.create(name="test_record", payload={"value": value})
+        Job.objects.create(name="test_record", payload={"value": 9, "fail": True})
+
+        out = StringIO()
+        # One thread: SQLite's shared in-memory test database cannot take concurrent writers
+        concurrency = 2 if connection.vendor == "postgresql" else 1
+        with self.assertLogs("backdave_app.jobs", "ERROR"):
+            call_command("runworker", once=True, concurrency=concurrency, batch=2, stdout=out)
+
+        self.assertEqual(sorted(calls), [0, 1, 2, 3, 4])
+        self.assertIn("5 done, 1 failed", out.getvalue())
+        self.assertEqual(list(Job.objects.values_list("status", flat=True)), [Job.QUEUED])
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "SKIP LOCKED needs Postgres")
+    def test_claim_skips_rows_locked_by_another_worker(self):
+        held = Job.objects.create(name="test_record", payload={"value": 1})
+        free = Job.objects.create(name="test_record", payload={"value": 2})
+        locked, release = threading.Event(), threading.Event()
+
+        def other_worker():
+            try:
+                with transaction.atomic():
+                    Job.objects.select_for_update().get(pk=held.pk)
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            self.assertEqual([j.pk for j in jobs.claim(10, "a")], [free.pk])
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual([j.pk for j in jobs.claim(10, "b")], [held.pk])
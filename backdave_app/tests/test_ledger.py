@@ -0,0 +1,94 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from rest_framework.test import APIClient
+
+from backdave_app import ledger
+from backdave_app.models import BalanceShard, JournalEntry, Transaction
+
+from .base import BankTestCase
+
+
+class LedgerTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user(balance=1000)
+        self.wallet = ledger.wallet_for(self.user)
+
+    def test_postings_keep_every_balance_consistent(self):
+        other = self.make_user(balance=250, currency="USD")
+        Transaction.objects.create(user=self.user, type="Airtime Purchase", amount=Decimal("300"))
+        Transaction.objects.create(user=other, type="Bill Payment", amount=Decimal("20"))
+
+        self.assertBalance(self.user, "700.00")
+        self.assertBalance(other, "230.00")
+        self.assertLedgerConsistent()
+
+    def test_unbalanced_entry_is_refused(self):
+        vendors = ledger.system_account("billers")
+        with self.assertRaises(ledger.LedgerError):
+            ledger.post("Bill Payment", [(self.wallet, Decimal("-10")), (vendors, Decimal("9"))])
+        self.assertFalse(JournalEntry.objects.filter(kind="Bill Payment").exists())
+
+    def test_insufficient_funds_posts_nothing(self):
+        entries = JournalEntry.objects.count()
+        with self.assertRaises(ledger.InsufficientFunds):
+            Transaction.objects.create(user=self.user, type="Withdrawal", amount=Decimal("1000.01"))
+
+        self.assertEqual(JournalEntry.objects.count(), entries)
+        self.assertFalse(Transaction.objects.filter(type="Withdrawal").exists())
+        self.assertBalance(self.user, "1000.00")
+
+    def test_rolled_back_posting_leaves_no_trace(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Transaction.objects.create(user=self.user, type="Deposit", amount=Decimal("500"))
+            raise RuntimeError
+
+        self.assertBalance(self.user, "1000.00")
+        self.assertLedgerConsistent()
+
+    def test_system_account_created_in_a_rolled_back_transaction_is_not_reused(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            ledger.system_account("withdrawals")
+            raise RuntimeError
+        self.assertNotIn("withdrawals", ledger._system_accounts)
+
+        Transaction.objects.create(user=self.user, type="Withdrawal", amount=Decimal("100"))
+        self.assertEqual(ledger.balance(ledger.system_account("withdrawals")), Decimal("100.00"))
+
+    def test_sharded_credit_shows_straight_away(self):
+        ledger.set_shard_count(self.wallet, 4)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get("/api/account/").json()["balance"], "1000.00")
+
+        Transaction.objects.create(user=self.user, type="Deposit", amount=Decimal("50"))
+
+        self.assertEqual(client.get("/api/account/").json()["balance"], "1050.00")
+        self.assertBalance(self.user, "1050.00")
+        self.assertLedgerConsistent()
+
+    def test_sharded_wallet_sums_its_shards(self):
+        ledger.set_shard_count(self.wallet, 4)
+        for _ in range(6):
+            Transaction.objects.create(user=self.user, type="Deposit", amount=Decimal("50"))
+        Transaction.objects.create(user=self.user, type="Bill Payment", amount=Decimal("100"))
+
+        self.assertBalance(self.user, "1200.00")
+        self.assertLedgerConsistent()
+        folded = BalanceShard.objects.filter(account=self.wallet).aggregate(total=Sum("balance"))["total"]
+        self.assertEqual(ledger.compact_shards(self.wallet), folded)
+        self.assertFalse(BalanceShard.objects.filter(account=self.wallet).exclude(balance=0).exists())
+        self.assertBalance(self.user, "1200.00")
+        self.assertLedgerConsistent()
+
+    def test_reversal_restores_the_balance(self):
+        tx = Transaction.objects.create(user=self.user, type="Bill Payment", amount=Decimal("400"))
+
+        ledger.reverse(tx.journal_entry)
+
+        self.assertBalance(self.user, "1000.00")
+        self.assertLedgerConsistent()
+        with self.assertRaises(ledger.LedgerError):
+            ledger.reverse(tx.journal_entry)
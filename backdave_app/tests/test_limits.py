@@ -0,0 +1,60 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import override_settings
+
+from backdave_app import limits
+from backdave_app.models import Transaction
+
+from .base import BankTestCase
+
+SMALL_LIMITS = {"*": {"*": {"per_transaction": 1_000, "daily_amount": 2_500, "hourly_count": 3}}}
+
+
+@override_settings(SPENDING_LIMITS=SMALL_LIMITS)
+class SpendingLimitTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        limits.limits_for.cache_clear()
+        self.addCleanup(limits.limits_for.cache_clear)
+        self.user = self.make_user(balance=10_000)
+
+    def pay(self, amount):
+        with limits.reserve(self.user, "Bill Payment", Decimal(amount)):
+            Transaction.objects.create(user=self.user, type="Bill Payment", amount=Decimal(amount))
+
+    def test_per_transaction_limit(self):
+        with self.assertRaisesMessage(limits.LimitExceeded, "per transaction"):
+            self.pay("1000.01")
+        self.assertBalance(self.user, "10000.00")
+
+    def test_daily_amount_is_checked_against_rows_without_a_shared_cache(self):
+        self.assertFalse(limits.counters_shared())  # LocMemCache
+        self.pay("1000")
+        self.pay("1000")
+
+        with self.assertRaisesMessage(limits.LimitExceeded, "Daily"):
+            self.pay("600")
+        self.pay("500")
+        self.assertEqual(limits.usage(self.user.pk, "Bill Payment"), (250_000, 3))
+
+    def test_hourly_count(self):
+        for _ in range(3):
+            self.pay("10")
+        with self.assertRaisesMessage(limits.LimitExceeded, "Too many"):
+            self.pay("10")
+
+    def test_other_types_are_not_limited(self):
+        with limits.reserve(self.user, "Deposit", Decimal("1000000")):
+            pass
+
+    @mock.patch.object(limits, "counters_shared", return_value=True)
+    def test_counters_give_back_a_failed_reservation(self, _):
+        self.pay("1000")
+        with self.assertRaises(RuntimeError), limits.reserve(self.user, "Bill Payment", Decimal("1000")):
+            raise RuntimeError
+
+        self.assertEqual(limits.usage(self.user.pk, "Bill Payment"), (100_000, 1))
+        self.pay("1000")
+        with self.assertRaisesMessage(limits.LimitExceeded, "Daily"):
+            self.pay("600")
@@ -0,0 +1,72 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from backdave_app import banks, name_enquiry
+
+
+class FlakyBackend(name_enquiry.StubBackend):
+    """Fails its first lookup like a provider timeout, then answers."""
+
+    def lookup(self, bank, account_number):
+        if not self.calls:
+            self.calls += 1
+            raise name_enquiry.NameEnquiryError("timed out")
+        return super().lookup(bank, account_number)
+
+
+@override_settings(NAME_ENQUIRY_STUB_LATENCY=0)
+class NameEnquiryTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.stub = name_enquiry.StubBackend()
+        patcher = mock.patch.object(name_enquiry, "backend", return_value=self.stub)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeated_lookup_is_served_from_the_cache(self):
+        name = name_enquiry.resolve("GTBank", "0123456789")
+
+        self.assertEqual(name_enquiry.resolve("058", "0123456789"), name)
+        self.assertEqual(name_enquiry.resolve("guaranty trust bank", " 0123456789 "), name)
+        self.assertEqual(self.stub.calls, 1)
+
+    def test_unknown_account_is_cached_for_the_negative_ttl(self):
+        with mock.patch.object(cache, "set", wraps=cache.set) as cache_set:
+            for _ in range(2):
+                with self.assertRaises(name_enquiry.AccountNotFound):
+                    name_enquiry.resolve("Zenith Bank", "0123456000")
+
+        self.assertEqual(self.stub.calls, 1)
+        cache_set.assert_called_once_with(
+            "name_enquiry:057:0123456000", mock.ANY, settings.NAME_ENQUIRY_NEGATIVE_CACHE_SECONDS,
+        )
+
+    def test_provider_errors_are_not_cached(self):
+        self.stub = FlakyBackend()
+        name_enquiry.backend.return_value = self.stub
+
+        with self.assertRaises(name_enquiry.NameEnquiryError):
+            name_enquiry.resolve("Access Bank", "0123456789")
+        self.assertTrue(name_enquiry.resolve("Access Bank", "0123456789"))
+
+        self.assertEqual(self.stub.calls, 2)
+        self.assertEqual(name_enquiry._inflight, {})
+
+    def test_unknown_bank_is_refused_before_any_lookup(self):
+        with self.assertRaises(name_enquiry.UnknownBank):
+            name_enquiry.resolve("Bank of Nowhere", "0123456789")
+        with self.assertRaises(name_enquiry.AccountNotFound):
+            name_enquiry.resolve("Access Bank", "12345")
+        self.assertEqual(self.stub.calls, 0)
+
+
+class BankDirectoryTests(SimpleTestCase):
+    def test_banks_are_found_by_code_name_or_alias(self):
+        self.assertEqual(banks.find("058").name, "Guaranty Trust Bank")
+        self.assertEqual(banks.find("  First-Bank ").code, "011")
+        self.assertEqual(banks.find("UNITED BANK FOR AFRICA").code, "033")
+        self.assertEqual(banks.find("uba").code, "033")
+        self.assertIsNone(banks.find("Bank of Nowhere"))
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from backdave_app import references
+from backdave_app.models import ReferenceNode
+
+
+# Committed for real: on Postgres a lease taken inside a transaction is
+# written on a connection of its own, outside any test transaction
+class ReferenceTests(TransactionTestCase):
+    def setUp(self):
+        references._lease = references._generator = None
+        self.addCleanup(setattr, references, "_lease", None)
+        self.addCleanup(setattr, references, "_generator", None)
+        ReferenceNode.objects.all().delete()  # left behind by other tests' leases
+
+    def test_references_are_unique_and_time_ordered(self):
+        refs = [references.next_reference("TXN") for _ in range(5000)]
+        self.assertEqual(len(set(refs)), len(refs))
+        self.assertEqual(refs, sorted(refs))
+
+    def test_each_lease_gets_its_own_node(self):
+        first, second = references.lease(), references.lease()
+        self.assertNotEqual(first.node_id, second.node_id)
+        self.assertEqual(ReferenceNode.objects.count(), 2)
+
+    def test_lapsed_lease_is_taken_over(self):
+        ReferenceNode.objects.create(node_id=0, holder="gone:1:x", expires_at=timezone.now() - timedelta(seconds=1))
+        ReferenceNode.objects.create(node_id=1, holder="live:2:y", expires_at=timezone.now() + timedelta(minutes=5))
+
+        current = references.lease()
+
+        self.assertEqual(current.node_id, 0)
+        self.assertEqual(ReferenceNode.objects.get(node_id=0).holder, current.holder)
+
+    def test_lease_taken_in_a_rolled_back_transaction_is_held_afterwards(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            references.next_reference("TXN")
+            raise RuntimeError
+
+        references.next_reference("TXN")
+
+        self.assertEqual(ReferenceNode.objects.get().holder, references._lease.holder)
+
+    def test_node_taken_by_another_live_process_fails_loudly(self):
+        references.next_reference("TXN")
+        node = references._lease.node_id
+        ReferenceNode.objects.filter(node_id=node).update(holder="other:3:z")
+        references._lease.renew_at = 0
+
+        with self.assertLogs("backdave_app.references", "CRITICAL"), self.assertRaises(references.NodeLeaseError):
+            references.next_reference("TXN")
+
+        # The next call leases a fresh node rather than reuse the shared one
+        references.next_reference("TXN")
+        self.assertNotEqual(references._lease.node_id, node)
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, Sum
+from django.test import override_settings
+from django.utils import timezone
+
+from backdave_app import archive, retention
+from backdave_app.models import RetentionRun, Transaction, TransactionSummary, User
+
+from .base import BankTestCase
+
+
+@override_settings(
+    RETENTION_DORMANT_DAYS=365,
+    RETENTION_POLICIES={"*": 1000, "Airtime Purchase": 365, "Reward Points": 365},
+)
+class RetentionTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.user = self.make_dormant_user()
+
+    def days_ago(self, days):
+        return self.now - timedelta(days=days)
+
+    def make_dormant_user(self):
+        user = self.make_user(balance=1000)
+        for days, type, amount in (
+            (1200, "Bill Payment", "100"),
+            (1190, "Bill Payment", "50"),
+            (800, "Airtime Purchase", "20"),
+            (790, "Bill Payment", "30"),  # inside the 1000-day window
+            (600, "Airtime Purchase", "10"),
+        ):
+            Transaction.objects.create(user=user, type=type, amount=Decimal(amount), date=self.days_ago(days))
+        Transaction.objects.create(
+            user=user, type="Add Money", amount=Decimal("500"), flw_status="pending",
+            flw_tx_ref=f"FLW-{user.pk}", date=self.days_ago(1180),
+        )
+        User.objects.filter(pk=user.pk).update(date_joined=self.days_ago(1300), last_login=self.days_ago(500))
+        return user
+
+    def fold(self, user, now=None, batch_size=None):
+        for model in retention.FOLDED:
+            while retention.fold_batch(model, user.pk, now or self.now, batch_size):
+                pass
+
+    def totals(self, user):
+        return {
+            type: (count, amount) for type, count, amount in TransactionSummary.objects.filter(user=user)
+            .values("type").annotate(n=Sum("count"), total=Sum("amount")).values_list("type", "n", "total")
+        }
+
+    def test_dormant_user_is_selected(self):
+        self.assertEqual(list(retention.dormant_users(self.now)), [self.user])
+        User.objects.filter(pk=self.user.pk).update(last_login=self.days_ago(10))
+        self.assertFalse(retention.dormant_users(self.now).exists())
+
+    def test_summaries_keep_totals_and_balances(self):
+        # Outside the folded rows: a summary keeps only its month's last balance
+        moments = [self.days_ago(d) for d in (1250, 1185, 1000, 795, 700, 500, 0)]
+        before = [archive.balance_at(self.user.pk, m) for m in moments]
+        last_folded = Transaction.objects.get(user=self.user, date=self.days_ago(600))
+
+        self.fold(self.user)
+
+        self.assertEqual(self.totals(self.user), {
+            "Bill Payment": (2, Decimal("150.00")), "Airtime Purchase": (2, Decimal("30.00")),
+        })
+        self.assertEqual([archive.balance_at(self.user.pk, m) for m in moments], before)
+        latest = TransactionSummary.objects.filter(user=self.user).latest("last_date")
+        self.assertEqual((latest.last_id, latest.balance_after), (last_folded.pk, last_folded.balance_after))
+
+    def test_pending_and_unexpired_rows_are_kept(self):
+        self.fold(self.user)
+
+        kept = Transaction.objects.filter(user=self.user).order_by("date")
+        self.assertEqual([(t.type, t.flw_status) for t in kept], [("Add Money", "pending"), ("Bill Payment", None)])
+        self.assertEqual(kept[1].date, self.days_ago(790))
+
+    def test_history_and_statement_read_the_same_around_folded_rows(self):
+        start, end = self.days_ago(795), self.days_ago(700)
+        before = archive.statement(self.user.pk, start, end)
+
+        self.fold(self.user)
+
+        after = archive.statement(self.user.pk, start, end)
+        self.assertEqual(
+            (after["opening_balance"], after["closing_balance"]),
+            (before["opening_balance"], before["closing_balance"]),
+        )
+        self.assertEqual([t.id for t in after["transactions"]], [t.id for t in before["transactions"]])
+        self.assertEqual(
+            [t.type for t in archive.history(self.user.pk)], ["Bill Payment", "Add Money"],
+        )
+
+    def test_resumed_run_neither_refolds_nor_skips(self):
+        second = self.make_dormant_user()
+        # A run that died part-way through the first user's rows
+        retention.fold_batch(Transaction, self.user.pk, self.now, batch_size=1)
+
+        call_command("apply_retention", limit=1, sleep=0, stdout=StringIO())
+        run = RetentionRun.objects.get()
+        self.assertIsNone(run.finished_at)
+        self.assertEqual(run.last_user_id, self.user.pk)
+        self.assertEqual(Transaction.objects.filter(user=second).count(), 6)
+
+        out = StringIO()
+        call_command("apply_retention", sleep=0, stdout=out)
+        self.assertIn(f"Resuming retention run #{run.pk}", out.getvalue())
+        run.refresh_from_db()
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual(run.stats["users"], 2)
+        self.assertEqual(run.stats["rows"], 7)  # one row folded before the run started
+        expected = {"Bill Payment": (2, Decimal("150.00")), "Airtime Purchase": (2, Decimal("30.00"))}
+        self.assertEqual(self.totals(self.user), expected)
+        self.assertEqual(self.totals(second), expected)
+        self.assertFalse(
+            TransactionSummary.objects.values("user", "month", "type").annotate(n=Count("id")).filter(n__gt=1)
+        )
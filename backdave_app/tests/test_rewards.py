@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+from rest_framework.test import APIClient
+
+from backdave_app import ledger, rewards
+from backdave_app.models import JournalEntry, Transaction
+
+from .base import PIN, BankTestCase
+
+
+class RedemptionTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user(balance=100, reward_points=800)
+
+    def test_redeem_credits_the_wallet_and_spends_the_points(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.post("/api/rewards/redeem/", {"points": 600, "pin": PIN}, format="json")
+
+        self.assertEqual(res.status_code, 201, res.json())
+        self.assertEqual((res.json()["amount"], res.json()["remaining_points"]), ("60.00", 200))
+        self.assertBalance(self.user, "160.00")
+        self.assertEqual(self.user.reward_points, 200)
+        self.assertEqual(ledger.balance(ledger.system_account("rewards_expense")), Decimal("-60.00"))
+        self.assertLedgerConsistent()
+
+    def test_redeem_in_another_currency_converts_the_value(self):
+        dollars = self.make_user(currency="USD", reward_points=15000)
+
+        tx = rewards.redeem(dollars, 15000)
+
+        self.assertEqual((tx.amount, tx.currency), (Decimal("1.00"), "USD"))
+        self.assertBalance(dollars, "1.00")
+
+    def test_redeeming_more_points_than_held_moves_nothing(self):
+        entries = JournalEntry.objects.count()
+        with self.assertRaises(rewards.InsufficientPoints):
+            rewards.redeem(self.user, 801)
+
+        self.assertEqual(JournalEntry.objects.count(), entries)
+        self.assertBalance(self.user, "100.00")
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.reward_points, 800)
+
+    def test_minimum_redemption(self):
+        with self.assertRaises(rewards.RedemptionError):
+            rewards.redeem(self.user, 499)
+
+    def test_promotion_pays_each_user_once(self):
+        other = self.make_user(reward_points=1000)
+        below = self.make_user(reward_points=10)
+
+        self.assertEqual(rewards.redeem_batch("SPRING", "0.50", 100)[0], 2)
+        self.assertEqual(rewards.redeem_batch("SPRING", "0.50", 100)[0], 0)
+
+        self.assertBalance(self.user, "500.00")
+        self.assertBalance(other, "500.00")
+        self.assertBalance(below, "0.00")
+        self.assertEqual(Transaction.objects.filter(reference__startswith="PRM-SPRING-").count(), 2)
+        self.assertLedgerConsistent()
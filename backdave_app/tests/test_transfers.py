@@ -0,0 +1,95 @@
+import threading
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import connection, connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from backdave_app import ledger, transfers
+from backdave_app.models import LedgerAccount, Transaction, User
+
+from .base import PIN, STUB_RATES, BankTestCase
+
+
+class TransferTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sender = self.make_user(balance=1000)
+        self.recipient = self.make_user(balance=50)
+
+    def test_transfer_moves_money_between_wallets(self):
+        debit, credit = transfers.transfer(self.sender, self.recipient, "400", note="rent")
+
+        self.assertEqual((debit.balance_after, credit.balance_after), (Decimal("600.00"), Decimal("450.00")))
+        self.assertBalance(self.sender, "600.00")
+        self.assertBalance(self.recipient, "450.00")
+        self.assertEqual(ledger.balance(ledger.system_account(transfers.CLEARING_ACCOUNT)), Decimal("0.00"))
+        self.assertLedgerConsistent()
+
+    def test_transfer_across_currencies_credits_the_converted_amount(self):
+        dollars = self.make_user(currency="USD")
+
+        _, credit = transfers.transfer(self.sender, dollars, "750")
+
+        self.assertEqual(credit.amount, Decimal("0.50"))
+        self.assertBalance(dollars, "0.50")
+        self.assertLedgerConsistent()
+
+    def test_insufficient_funds_moves_nothing(self):
+        client = APIClient()
+        client.force_authenticate(self.sender)
+
+        res = client.post("/api/transfer/internal/", {"phone": self.recipient.phone, "amount": "1000.01", "pin": PIN},
+                          format="json")
+
+        self.assertEqual(res.status_code, 400)
+        self.assertBalance(self.sender, "1000.00")
+        self.assertBalance(self.recipient, "50.00")
+        self.assertFalse(Transaction.objects.filter(type__in=("Transfer", "Transfer Received")).exists())
+
+    def test_cannot_transfer_to_yourself(self):
+        with self.assertRaises(transfers.TransferError):
+            transfers.transfer(self.sender, self.sender, "10")
+
+    def test_wallets_are_locked_in_id_order(self):
+        # Sender created first, so sending back locks the higher id's wallet first if unordered
+        with CaptureQueriesContext(connection) as queries:
+            transfers.transfer(self.recipient, self.sender, "10")
+
+        table = LedgerAccount._meta.db_table
+        locks = [q["sql"] for q in queries if q["sql"].startswith(f'SELECT "{table}"') and " IN (" in q["sql"]]
+        self.assertTrue(locks)
+        for sql in locks:
+            self.assertIn(f'ORDER BY "{table}"."id" ASC', sql)
+
+
+@skipUnless(connection.vendor == "postgresql", "needs row locks held across connections")
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"], FX_STUB_RATES=STUB_RATES)
+class ConcurrentTransferTests(TransactionTestCase):
+    def test_opposite_transfers_do_not_deadlock(self):
+        ledger._system_accounts.clear()
+        a, b = (User.objects.create_user(phone=phone, password=PIN) for phone in ("08100000001", "08100000002"))
+        for user in (a, b):
+            user.deposit(Decimal("1000"))
+        errors = []
+
+        def send(sender, recipient):
+            try:
+                for _ in range(20):
+                    transfers.transfer(sender, recipient, "10")
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=send, args=pair) for pair in ((a, b), (b, a))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(ledger.balance(ledger.wallet_for(a)) + ledger.balance(ledger.wallet_for(b)), Decimal("2000.00"))
+        ledger._system_accounts.clear()
@@ -0,0 +1,96 @@
+"""
+Internal wallet-to-wallet transfers.
+
+The recipient is resolved by phone (unique, so indexed). Both legs are
+posted in one ledger batch: the sender's debit and the recipient's
+credit each get their own JournalEntry against the ``internal_transfers``
+account, which nets to zero. post_many locks both wallet rows in one
+query ordered by id, so concurrent A->B and B->A transfers queue instead
+of deadlocking.
+
+The amount is in the sender's currency. A recipient whose wallet is in
+another currency is credited the converted amount, through the
+fx_position accounts (ledger.exchange_lines).
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+
+from . import fx, ledger
+from .models import Transaction, User
+from .references import next_reference
+
+CLEARING_ACCOUNT = "internal_transfers"
+
+
+class TransferError(ValueError):
+    pass
+
+
+class RecipientNotFound(TransferError):
+    pass
+
+
+def resolve_recipient(phone):
+    phone = (phone or "").strip()
+    if not phone:
+        raise RecipientNotFound("Recipient phone is required")
+    try:
+        return User.objects.only("id", "phone", "full_name", "is_active").get(phone=phone, is_active=True)
+    except User.DoesNotExist:
+        raise RecipientNotFound("No wallet is registered to this phone number")
+
+
+def parse_amount(amount, currency=None):
+    """``amount`` quantized to ``currency``'s minor unit (default BASE_CURRENCY)."""
+    try:
+        amount = fx.quantize(amount, currency or settings.BASE_CURRENCY)
+    except (InvalidOperation, TypeError, ValueError):
+        raise TransferError("Invalid amount")
+    if amount <= 0:
+        raise TransferError("Invalid amount")
+    return amount
+
+
+def transfer(sender, recipient, amount, note=None):
+    """
+    Move ``amount`` from sender to recipient. Returns the (debit, credit)
+    Transaction rows; raises TransferError, ledger.InsufficientFunds or
+    fx.StaleRates.
+    """
+    if sender.pk == recipient.pk:
+        raise TransferError("Cannot transfer to your own wallet")
+
+    sender_wallet, recipient_wallet = ledger.wallet_for(sender), ledger.wallet_for(recipient)
+    amount = parse_amount(amount, sender_wallet.currency)
+    clearing = ledger.system_account(CLEARING_ACCOUNT, sender_wallet.currency)
+    credited, rate = fx.convert(amount, sender_wallet.currency, recipient_wallet.currency)
+    sent = fx.money(amount, sender_wallet.currency)
+    suffix = f": {note}" if note else ""
+    debit = Transaction(
+        user=sender, type="Transfer", amount=amount, counterparty=recipient, reference=next_reference("TXN"),
+        recipient=recipient.full_name or recipient.phone, phone=recipient.phone,
+        description=f"Transfer of {sent} to {recipient.phone}{suffix}"[:255],
+    )
+    credit = Transaction(
+        user=recipient, type="Transfer Received", amount=credited, counterparty=sender,
+        reference=next_reference("TXN"), phone=sender.phone,
+        fx_rate=rate if recipient_wallet.currency != sender_wallet.currency else None,
+        description=f"Transfer of {sent} from {sender.phone}{suffix}"[:255],
+    )
+
+    with transaction.atomic():
+        entries = ledger.post_many([
+            {"kind": tx.type, "lines": lines, "reference": tx.reference, "description": tx.description}
+            for tx, lines in (
+                (debit, [(sender_wallet, -amount), (clearing, amount)]),
+                (credit, ledger.exchange_lines(recipient_wallet, credited, clearing, amount)),
+            )
+        ])
+        for tx, entry, wallet in zip((debit, credit), entries, (sender_wallet, recipient_wallet)):
+            tx.journal_entry = entry
+            tx.balance_after = entry.balances.get(wallet.pk)
+            tx.user.balance = tx.balance_after if tx.balance_after is not None else ledger.balance(wallet)
+            tx.save()
+    return debit, credit
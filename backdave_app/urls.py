@@ -1,4 +1,7 @@
+from django.conf import settings
 from django.urls import path
+
+from . import async_views
 from .views import (
     # Health & Registration
     RegisterView,
@@ -14,7 +17,14 @@ from .views import (
 
     # Transactions
     TransactionView,
+    StatementView,
     TransferVerifyView,
+    BankListView,
+    InternalTransferView,
+
+    # Rewards
+    RewardsView,
+    RedeemRewardsView,
 
     # Dashboard
     DashboardView,
@@ -40,14 +50,35 @@ urlpatterns = [
 
     # Transactions
     path("transactions/", TransactionView.as_view(), name="transactions"),
+    path("statement/", StatementView.as_view(), name="statement"),
     path("transfer/verify/", TransferVerifyView.as_view(), name="transfer-verify"),
+    path("banks/", BankListView.as_view(), name="banks"),
+    path("transfer/internal/", InternalTransferView.as_view(), name="transfer-internal"),
+
+    # Rewards
+    path("rewards/", RewardsView.as_view(), name="rewards"),
+    path("rewards/redeem/", RedeemRewardsView.as_view(), name="rewards-redeem"),
 
     # Dashboard
     path("dashboard/", DashboardView.as_view(), name="dashboard"),
+]
 
-    # Flutterwave webhook
-    path("flutterwave/webhook/", flutterwave_webhook, name="flutterwave-webhook"),
+# Flutterwave: native coroutines when served over ASGI (DJANGO_ASYNC_VIEWS=True)
+if settings.ASYNC_VIEWS:
+    urlpatterns += [
+        path("flutterwave/webhook/", async_views.flutterwave_webhook, name="flutterwave-webhook"),
 
-    path("flutterwave/init/", InitFlutterwavePayment.as_view()),
-    path("flutterwave/verify/", FlutterwaveVerifyView.as_view()),
-]
+        path("flutterwave/init/", async_views.init_flutterwave_payment),
+        path("flutterwave/verify/", async_views.flutterwave_verify),
+
+        # Live balance/transaction updates; a stream would pin a WSGI worker
+        path("events/", async_views.event_stream, name="events"),
+    ]
+else:
+    urlpatterns += [
+        # Flutterwave webhook
+        path("flutterwave/webhook/", flutterwave_webhook, name="flutterwave-webhook"),
+
+        path("flutterwave/init/", InitFlutterwavePayment.as_view()),
+        path("flutterwave/verify/", FlutterwaveVerifyView.as_view()),
+    ]
@@ -1,13 +1,14 @@
 import json
-import random
-import requests
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.db import transaction
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
+from django.contrib.auth.models import update_last_login
 from django.db import transaction
 
 
@@ -19,7 +20,10 @@ from rest_framework import permissions, status
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 
+from . import archive, banks, flutterwave, fx, images, jobs, ledger, limits, name_enquiry, rewards, transfers
+from .idempotency import idempotent
 from .models import Transaction
+from .references import next_reference
 from .serializers import (
     LoginSerializer,
     AccountSerializer,
@@ -38,6 +42,8 @@ logger = logging.getLogger(__name__)
 
 @csrf_exempt
 def flutterwave_webhook(request):
+    import requests
+
     signature = request.headers.get("verif-hash")
     if signature != settings.FLUTTERWAVE_SECRET_HASH:
         logger.warning("Invalid webhook signature: %s", signature)
@@ -59,77 +65,58 @@ def flutterwave_webhook(request):
         logger.info("Ignored webhook for tx_ref=%s, status=%s", tx_ref, status_tx)
         return JsonResponse({"status": "ignored"})
 
-    # Verify with Flutterwave server-side
-    verify_url = f"https://api.flutterwave.com/v3/transactions/{flw_id}/verify"
-    headers = {"Authorization": f"Bearer {settings.FLUTTERWAVE_SECRET_KEY}"}
+    # Cheap read before going upstream: retried webhooks for settled
+    # payments never reach Flutterwave
+    tx = Transaction.objects.filter(flw_tx_ref=tx_ref).only("processed").first()
+    if not tx:
+        logger.warning("Transaction not found for tx_ref=%s", tx_ref)
+        return JsonResponse({"error": "Transaction not found"}, status=404)
 
-    try:
-        verify_res = requests.get(verify_url, headers=headers, timeout=10).json()
-        verified_data = verify_res.get("data", {})
-    except requests.RequestException as e:
-        logger.error("Flutterwave verification failed for tx_ref=%s: %s", tx_ref, str(e))
-        return JsonResponse({"error": "Verification timeout"}, status=500)
-
-    if verified_data.get("status") != "successful":
-        logger.warning("Verification failed for tx_ref=%s", tx_ref)
-        return JsonResponse({"error": "Verification failed"}, status=400)
-
-    with transaction.atomic():
-        tx = Transaction.objects.select_for_update().filter(flw_tx_ref=tx_ref).first()
-        if not tx:
-            logger.warning("Transaction not found for tx_ref=%s", tx_ref)
-            return JsonResponse({"error": "Transaction not found"}, status=404)
-
-        # Idempotency check
+    # The client's verify call for this payment usually arrives at the same moment
+    with flutterwave.single_flight(tx_ref):
+        tx.refresh_from_db(fields=["processed"])
         if tx.processed:
             logger.info("Transaction already processed: tx_ref=%s", tx_ref)
             return JsonResponse({"status": "already_processed"})
 
-        # Validate amount and currency
-        if Decimal(verified_data.get("amount")) != tx.amount:
-            logger.error("Amount mismatch for tx_ref=%s: expected %s, got %s", tx_ref, tx.amount, verified_data.get("amount"))
-            return JsonResponse({"error": "Amount mismatch"}, status=400)
-        if verified_data.get("currency") != tx.flw_currency:
-            logger.error("Currency mismatch for tx_ref=%s: expected %s, got %s", tx_ref, tx.flw_currency, verified_data.get("currency"))
-            return JsonResponse({"error": "Currency mismatch"}, status=400)
-
-        # Credit wallet
-        tx.user.balance += tx.amount
-        tx.user.save(update_fields=["balance"])
-
-        tx.flw_id = flw_id
-        tx.flw_status = "successful"
-        tx.processed = True
-        tx.save(update_fields=["flw_id", "flw_status", "processed"])
+        # Verify with Flutterwave server-side
+        try:
+            verified_data = flutterwave.verified(tx_ref, flw_id)
+        except requests.RequestException as e:
+            logger.error("Flutterwave verification failed for tx_ref=%s: %s", tx_ref, str(e))
+            return JsonResponse({"error": "Verification timeout"}, status=500)
 
-        logger.info("Transaction processed successfully: tx_ref=%s, amount=%s", tx_ref, tx.amount)
+        if verified_data.get("status") != "successful":
+            logger.warning("Verification failed for tx_ref=%s", tx_ref)
+            return JsonResponse({"error": "Verification failed"}, status=400)
 
-    return JsonResponse({"status": "success"})
+        body, code = flutterwave.settle_webhook_payment(tx_ref, flw_id, verified_data)
+    return JsonResponse(body, status=code)
 
 
     # views.py
 class InitFlutterwavePayment(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def post(self, request):
-        amount = request.data.get("amount")
-        if not amount or Decimal(amount) < 100:
-            return Response({"error": "Invalid amount"}, status=400)
-
-        tx_ref = f"FLW-{request.user.id}-{random.randint(100000,999999)}"
-
-        tx = Transaction.objects.create(
-            user=request.user,
-            type="Add Money",
-            amount=Decimal(amount),
-            flw_tx_ref=tx_ref,
-            flw_status="pending",
-            flw_currency="NGN",
-        )
+        tx_ref = next_reference("FLW")
+        try:
+            tx = flutterwave.create_top_up(
+                request.user, request.data.get("amount"), request.data.get("currency"), flw_tx_ref=tx_ref,
+            )
+        except fx.StaleRates as e:
+            return Response({"error": str(e)}, status=503)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
 
         return Response({
             "tx_ref": tx_ref,
-            "amount": str(tx.amount),
+            "amount": str(flutterwave.charged(tx)),
+            "currency": tx.flw_currency,
+            # What the wallet gets, at today's rate when paid in another currency
+            "credit": str(tx.amount),
+            "wallet_currency": tx.currency,
             "email": request.user.email,
             "phone": request.user.phone,
             "name": request.user.full_name,
@@ -157,35 +144,16 @@ class FlutterwaveVerifyView(APIView):
         if tx.processed:
             return Response({"status": "already_processed"})
 
-        # Verify with Flutterwave
-        verify_url = f"https://api.flutterwave.com/v3/transactions/verify_by_reference?tx_ref={tx_ref}"
-        headers = {
-            "Authorization": f"Bearer {settings.FLUTTERWAVE_SECRET_KEY}"
-        }
-
-        res = requests.get(verify_url, headers=headers).json()
-        data = res.get("data")
-
-        if not data or data.get("status") != "successful":
-            return Response({"error": "Payment not successful"}, status=400)
-
-        if Decimal(data["amount"]) != tx.amount:
-            return Response({"error": "Amount mismatch"}, status=400)
-
-        # Credit wallet
-        with transaction.atomic():
-            request.user.balance += tx.amount
-            request.user.save(update_fields=["balance"])
-
-            tx.flw_id = data["id"]
-            tx.flw_status = "successful"
-            tx.processed = True
-            tx.save()
+        # The webhook for this payment usually arrives at the same moment
+        with flutterwave.single_flight(tx_ref):
+            tx.refresh_from_db(fields=["processed"])
+            if tx.processed:
+                return Response({"status": "already_processed"})
 
-        return Response({
-            "success": True,
-            "balance": str(request.user.balance)
-        })
+            # Verify with Flutterwave
+            data = flutterwave.verified(tx_ref)
+            body, code = flutterwave.settle_reference_payment(request.user, tx, data)
+        return Response(body, status=code)
 
 
 # --------------------------
@@ -224,6 +192,8 @@ class LoginView(APIView):
         user = serializer.validated_data["user"]
         access = serializer.validated_data["access"]
         refresh = serializer.validated_data["refresh"]
+        # Dormancy for data retention (retention.py) starts from the last login
+        update_last_login(None, user)
 
         response = Response({"success": True, "access": access})
         response.set_cookie(
@@ -261,7 +231,7 @@ class AccountView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        return Response(AccountSerializer(request.user).data)
+        return Response(AccountSerializer(request.user, context={"request": request}).data)
 
     def post(self, request):
         user = request.user
@@ -269,15 +239,19 @@ class AccountView(APIView):
         user.email = request.data.get("email", user.email)
         user.phone = request.data.get("phone", user.phone)
 
-        if "profilePic" in request.FILES:
-            user.profilePic = request.FILES["profilePic"]
+        with transaction.atomic():
+            if "profilePic" in request.FILES:
+                try:
+                    images.save_upload(user, request.FILES["profilePic"])
+                except images.InvalidImage as e:
+                    return Response({"error": str(e)}, status=400)
 
-        user.save()
-        return Response(AccountSerializer(user).data)
+            user.save()
+        return Response(AccountSerializer(user, context={"request": request}).data)
 
 
 # --------------------------
-# VERIFY TRANSFER ACCOUNT VIEW (TEST MODE)
+# VERIFY TRANSFER ACCOUNT VIEW
 # --------------------------
 class TransferVerifyView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -290,11 +264,67 @@ class TransferVerifyView(APIView):
             return Response({"success": False, "error": "Both account_number and bank_name are required"},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # Fake account name for testing
-        account_name = random.choice(["John Doe"])
+        try:
+            account_name = name_enquiry.resolve(bank_name, account_number)
+        except name_enquiry.UnknownBank as e:
+            return Response({"success": False, "error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except name_enquiry.AccountNotFound as e:
+            return Response({"success": False, "error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except name_enquiry.NameEnquiryError:
+            logger.exception("Name enquiry failed for %s", bank_name)
+            return Response({"success": False, "error": "Bank is unavailable, try again"},
+                            status=status.HTTP_502_BAD_GATEWAY)
         return Response({"success": True, "account_name": account_name}, status=status.HTTP_200_OK)
 
 
+class BankListView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response([{"code": bank.code, "name": bank.name} for bank in banks.BANKS])
+
+
+# --------------------------
+# INTERNAL WALLET-TO-WALLET TRANSFER
+# --------------------------
+class InternalTransferView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @idempotent
+    def post(self, request):
+        from . import fraud  # NumPy; loaded by the first debit, not at startup
+
+        pin = request.data.get("pin")
+        if not pin or not request.user.check_pin(pin):
+            return Response({"error": "Invalid or missing PIN"}, status=400)
+
+        try:
+            recipient = transfers.resolve_recipient(request.data.get("phone"))
+            amount = transfers.parse_amount(request.data.get("amount"), ledger.wallet_for(request.user).currency)
+            with limits.reserve(request.user, "Transfer", amount):
+                debit, _ = transfers.transfer(request.user, recipient, amount, note=request.data.get("note"))
+        except transfers.RecipientNotFound as e:
+            return Response({"error": str(e)}, status=404)
+        except fx.StaleRates as e:
+            return Response({"error": str(e)}, status=503)
+        except (transfers.TransferError, ledger.InsufficientFunds, limits.LimitExceeded) as e:
+            return Response({"error": str(e)}, status=400)
+        except fraud.FraudSuspected as e:
+            return Response({"error": str(e)}, status=403)
+
+        return Response(
+            {
+                "success": True,
+                "reference": debit.reference,
+                "amount": str(debit.amount),
+                "currency": debit.currency,
+                "recipient": debit.recipient,
+                "balance": str(debit.balance_after),
+            },
+            status=201,
+        )
+
+
 # --------------------------
 # PIN VIEWS
 
@@ -326,12 +356,15 @@ class TransactionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        txs = request.user.transactions.order_by("-date")[:100]
+        txs = archive.history(request.user.pk, limit=100)
         return Response(
             TransactionSerializer(txs, many=True, context={"request": request}).data
         )
 
+    @idempotent
     def post(self, request):
+        from . import fraud  # NumPy; loaded by the first debit, not at startup
+
         data = request.data.copy()
         tx_type = data.get("type")
 
@@ -368,33 +401,62 @@ class TransactionView(APIView):
         )
         serializer.is_valid(raise_exception=True)
 
-        with transaction.atomic():
-            tx = serializer.save(user=request.user)
-
-            if tx.type not in ["Reward Points", "Reward Redemption"]:
-                Transaction.objects.create(
-                    user=request.user,
-                    type="Reward Points",
-                    points=100,
-                    amount=0
-                )
+        try:
+            with limits.reserve(request.user, tx_type, amount), transaction.atomic():
+                tx = serializer.save(user=request.user)
+
+                if tx.type not in ["Reward Points", "Reward Redemption"]:
+                    jobs.enqueue("award_reward_points", transaction_id=tx.pk)
+        except fx.StaleRates as e:
+            return Response({"error": str(e)}, status=503)
+        except (ledger.InsufficientFunds, limits.LimitExceeded) as e:
+            return Response({"error": str(e)}, status=400)
+        except fraud.FraudSuspected as e:
+            return Response({"error": str(e)}, status=403)
 
         return Response(
             {
                 "success": True,
-                "reference": f"TXN-{tx.id:06d}",
+                "reference": tx.reference,
                 "amount": str(tx.amount),
                 "type": tx.type,
             },
             status=201,
         )
 
+
+# --------------------------
+# STATEMENT VIEW
+# --------------------------
+class StatementView(APIView):
+    """Transactions between ?from= and ?to= (YYYY-MM-DD, inclusive), with opening and closing balances."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        start = parse_date(request.query_params.get("from") or "")
+        end = parse_date(request.query_params.get("to") or "")
+        if not start or not end:
+            return Response({"error": "from and to are required (YYYY-MM-DD)"}, status=400)
+        if end < start or (end - start).days >= settings.STATEMENT_MAX_DAYS:
+            return Response({"error": f"Range must run forwards and span at most {settings.STATEMENT_MAX_DAYS} days"},
+                            status=400)
+
+        result = archive.statement(
+            request.user.pk,
+            timezone.make_aware(datetime.combine(start, time.min)),
+            timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+        )
         return Response({
-            "success": True,
-            "reference": f"TXN-{tx.id:06d}",
-            "amount": str(tx.amount),
-            "type": tx.type
-        }, status=201)
+            "from": start,
+            "to": end,
+            "opening_balance": str(result["opening_balance"]),
+            "closing_balance": str(result["closing_balance"]),
+            "transactions": TransactionSerializer(
+                result["transactions"], many=True, context={"request": request},
+            ).data,
+        })
+
+
 # --------------------------
 # REWARDS VIEW
 # --------------------------
@@ -402,23 +464,42 @@ class RewardsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        txs = request.user.transactions.all()
-        earned = txs.filter(type="Reward Points").aggregate(Sum("points"))["points__sum"] or 0
-        redeemed = txs.filter(type="Reward Redemption").aggregate(Sum("points"))["points__sum"] or 0
-        total = earned + redeemed
-
-        if total >= 5000:
-            tier = "Platinum"
-        elif total >= 2500:
-            tier = "Gold"
-        elif total >= 1000:
-            tier = "Silver"
-        else:
-            tier = "Bronze"
+        total = request.user.total_points()
+        tier = rewards.tier_for(total).name
 
         return Response({"points": total, "tier": tier})
 
 
+class RedeemRewardsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @idempotent
+    def post(self, request):
+        pin = request.data.get("pin")
+        if not pin or not request.user.check_pin(pin):
+            return Response({"error": "Invalid or missing PIN"}, status=400)
+
+        try:
+            tx = rewards.redeem(request.user, request.data.get("points"))
+        except rewards.RedemptionError as e:
+            return Response({"error": str(e)}, status=400)
+        except fx.StaleRates as e:
+            return Response({"error": str(e)}, status=503)
+
+        return Response(
+            {
+                "success": True,
+                "reference": tx.reference,
+                "points": -tx.points,
+                "amount": str(tx.amount),
+                "currency": tx.currency,
+                "balance": str(tx.balance_after),
+                "remaining_points": request.user.reward_points,
+            },
+            status=201,
+        )
+
+
 # --------------------------
 # DASHBOARD VIEW
 # --------------------------
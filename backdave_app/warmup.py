@@ -0,0 +1,91 @@
+"""
+Pre-fork warmup for gunicorn --preload (see gunicorn.conf.py).
+
+Everything Django and DRF build lazily on a worker's first requests is
+built once in the master instead, so forked workers start hot and share
+those pages copy-on-write rather than each building a private copy.
+"""
+import logging
+
+from django.apps import apps
+from django.contrib.auth.hashers import get_hashers
+from django.db import DatabaseError, connections
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework import serializers as drf_serializers
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+
+def warm():
+    """Build the lazy per-process state, check the database, then drop connections before forking."""
+    _models()
+    views = _urls(get_resolver())
+    _views(views)
+    _serializers()
+    get_hashers()
+    from . import fraud  # noqa: F401 (NumPy: shared by every worker rather than loaded by each)
+    _fx_rates()
+    _check_database()
+
+
+def _models():
+    for model in apps.get_models():
+        model._meta.get_fields()
+        model._meta._relation_tree
+
+
+def _urls(resolver):
+    """Compile every route pattern and the reverse map; returns the view callables."""
+    resolver.reverse_dict
+    views = []
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            views += _urls(pattern)
+        elif isinstance(pattern, URLPattern):
+            views.append(pattern.callback)
+    return views
+
+
+def _views(views):
+    """Resolve each DRF view's authentication, permission, parser and renderer classes."""
+    for view in views:
+        cls = getattr(view, "cls", None)
+        if cls is None or not issubclass(cls, APIView):
+            continue
+        instance = cls()
+        instance.get_authenticators()
+        instance.get_permissions()
+        instance.get_parsers()
+        instance.get_renderers()
+
+
+def _serializers():
+    """Build each serializer's fields once; this fills model field and relation caches."""
+    from . import serializers
+
+    for obj in vars(serializers).values():
+        if (isinstance(obj, type) and issubclass(obj, drf_serializers.Serializer)
+                and obj.__module__ == serializers.__name__):
+            obj().fields
+
+
+def _fx_rates():
+    """Load the exchange rate table, so workers start with it rather than each querying on first use."""
+    from . import fx
+
+    try:
+        fx.table()
+    except DatabaseError:
+        logger.exception("Exchange rates not loaded during warmup; workers will load them")
+
+
+def _check_database():
+    # A forked worker must never inherit the master's socket
+    for conn in connections.all():
+        try:
+            conn.ensure_connection()
+        except DatabaseError:
+            logger.exception("Database %r unreachable during warmup; workers will retry", conn.alias)
+    connections.close_all()
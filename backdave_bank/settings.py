@@ -1,9 +1,12 @@
 from pathlib import Path
 from datetime import timedelta
+from decimal import Decimal
+import json
 import os
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+import dj_database_url
 
 
 # --------------------------
@@ -82,10 +85,25 @@ WSGI_APPLICATION = 'backdave_bank.wsgi.application'
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",  # SQLite file inside your project
-    }
+    # SQLite file inside your project unless DATABASE_URL points elsewhere
+    "default": dj_database_url.config(default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
+}
+
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    # Take the write lock when the transaction starts so concurrent workers
+    # wait on the busy timeout instead of failing with "database is locked"
+    DATABASES["default"]["OPTIONS"] = {"transaction_mode": "IMMEDIATE", "timeout": 20}
+
+# --------------------------
+# Cache
+# --------------------------
+# Per-process memory unless REDIS_URL is set. Lookups cached across
+# gunicorn workers need the shared Redis cache; without it spending limits
+# are checked against Transaction rows instead of cached counters.
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    if not os.getenv("REDIS_URL") else
+    {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": os.getenv("REDIS_URL")},
 }
 
 # --------------------------
@@ -114,6 +132,10 @@ USE_TZ = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Profile pictures are stored under content-hashed names, so they never change
+PROFILE_PIC_MAX_BYTES = int(os.getenv("PROFILE_PIC_MAX_BYTES", 5 * 1024 * 1024))
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # --------------------------
@@ -182,13 +204,192 @@ FLUTTERWAVE_KEYS = {
 FLUTTERWAVE_PUBLIC_KEY = FLUTTERWAVE_KEYS["VITE_FLUTTERWAVE_PUBLIC_KEY"]
 FLUTTERWAVE_SECRET_KEY = FLUTTERWAVE_KEYS["REACT_APP_FLUTTERWAVE_SECRET_KEY"]
 FLUTTERWAVE_ENCRYPTION_KEY = FLUTTERWAVE_KEYS["REACT_APP_FLUTTERWAVE_ENCRYPTION_KEY"]
+FLUTTERWAVE_SECRET_HASH = os.getenv("FLUTTERWAVE_SECRET_HASH")
+
+# Point at a local stub (python manage.py flutterwave_stub) for dev and load tests
+FLUTTERWAVE_BASE_URL = os.getenv("FLUTTERWAVE_BASE_URL", "https://api.flutterwave.com/v3")
+# The verify view and webhook racing for one tx_ref reuse a successful or
+# failed verify answer this long
+FLUTTERWAVE_VERIFY_CACHE_SECONDS = int(os.getenv("FLUTTERWAVE_VERIFY_CACHE_SECONDS", 60))
+# Longest a worker holds a tx_ref's verify-and-settle before others go
+# ahead anyway; above the 10 s verify timeout
+FLUTTERWAVE_VERIFY_LEASE_SECONDS = int(os.getenv("FLUTTERWAVE_VERIFY_LEASE_SECONDS", 15))
+
+# --------------------------
+# Transaction references
+# --------------------------
+# Each process leases a node id (0-1023) from the database for this long
+# and renews it halfway through; ids of processes that died free up after it
+REFERENCE_NODE_LEASE_SECONDS = int(os.getenv("REFERENCE_NODE_LEASE_SECONDS", 60 * 5))
+
+# --------------------------
+# Ledger
+# --------------------------
+# How long the summed balance of a sharded (hot) account is cached
+LEDGER_SHARD_CACHE_SECONDS = int(os.getenv("LEDGER_SHARD_CACHE_SECONDS", 2))
 
 # --------------------------
-# Check for missing keys
+# Transaction archive
 # --------------------------
-missing_keys = [name for name, value in FLUTTERWAVE_KEYS.items() if not value]
+# Rows older than this may be moved to the archive (archive_transactions);
+# reads of anything newer never touch it
+TRANSACTION_HOT_DAYS = int(os.getenv("TRANSACTION_HOT_DAYS", 180))
+# Rows moved per transaction
+TRANSACTION_ARCHIVE_BATCH = int(os.getenv("TRANSACTION_ARCHIVE_BATCH", 5000))
+# Longest range one statement request may cover
+STATEMENT_MAX_DAYS = int(os.getenv("STATEMENT_MAX_DAYS", 366))
 
-if missing_keys:
-    print(f"⚠️ Warning: Missing Flutterwave keys in .env: {', '.join(missing_keys)}")
-else:
-    print("✅ All Flutterwave keys loaded successfully")
\ No newline at end of file
+# --------------------------
+# Data retention (apply_retention)
+# --------------------------
+# An account is dormant after this many days without a login, transaction
+# or points award; closed accounts (is_active=False) after RETENTION_CLOSED_DAYS
+RETENTION_DORMANT_DAYS = int(os.getenv("RETENTION_DORMANT_DAYS", 365 * 2))
+RETENTION_CLOSED_DAYS = int(os.getenv("RETENTION_CLOSED_DAYS", 90))
+# Transaction type -> days a dormant account's rows are kept before they are
+# folded into monthly TransactionSummary rows. "*" matches any other type;
+# money movements keep the five years financial records are held for.
+RETENTION_POLICIES = {
+    "*": 365 * 5,
+    "Data Purchase": 365 * 2,
+    "Airtime Purchase": 365 * 2,
+    "Betting": 365 * 2,
+    "Reward Points": 365,
+}
+if os.getenv("RETENTION_POLICIES_JSON"):
+    RETENTION_POLICIES = json.loads(os.getenv("RETENTION_POLICIES_JSON"))
+# Rows folded and deleted per transaction, and the pause between batches
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", 500))
+RETENTION_SLEEP = float(os.getenv("RETENTION_SLEEP", 0.05))
+
+# --------------------------
+# Bank account name enquiry
+# --------------------------
+NAME_ENQUIRY_BACKEND = os.getenv("NAME_ENQUIRY_BACKEND", "backdave_app.name_enquiry.StubBackend")
+NAME_ENQUIRY_CACHE_SECONDS = int(os.getenv("NAME_ENQUIRY_CACHE_SECONDS", 60 * 60 * 24))
+# "No such account" answers expire sooner in case the account was just opened
+NAME_ENQUIRY_NEGATIVE_CACHE_SECONDS = int(os.getenv("NAME_ENQUIRY_NEGATIVE_CACHE_SECONDS", 60 * 5))
+NAME_ENQUIRY_STUB_LATENCY = float(os.getenv("NAME_ENQUIRY_STUB_LATENCY", 0))
+
+# --------------------------
+# Currencies and exchange rates (fx.py)
+# --------------------------
+# The currency of the books: system accounts, spending limits, rewards
+BASE_CURRENCY = "NGN"
+# Currencies a wallet may be opened in, and Flutterwave top-ups paid in
+WALLET_CURRENCIES = os.getenv("WALLET_CURRENCIES", "NGN,USD,GBP,EUR").split(",")
+TOP_UP_CURRENCIES = os.getenv("TOP_UP_CURRENCIES", "NGN,USD,GBP,EUR,GHS,KES").split(",")
+FX_RATES_PROVIDER = os.getenv("FX_RATES_PROVIDER", "backdave_app.fx.StubProvider")
+# How often a process looks for a newer rate version (refresh_fx_rates publishes them)
+FX_RATES_RELOAD_SECONDS = int(os.getenv("FX_RATES_RELOAD_SECONDS", 60))
+# Conversions stop when the newest rates are older than this
+FX_RATES_MAX_AGE_SECONDS = int(os.getenv("FX_RATES_MAX_AGE_SECONDS", 60 * 60 * 6))
+# StubProvider: naira per unit
+FX_STUB_RATES = {
+    "USD": "1550.00", "GBP": "1960.00", "EUR": "1680.00", "GHS": "100.00", "KES": "12.00",
+    "ZAR": "85.00", "TZS": "0.60", "UGX": "0.42", "RWF": "1.10", "XAF": "2.55", "XOF": "2.55",
+}
+if os.getenv("FX_STUB_RATES_JSON"):
+    FX_STUB_RATES = json.loads(os.getenv("FX_STUB_RATES_JSON"))
+
+# --------------------------
+# Idempotency keys
+# --------------------------
+# How long a stored response is replayed for a retried Idempotency-Key
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", 24)))
+# A retry takes over a key whose request has run longer than this without
+# finishing: past gunicorn's 30 s worker timeout, that request is dead
+IDEMPOTENCY_CLAIM_TIMEOUT = timedelta(seconds=int(os.getenv("IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS", 60)))
+
+# --------------------------
+# Rewards
+# --------------------------
+# How often a process checks the rules version stamp for edits
+REWARDS_RELOAD_SECONDS = float(os.getenv("REWARDS_RELOAD_SECONDS", 5))
+REWARDS_NAIRA_PER_POINT = Decimal(os.getenv("REWARDS_NAIRA_PER_POINT", "0.10"))
+REWARDS_MIN_REDEMPTION_POINTS = int(os.getenv("REWARDS_MIN_REDEMPTION_POINTS", 500))
+# Users per transaction in promotion batch redemptions
+REWARDS_BATCH_CHUNK = int(os.getenv("REWARDS_BATCH_CHUNK", 500))
+
+# --------------------------
+# Spending limits
+# --------------------------
+# Transaction type -> reward tier -> limits. "*" matches any type or tier;
+# for each limit the most specific entry wins. Amounts in naira, counts
+# per rolling hour, daily amounts per rolling 24 hours, per type.
+SPENDING_LIMITS = {
+    "*": {
+        "*": {"per_transaction": 200_000, "daily_amount": 500_000, "hourly_count": 20},
+        "Gold": {"daily_amount": 1_000_000},
+        "Platinum": {"per_transaction": 1_000_000, "daily_amount": 5_000_000, "hourly_count": 60},
+    },
+    "Betting": {
+        "*": {"daily_amount": 100_000, "hourly_count": 10},
+    },
+}
+if os.getenv("SPENDING_LIMITS_JSON"):
+    SPENDING_LIMITS = json.loads(os.getenv("SPENDING_LIMITS_JSON"))
+# How long cached counters are trusted before being rebuilt from Transaction rows
+SPENDING_LIMITS_RECONCILE_SECONDS = int(os.getenv("SPENDING_LIMITS_RECONCILE_SECONDS", 600))
+
+# --------------------------
+# Fraud scoring
+# --------------------------
+FRAUD_SCORER = os.getenv("FRAUD_SCORER", "backdave_app.fraud.LogisticScorer")
+# Logistic model over fraud.FEATURES
+FRAUD_MODEL = {
+    "bias": -6.0,
+    "weights": {
+        "amount_z": 0.9,
+        "log_amount": 0.25,
+        "new_recipient": 1.2,
+        "burst": 0.25,
+        "first_transaction": 0.8,
+    },
+}
+if os.getenv("FRAUD_MODEL_JSON"):
+    FRAUD_MODEL = json.loads(os.getenv("FRAUD_MODEL_JSON"))
+FRAUD_REVIEW_SCORE = float(os.getenv("FRAUD_REVIEW_SCORE", 0.7))  # flagged in the admin
+FRAUD_BLOCK_SCORE = float(os.getenv("FRAUD_BLOCK_SCORE", 0.97))  # debit refused
+FRAUD_BURST_WINDOW_SECONDS = int(os.getenv("FRAUD_BURST_WINDOW_SECONDS", 300))
+# Inline scoring slower than this is logged
+FRAUD_INLINE_BUDGET_MS = float(os.getenv("FRAUD_INLINE_BUDGET_MS", 20))
+
+# --------------------------
+# Background jobs (manage.py runworker)
+# --------------------------
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", 4))
+# Seconds an idle worker waits before polling again
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1))
+# A job still "running" after this many seconds is assumed orphaned and retried
+JOB_LOCK_TIMEOUT = int(os.getenv("JOB_LOCK_TIMEOUT", 300))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+
+# --------------------------
+# Async views (ASGI)
+# --------------------------
+# Serve the Flutterwave views as native coroutines. Turn on when running
+# under uvicorn (see Procfile.asgi); under WSGI the sync views are faster.
+ASYNC_VIEWS = os.getenv("DJANGO_ASYNC_VIEWS", "False") == "True"
+
+# --------------------------
+# Live updates (Server-Sent Events, api/events/ under ASGI)
+# --------------------------
+# How postings reach streams in other processes: Postgres LISTEN/NOTIFY, or
+# in-process only (LocalFanout) for SQLite and single-worker dev servers
+EVENTS_FANOUT = os.getenv("EVENTS_FANOUT", (
+    "backdave_app.events.PostgresFanout"
+    if DATABASES["default"]["ENGINE"].startswith("django.db.backends.postgresql") else
+    "backdave_app.events.LocalFanout"
+))
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "bank_events")
+# Comment lines that keep idle streams alive through proxies
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", 15))
+# Streams close after this long; clients reconnect with Last-Event-ID and resume
+EVENTS_MAX_STREAM_SECONDS = float(os.getenv("EVENTS_MAX_STREAM_SECONDS", 60 * 30))
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", 3000))
+# Transactions read per query when catching a stream up
+EVENTS_REPLAY_LIMIT = int(os.getenv("EVENTS_REPLAY_LIMIT", 100))
+
+# Missing Flutterwave keys are reported by a system check (backdave_app/checks.py),
+# not printed here: settings are imported by every process and worker.
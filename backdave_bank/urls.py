@@ -1,5 +1,6 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
+from django.views.static import serve
 from django.http import HttpResponse  # <-- needed for home and healthz
 from django.conf import settings
 from django.conf.urls.static import static
@@ -12,11 +13,18 @@ def home(request):
 def healthz(request):
     return HttpResponse("OK")
 
+# Profile pictures have content-hashed names, so browsers/CDNs may cache them forever
+def profile_media(request, path):
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    response["Cache-Control"] = f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable"
+    return response
+
 urlpatterns = [
     path('', home),  # Root URL
     path('healthz', healthz),  # Health check endpoint
     path('admin/', admin.site.urls),
     path('api/', include('backdave_app.urls')),
+    re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>profile_pics/.+)$', profile_media),
 ]
 
 if settings.DEBUG:
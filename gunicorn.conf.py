@@ -0,0 +1,104 @@
+"""
+gunicorn settings, read from the working directory (Procfile: `web: gunicorn`).
+
+The app is preloaded and warmed in the master (backdave_app/warmup.py), so
+workers fork hot and share the imported code copy-on-write. Worker class,
+count and threads are sized from the CPUs and memory the container actually
+gets; `python manage.py bench_workers` measures the trade-offs. Command-line
+flags and GUNICORN_CMD_ARGS still override everything here.
+"""
+import gc
+import math
+import os
+
+# --------------------------
+# Application
+# --------------------------
+ASYNC_VIEWS = os.getenv("DJANGO_ASYNC_VIEWS", "False") == "True"
+wsgi_app = "backdave_bank.asgi:application" if ASYNC_VIEWS else "backdave_bank.wsgi:application"
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+
+
+# --------------------------
+# Container limits
+# --------------------------
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _cpus():
+    """Usable CPUs: affinity mask, capped by a cgroup CPU quota."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    quota = (_read("/sys/fs/cgroup/cpu.max") or "max").split()
+    if quota[0] != "max":
+        cpus = min(cpus, math.ceil(int(quota[0]) / int(quota[1])))
+    return max(cpus, 1)
+
+
+def _memory_mb():
+    """cgroup memory limit (v2, then v1), else physical memory."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        limit = _read(path)
+        if limit and limit.isdigit() and int(limit) < 1 << 50:  # v1 reports "unlimited" as ~2**63
+            return int(limit) // 2 ** 20
+    for line in (_read("/proc/meminfo") or "").splitlines():
+        if line.startswith("MemTotal:"):
+            return int(line.split()[1]) // 1024
+    return 512
+
+
+# --------------------------
+# Workers
+# --------------------------
+# Unshared memory one more worker costs once warm (USS after load in
+# bench_workers: ~23 MB sync/gthread, ~40 MB uvicorn with preload; ~52 MB
+# without), and what the master, page cache and headroom keep
+WORKER_MEMORY_MB = int(os.getenv("GUNICORN_WORKER_MEMORY_MB", 50))
+MEMORY_RESERVE_MB = int(os.getenv("GUNICORN_MEMORY_RESERVE_MB", 150))
+
+CPUS = _cpus()
+# Requests in flight the box can serve: views mostly wait on Postgres and Flutterwave
+TARGET_CONCURRENCY = 2 * CPUS + 1
+MEMORY_WORKERS = max((_memory_mb() - MEMORY_RESERVE_MB) // WORKER_MEMORY_MB, 1)
+
+# WEB_CONCURRENCY is the worker count Render and gunicorn already understand
+workers = int(os.getenv("WEB_CONCURRENCY", min(TARGET_CONCURRENCY, MEMORY_WORKERS)))
+
+if ASYNC_VIEWS:
+    worker_class = "uvicorn_worker.UvicornWorker"
+elif os.getenv("GUNICORN_WORKER_CLASS"):
+    worker_class = os.environ["GUNICORN_WORKER_CLASS"]
+elif workers < TARGET_CONCURRENCY:
+    # Memory caps the processes: make up the concurrency with threads
+    worker_class = "gthread"
+else:
+    worker_class = "sync"
+
+# gunicorn switches sync workers to gthread whenever threads > 1, so only set it for gthread
+if worker_class == "gthread":
+    threads = int(os.getenv("GUNICORN_THREADS", min(max(math.ceil(TARGET_CONCURRENCY * 2 / workers), 2), 8)))
+
+
+# --------------------------
+# Hooks
+# --------------------------
+def when_ready(server):
+    """Runs in the master after the preloaded app is imported, before any worker forks."""
+    server.log.info(
+        "%d %s worker(s)%s; %d CPU(s), %d MB", server.cfg.workers, server.cfg.worker_class_str,
+        f" x {server.cfg.threads} threads" if server.cfg.worker_class_str == "gthread" else "",
+        CPUS, _memory_mb(),
+    )
+    if not server.cfg.preload_app:
+        return
+    from backdave_app import warmup
+
+    warmup.warm()
+    # Move everything built so far out of the collector's reach: a worker's
+    # first GC would otherwise touch every object header and un-share the pages
+    gc.collect()
+    gc.freeze()